@@ -0,0 +1,3 @@
+"""
+性能基准: `python -m benchmark.<name> --help`
+"""
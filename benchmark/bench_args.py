@@ -0,0 +1,46 @@
+"""
+ScriptRuntimeArgs 构造开销基准: 逐个 `ScriptRuntimeArgs[Profile].of` 与 `ScriptRuntimeArgs.bulk_of` 对比
+
+python -m benchmark.bench_args --accounts 50000
+"""
+import argparse
+import time
+
+from miner_base import ScriptRuntimeArgs, ScriptProfile
+from miner_base.shard import no_plugins
+from miner_base.testing import tg_sessions
+
+
+class Profile(ScriptProfile):
+    RANDOM_TAPS_COUNT: tuple[int, int] = (30, 180)
+    SLEEP_BETWEEN_TAP: tuple[int, int] = (20, 35)
+
+
+def bench(accounts: int):
+    raw = tg_sessions(accounts, useragent='Mozilla/5.0')
+    profile = Profile()
+
+    t0 = time.perf_counter()
+    one_by_one = [ScriptRuntimeArgs[Profile].of(s, profile, no_plugins) for s in raw]
+    t1 = time.perf_counter()
+    bulk = ScriptRuntimeArgs.bulk_of(raw, profile, no_plugins)
+    t2 = time.perf_counter()
+    trusted = ScriptRuntimeArgs.bulk_of(raw, profile, no_plugins, validate=False)
+    t3 = time.perf_counter()
+
+    assert len(one_by_one) == len(bulk) == len(trusted) == accounts
+    print(f'accounts                  : {accounts}')
+    print(f'of()            (ms total) : {(t1 - t0) * 1e3:.1f}')
+    print(f'bulk_of()       (ms total) : {(t2 - t1) * 1e3:.1f}')
+    print(f'bulk_of(no val) (ms total) : {(t3 - t2) * 1e3:.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=50000)
+    ns = parser.parse_args()
+    bench(ns.accounts)
+
+
+if __name__ == '__main__':
+    main()
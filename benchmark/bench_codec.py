@@ -0,0 +1,63 @@
+"""
+JSON后端基准: 在游戏接口的典型payload上对比已安装的后端(orjson/msgspec/json)
+- loads: 响应body(bytes) => 对象
+- dumps: 请求body / 日志记录 => str
+
+python -m benchmark.bench_codec --number 20000
+"""
+import argparse
+import time
+
+from miner_base import codec
+
+GAME_INFO = {'code': 0, 'message': 'Success', 'data': {
+    'singleCoinValue': 3, 'coinPoolTotalCount': 5000, 'coinPoolLeftCount': 4321, 'coinPoolRecoverySpeed': 12,
+    'swipeBotLevel': 2, 'specialBoxLeftRecoveryCount': 1, 'coinPoolLeftRecoveryCount': 3,
+    'currentAmount': 1234567890, 'totalAmount': 98765432101, 'userLevel': 8, 'rank': 12345,
+    'nickname': '矿工-42', 'inviteAmount': 5000.5, 'isBoostEnabled': True}}
+
+BUILD_INFO = {'code': 0, 'message': 'Success', 'data': {
+    'builds': [{'buildId': i, 'name': f'build-{i}', 'level': i % 10, 'upgradeCost': 1000 * (i + 1),
+                'profitPerHour': 12.5 * i, 'unlocked': i % 3 != 0, 'condition': {'type': 'level', 'value': i}}
+               for i in range(60)]}}
+
+TASKS = {'code': 0, 'data': [{'taskId': f'task-{i}', 'title': f'加入频道 #{i}', 'reward': 5000, 'status': i % 2,
+                              'link': f'https://t.me/channel_{i}', 'tags': ['daily', 'social']}
+                             for i in range(200)]}
+
+LOG_RECORD = {'lv': 'INFO', 'st': None, 'msg': '点击成功: +120, 余额: 1234567', 'error': 'None',
+              'extra': {'account': '10042', 'thread': 'thread_tap', 'energy': 3456, 'taps': 120}}
+
+PAYLOADS = {'game_info': GAME_INFO, 'build_info': BUILD_INFO, 'tasks': TASKS, 'log_record': LOG_RECORD}
+
+
+def timeit(func, arg, number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        func(arg)
+    return (time.perf_counter() - t0) / number
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000)
+    ns = parser.parse_args()
+    backends = codec.available()
+    print(f'backends: {backends} (default: {codec.get_codec().name})')
+    for name, payload in PAYLOADS.items():
+        body = codec.get_codec('json').dumpb(payload)
+        number = max(100, ns.number * 200 // len(body))
+        print(f'\n{name} ({len(body)} bytes, x{number})')
+        results = {}
+        for backend in backends:
+            c = codec.get_codec(backend)
+            assert c.loads(body) == payload
+            results[backend] = (timeit(c.loads, body, number), timeit(c.dumps, payload, number))
+        json_loads, json_dumps = results['json']
+        for backend, (loads, dumps) in results.items():
+            print(f'  {backend:<8} loads {loads * 1e6:8.2f} us (x{json_loads / loads:4.1f})   '
+                  f'dumps {dumps * 1e6:8.2f} us (x{json_dumps / dumps:4.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+导入耗时基准: 每个worker进程都要重新导入, 在新的解释器中分别测量(中位数)
+- python -c pass 作为解释器启动基线
+- import miner_base / from miner_base import State / from miner_base import * / import miner_base.impl
+
+python -m benchmark.bench_import --runs 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+STATEMENTS = [
+    'pass',
+    'import miner_base',
+    'from miner_base import State',
+    'from miner_base import *',
+    'import miner_base.impl',
+]
+
+
+def measure(statement: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    ns = parser.parse_args()
+    baseline = measure('pass', ns.runs)
+    for statement in STATEMENTS:
+        elapsed = measure(statement, ns.runs) if statement != 'pass' else baseline
+        print(f'{statement:<32}: {elapsed * 1e3:7.1f} ms  (+{(elapsed - baseline) * 1e3:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+压测: 在本地模拟后端(benchmark.mock_backend)上运行 example4_tg_yescoin 风格的脚本
+Telegram/Network 插件使用本地桩, 不访问外部网络
+
+统计: 帐户数/进程, 请求数/s, 请求延迟 p50/p99, event loop延迟 p50/p99/max, RSS/帐户, 错误数
+
+python -m benchmark.bench_load --accounts 500 --duration 20 --latency 0.05 --error-rate 0.01
+python -m benchmark.bench_load --backend-url http://127.0.0.1:8080  # 使用独立进程的mock后端, 避免共用event loop
+python -m benchmark.bench_load --metrics 0.1  # 开启请求指标(采样10%), 对比开销
+python -m benchmark.bench_load --loop-monitor 0.05  # 开启LoopMonitor(慢回调阈值50ms), 对比开销并列出阻塞的thread
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from aiohttp.test_utils import TestServer
+
+from benchmark.mock_backend import MockBackend
+from miner_base import ScriptRuntimeArgs, StatusUpdater, PluginTelegram, PluginNetwork
+from miner_base.impl import SessionPool, AiohttpAPICaller
+from miner_base.loader import ScriptLoader
+from miner_base.loopmon import LoopMonitor
+from miner_base.metrics import ApiMetrics
+from miner_base.runner import TaskRunner, AccountTask
+from miner_base.testing import tg_sessions
+
+SCRIPT = 'examples/example4_tg_yescoin.py'
+PROFILE = {'TMA_URL': ['t.me/theYescoin_bot/Yescoin?startapp=bench'], 'SLEEP_BETWEEN_TAP': (1, 2),
+           'SLEEP_BY_MIN_ENERGY': 5}
+
+
+class StubTelegram(PluginTelegram):
+
+    def __init__(self, session_name: str):
+        self.session_name = session_name
+
+    @classmethod
+    def of_args(cls, args, updater):
+        return super().of_args(args, updater)
+
+    async def get_tma_token(self, tma_url: str) -> str:
+        return f'query_id={self.session_name}&auth_date={int(time.time())}&hash=stub'
+
+
+class StubNetwork(PluginNetwork):
+
+    @classmethod
+    def of_args(cls, args, updater):
+        return super().of_args(args, updater)
+
+    async def check_proxy_ip(self, proxies) -> str:
+        return '127.0.0.1'
+
+
+def stub_plugins(args: ScriptRuntimeArgs):
+    return [StubTelegram(args.tg_session['session_name']), StubNetwork()]
+
+
+class CountingStatusUpdater(StatusUpdater):
+    def __init__(self, counters: dict):
+        self.counters = counters
+
+    def update(self, status, level, msg, extra, error=None):
+        if level in ('ERROR', 'CRITICAL'):
+            self.counters['script_errors'] += 1
+
+
+class TimedAPICaller(AiohttpAPICaller):
+    """记录每次请求的延迟(s)"""
+    latencies: list[float] = []
+    failures = 0
+
+    async def _send_once(self, method, url, kwargs):
+        t0 = time.perf_counter()
+        try:
+            response = await super()._send_once(method, url, kwargs)
+        except Exception:
+            TimedAPICaller.failures += 1
+            raise
+        TimedAPICaller.latencies.append(time.perf_counter() - t0)
+        return response
+
+
+async def sample_lag(samples: list[float], interval: float = 0.05):
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - t0 - interval)
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def run_load(base_url: str, accounts: int, duration: float, script_path: str = SCRIPT,
+                   metrics: ApiMetrics | None = None, monitor: LoopMonitor | None = None) -> dict:
+    script = ScriptLoader().load(script_path)
+    registry = script.registry.rebase(base_url)
+    profile = script.profile.model_validate(PROFILE)
+    counters = {'script_errors': 0}
+    updater = CountingStatusUpdater(counters)
+    TimedAPICaller.latencies, TimedAPICaller.failures = [], 0
+
+    lag: list[float] = []
+    lag_task = asyncio.create_task(sample_lag(lag))
+    rss_before = rss_kb()
+    if monitor is not None:
+        monitor.start()
+    sessions = tg_sessions(accounts, useragent='Mozilla/5.0')
+    async with SessionPool(limit=1000, limit_per_host=1000, metrics=metrics) as pool:
+        tasks = [AccountTask(args=args, updater=updater, caller=TimedAPICaller(pool, registry=registry,
+                                                                               account=args.tg_session['id']))
+                 for args in ScriptRuntimeArgs.bulk_of(sessions, profile, stub_plugins)]
+        runner = TaskRunner(script.threads, normal_retry_delay=1)
+        t0 = time.perf_counter()
+        running = asyncio.create_task(runner.run(tasks))
+        await asyncio.sleep(duration)
+        running.cancel()
+        try:
+            await running
+        except asyncio.CancelledError:
+            pass
+        elapsed = time.perf_counter() - t0
+        rss_after = rss_kb()
+        for task in tasks:
+            await task.caller.close()
+    lag_task.cancel()
+    if monitor is not None:
+        await monitor.stop()
+
+    latencies = TimedAPICaller.latencies
+    return {
+        'accounts': accounts,
+        'duration': elapsed,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'lag_p50': percentile(lag, 0.5),
+        'lag_p99': percentile(lag, 0.99),
+        'lag_max': max(lag, default=0.),
+        'rss_kb_per_account': (rss_after - rss_before) / accounts,
+        'failures': TimedAPICaller.failures,
+        'script_errors': counters['script_errors'],
+        'failed_accounts': sum(1 for t in tasks if t.status == 'failed'),
+        'slow_callbacks': monitor.top(3) if monitor is not None else None,
+    }
+
+
+async def bench(ns):
+    metrics = ApiMetrics(sample_rate=ns.metrics) if ns.metrics is not None else None
+    monitor = LoopMonitor(slow_threshold=ns.loop_monitor) if ns.loop_monitor is not None else None
+    if ns.backend_url:
+        return await run_load(ns.backend_url, ns.accounts, ns.duration, ns.script, metrics, monitor)
+    backend = MockBackend(ns.latency, ns.jitter, ns.error_rate, ns.throttle_rate, seed=0)
+    async with TestServer(backend.app()) as server:
+        return await run_load(str(server.make_url('/')), ns.accounts, ns.duration, ns.script, metrics, monitor)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--script', default=SCRIPT)
+    parser.add_argument('--backend-url', default=None)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--metrics', type=float, default=None, help='开启ApiMetrics, 值为采样比例')
+    parser.add_argument('--loop-monitor', type=float, default=None, help='开启LoopMonitor, 值为慢回调阈值(s)')
+    ns = parser.parse_args()
+    result = asyncio.run(bench(ns))
+    print(f"accounts/process   : {result['accounts']}")
+    print(f"requests/s         : {result['rps']:.1f} ({result['requests']} in {result['duration']:.1f}s)")
+    print(f"latency p50/p99 ms : {result['p50'] * 1e3:.1f} / {result['p99'] * 1e3:.1f}")
+    print(f"loop lag p50/p99/max ms : {result['lag_p50'] * 1e3:.1f} / {result['lag_p99'] * 1e3:.1f} / "
+          f"{result['lag_max'] * 1e3:.1f}")
+    print(f"rss (KiB/acc)      : {result['rss_kb_per_account']:.2f}")
+    print(f"errors             : requests {result['failures']}, script {result['script_errors']}, "
+          f"failed accounts {result['failed_accounts']}")
+    if result['slow_callbacks'] is not None:
+        for offender in result['slow_callbacks']:
+            print(f"slow callbacks     : {offender['key']} x{offender['count']} max {offender['max'] * 1e3:.1f}ms "
+                  f"@ {offender['location']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+空闲帐户的内存基准: 构造N个帐户的运行对象(ScriptRuntimeArgs + State + updater + AccountTask), 用tracemalloc统计每个帐户的字节数
+sessions按从数据库/JSON读取的方式构造(每个帐户的字符串都是独立对象)
+- per-account: 逐个 `ScriptRuntimeArgs[Profile].of`, 每个帐户独立的profile/agent_info
+- bulk: `bulk_of(compact=False)`, 共享profile
+- compact: `bulk_of()`, 冻结共享的profile, 共享agent_info
+
+python -m benchmark.bench_memory --accounts 20000
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+from miner_base import ScriptRuntimeArgs, ScriptProfile, State
+from miner_base.impl import LoggerStatusUpdater
+from miner_base.runner import AccountTask
+from miner_base.shard import no_plugins
+
+USER_AGENTS = [f'Mozilla/5.0 (iPhone; CPU iPhone OS 17_{i} like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+               f'Version/17.{i} Mobile/15E148 Safari/604.1' for i in range(20)]
+
+
+class Profile(ScriptProfile):
+    TMA_URL: list[str] = ['t.me/theYescoin_bot/Yescoin?startapp=bench']
+    RANDOM_TAPS_COUNT: tuple[int, int] = (30, 180)
+    SLEEP_BETWEEN_TAP: tuple[int, int] = (20, 35)
+    SLEEP_BY_MIN_ENERGY: int = 300
+    AUTO_UPGRADE: bool = True
+
+
+def sessions_json(accounts: int) -> str:
+    return json.dumps([{'id': i, 'session_name': f'session-{i}', 'proxy_ip': f'http://10.0.0.{i % 50}:3128',
+                        'agent_info': {'useragent': USER_AGENTS[i % len(USER_AGENTS)], 'percent': 100,
+                                       'type': 'mobile', 'system': 'iOS', 'browser': 'safari', 'version': 17,
+                                       'os': 'ios'}}
+                       for i in range(accounts)])
+
+
+def on_log(status, level, msg, extra, error=None):
+    pass
+
+
+def measure(build) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def bench(accounts: int, mode: str):
+    raw = sessions_json(accounts)
+    profile = {'SLEEP_BY_MIN_ENERGY': 600}
+
+    def build_args():
+        if mode == 'per-account':
+            return [ScriptRuntimeArgs[Profile].of(s, Profile.model_validate(profile), no_plugins)
+                    for s in json.loads(raw)]
+        return ScriptRuntimeArgs.bulk_of(json.loads(raw), profile, no_plugins, profile_cls=Profile,
+                                         compact=mode == 'compact')
+
+    args_bytes, args = measure(build_args)
+    state_bytes, states = measure(lambda: [State({}) for _ in range(accounts)])
+    updater_bytes, updaters = measure(lambda: [LoggerStatusUpdater.of(on_log) for _ in range(accounts)])
+    task_bytes, tasks = measure(lambda: [AccountTask(args=a, updater=u, caller=None, state=s)
+                                         for a, u, s in zip(args, updaters, states)])
+    total = args_bytes + state_bytes + updater_bytes + task_bytes
+    print(f'accounts                : {accounts} ({mode})')
+    print(f'args+sessions (B/acc)   : {args_bytes / accounts:8.0f}')
+    print(f'State         (B/acc)   : {state_bytes / accounts:8.0f}')
+    print(f'updater       (B/acc)   : {updater_bytes / accounts:8.0f}')
+    print(f'AccountTask   (B/acc)   : {task_bytes / accounts:8.0f}')
+    print(f'total         (B/acc)   : {total / accounts:8.0f}')
+    return total / accounts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=20000)
+    ns = parser.parse_args()
+    results = {mode: bench(ns.accounts, mode) for mode in ('per-account', 'bulk', 'compact')}
+    before, after = results['per-account'], results['compact']
+    print(f'per-account => compact  : {before:.0f} => {after:.0f} B/acc ({(1 - after / before) * 100:.0f}% less)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+TaskRunner 调度开销基准
+- 启动N个帐户(每个帐户2个thread函数), 全部进入等待状态后统计: 启动耗时/帐户, RSS/帐户
+- 释放等待后统计: 完成耗时/帐户
+
+python -m benchmark.bench_runner --accounts 10000
+"""
+import argparse
+import asyncio
+import resource
+import time
+
+from miner_base import StatusUpdater
+from miner_base.runner import TaskRunner, AccountTask
+
+
+class NullStatusUpdater(StatusUpdater):
+    def update(self, status, level, msg, extra, error=None):
+        pass
+
+
+def rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def bench(accounts: int, max_concurrency: int | None):
+    release = asyncio.Event()
+    started = 0
+
+    async def thread_wait(args, updater, caller, state):
+        nonlocal started
+        started += 1
+        await release.wait()
+
+    async def thread_work(args, updater, caller, state):
+        for i in range(3):
+            state.set('i', i)
+            await asyncio.sleep(0)
+
+    runner = TaskRunner({'thread_wait': thread_wait, 'thread_work': thread_work}, max_concurrency=max_concurrency)
+    updater = NullStatusUpdater()
+    tasks = [AccountTask(args=None, updater=updater, caller=None, name=str(i)) for i in range(accounts)]
+
+    rss_before = rss_kb()
+    t0 = time.perf_counter()
+    fut = asyncio.ensure_future(runner.run(tasks))
+    while started < min(accounts, max_concurrency or accounts):
+        await asyncio.sleep(0)
+    t1 = time.perf_counter()
+    rss_running = rss_kb()
+    release.set()
+    await fut
+    t2 = time.perf_counter()
+
+    assert all(t.status == 'completed' for t in tasks)
+    print(f'accounts           : {accounts}')
+    print(f'start   (us/acc)   : {(t1 - t0) / accounts * 1e6:.1f}')
+    print(f'finish  (us/acc)   : {(t2 - t1) / accounts * 1e6:.1f}')
+    print(f'peak rss (KiB/acc) : {(rss_running - rss_before) / accounts:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--max-concurrency', type=int, default=None)
+    ns = parser.parse_args()
+    asyncio.run(bench(ns.accounts, ns.max_concurrency))
+
+
+if __name__ == '__main__':
+    main()
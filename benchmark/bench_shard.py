@@ -0,0 +1,79 @@
+"""
+多进程分片吞吐基准: 每个帐户做固定量的 JSON解码 + pydantic校验(CPU密集), 结束时记录一条日志, 对比不同进程数的吞吐
+每个worker进程启动(spawn + 导入)约需0.3~0.5s, 工作量需远大于此才能体现多核加速; 加速上限为可用cpu核数
+
+python -m benchmark.bench_shard --accounts 1000 --loops 100 --processes 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from miner_base import StatusUpdater
+from miner_base.shard import run_sharded_sync
+from miner_base.testing import tg_sessions
+
+SCRIPT = '''
+import json
+
+from miner_base import *
+
+PAYLOAD = json.dumps({'code': 0, 'data': {'currentAmount': 123456, 'totalAmount': 654321,
+                                          'items': [{'id': i, 'level': i % 7, 'cost': i * 100} for i in range(50)]}})
+
+
+class Item(BaseModel):
+    id: int
+    level: int
+    cost: int
+
+
+class Profile(ScriptProfile):
+    LOOPS: int = Field(100)
+
+
+async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater, caller: APICaller, state: State):
+    cost = 0
+    for _ in range(args.profile.LOOPS):
+        data = json.loads(PAYLOAD)['data']
+        items = [Item.model_validate(item) for item in data['items']]
+        cost += sum(item.cost for item in items)
+        state.set('items', items)
+    updater.info(f"loops {args.profile.LOOPS} cost {cost}")
+'''
+
+
+class CountingStatusUpdater(StatusUpdater):
+    def __init__(self):
+        self.count = 0
+
+    def update(self, status, level, msg, extra, error=None):
+        self.count += 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--loops', type=int, default=100)
+    parser.add_argument('--processes', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count()}))
+    ns = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = os.path.join(tmp, 'bench_shard_script.py')
+        with open(script, 'w') as f:
+            f.write(SCRIPT)
+        sessions = tg_sessions(ns.accounts)
+        base = None
+        for processes in ns.processes:
+            updater = CountingStatusUpdater()
+            t0 = time.perf_counter()
+            statuses = run_sharded_sync(script, sessions, updater, profile={'LOOPS': ns.loops}, processes=processes)
+            elapsed = time.perf_counter() - t0
+            assert len(statuses) == ns.accounts
+            base = base or elapsed
+            print(f'cpus={os.cpu_count()} processes={processes:<3} {elapsed:6.2f}s  {ns.accounts / elapsed:8.0f} acc/s  '
+                  f'events={updater.count}  speedup={base / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
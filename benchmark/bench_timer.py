@@ -0,0 +1,70 @@
+"""
+sleep基准: 大量帐户循环 sleep(randint(...)), 对比 asyncio.sleep 与时间轮(miner_base.timer.sleep)
+统计: event loop唤醒次数/s(selector.select调用), CPU时间, sleep延迟(实际 - 预期)
+
+python -m benchmark.bench_timer --accounts 10000 --duration 10
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from miner_base.timer import TimerWheel, sleep as wheel_sleep
+
+
+async def account_loop(sleep, late: list[float], low: float, high: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        delay = random.uniform(low, high)
+        t0 = loop.time()
+        await sleep(delay)
+        late.append(loop.time() - t0 - delay)
+
+
+async def run(accounts: int, duration: float, use_wheel: bool, tick: float, low: float, high: float) -> dict:
+    loop = asyncio.get_running_loop()
+    if use_wheel:
+        TimerWheel.install(tick)
+    selector = loop._selector  # noqa: 只用于统计loop唤醒次数
+    select, selects = selector.select, [0]
+
+    def counting_select(timeout=None):
+        selects[0] += 1
+        return select(timeout)
+
+    selector.select = counting_select
+    late: list[float] = []
+    sleep = wheel_sleep if use_wheel else asyncio.sleep
+    tasks = [asyncio.create_task(account_loop(sleep, late, low, high)) for _ in range(accounts)]
+    await asyncio.sleep(high)  # 启动阶段不计入
+    late.clear()
+    selects[0] = 0
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu, elapsed = time.process_time() - cpu0, time.perf_counter() - t0
+    wakeups = selects[0]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    selector.select = select
+    late.sort()
+    return {'wakeups_per_sec': wakeups / elapsed, 'cpu': cpu, 'sleeps': len(late),
+            'late_p50': late[len(late) // 2] if late else 0., 'late_max': late[-1] if late else 0.}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--tick', type=float, default=0.05)
+    parser.add_argument('--low', type=float, default=1)
+    parser.add_argument('--high', type=float, default=3)
+    ns = parser.parse_args()
+    for name, use_wheel in (('asyncio.sleep', False), (f'timer wheel (tick {ns.tick}s)', True)):
+        r = asyncio.run(run(ns.accounts, ns.duration, use_wheel, ns.tick, ns.low, ns.high))
+        print(f'{name:<26}: wakeups/s {r["wakeups_per_sec"]:8.1f}  cpu {r["cpu"]:6.2f}s  '
+              f'sleeps {r["sleeps"]:7d}  late p50/max ms {r["late_p50"] * 1e3:6.1f} / {r["late_max"] * 1e3:6.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+本地模拟的游戏后端(yescoin接口), 用于压测: 可配置延迟与错误注入
+
+python -m benchmark.mock_backend --port 8080 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from aiohttp import web
+
+
+class MockBackend:
+    """example4_tg_yescoin 使用的接口"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, seed: int | None = None):
+        """
+        :param latency: 每个请求的固定延迟(s)
+        :param jitter: 额外的随机延迟 [0, jitter)(s)
+        :param error_rate: 返回500的比例
+        :param throttle_rate: 返回429(Retry-After: 1)的比例
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.requests: dict[str, int] = {}
+        self.errors = 0
+        self.balances: dict[str, int] = {}
+
+    @web.middleware
+    async def _inject(self, request: web.Request, handler):
+        self.requests[request.path] = self.requests.get(request.path, 0) + 1
+        delay = self.latency + (self.random.random() * self.jitter if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.error_rate:
+            self.errors += 1
+            return web.json_response({'code': 500, 'message': 'injected error'}, status=500)
+        if roll < self.error_rate + self.throttle_rate:
+            self.errors += 1
+            return web.json_response({'code': 429, 'message': 'injected throttle'}, status=429,
+                                     headers={'Retry-After': '1'})
+        return await handler(request)
+
+    def _account(self, request: web.Request) -> str:
+        return request.headers.get('Token', '')
+
+    async def login(self, request: web.Request):
+        body = await request.json()
+        return web.json_response({'code': 0, 'data': {'token': f"token-{hash(body.get('code')) & 0xffffff}"}})
+
+    async def get_account_info(self, request: web.Request):
+        balance = self.balances.get(self._account(request), 0)
+        return web.json_response({'code': 0, 'data': {'currentAmount': balance, 'totalAmount': balance}})
+
+    async def get_game_info(self, request: web.Request):
+        return web.json_response({'code': 0, 'data': {'coinPoolLeftCount': 1000, 'singleCoinValue': 1}})
+
+    async def get_build_info(self, request: web.Request):
+        return web.json_response({'code': 0, 'data': {
+            'specialBoxLeftRecoveryCount': 0, 'coinPoolLeftRecoveryCount': 0,
+            'singleCoinLevel': 1, 'coinPoolTotalLevel': 1, 'coinPoolRecoveryLevel': 1,
+            'singleCoinUpgradeCost': 10 ** 9, 'coinPoolTotalUpgradeCost': 10 ** 9,
+            'coinPoolRecoveryUpgradeCost': 10 ** 9}})
+
+    async def get_special_box_info(self, request: web.Request):
+        return web.json_response({'code': 0, 'data': {'recoveryBox': {'boxType': 1, 'specialBoxTotalCount': 100}}})
+
+    async def collect(self, request: web.Request):
+        coins = await request.json()
+        account = self._account(request)
+        self.balances[account] = self.balances.get(account, 0) + (coins if isinstance(coins, int) else 1)
+        return web.json_response({'code': 0, 'data': {'collectStatus': True}})
+
+    async def ok(self, request: web.Request):
+        return web.json_response({'code': 0, 'data': True})
+
+    async def offline(self, request: web.Request):
+        return web.json_response({'code': 0, 'data': {'time': int(time.time())}})
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject])
+        app.router.add_post('/user/login', self.login)
+        app.router.add_post('/user/offline', self.offline)
+        app.router.add_get('/account/getAccountInfo', self.get_account_info)
+        app.router.add_get('/game/getGameInfo', self.get_game_info)
+        app.router.add_get('/game/getSpecialBoxInfo', self.get_special_box_info)
+        app.router.add_get('/build/getAccountBuildInfo', self.get_build_info)
+        app.router.add_post('/game/collectCoin', self.collect)
+        app.router.add_post('/game/collectSpecialBoxCoin', self.collect)
+        app.router.add_post('/game/recoverCoinPool', self.ok)
+        app.router.add_post('/game/recoverSpecialBox', self.ok)
+        app.router.add_post('/build/levelUp', self.ok)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    ns = parser.parse_args()
+    backend = MockBackend(ns.latency, ns.jitter, ns.error_rate, ns.throttle_rate)
+    web.run_app(backend.app(), port=ns.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -52,12 +52,11 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
             return  # 脚本主动结束
 
 async def thread_trigger(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater, caller: APICaller, state: State):
-    while True:
-        if state.get('shared_count') > 8:
-            count = state.get('shared_count')
-            updater.success(f'触发器触发, 当前count为{count}')
-            raise '通过触发器抛出异常来了结束Task(强行中断所有的线程函数thread_)'
-        await asyncio.sleep(1)
+    # 等待 shared_count > 8: 每次 state.set('shared_count', ...) 时检查, 无需 sleep轮询
+    await state.wait_until(lambda s: (s.get('shared_count') or 0) > 8, key='shared_count')
+    count = state.get('shared_count')
+    updater.success(f'触发器触发, 当前count为{count}')
+    raise '通过触发器抛出异常来了结束Task(强行中断所有的线程函数thread_)'
 
 
 if __name__ == '__main__':
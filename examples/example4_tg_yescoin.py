@@ -2,7 +2,7 @@
 Yescoin脚本示例
 
 - [v] 脚本配置参数定义
-- [ ] API函数定义
+- [v] API定义(ApiRegistry)
 - [v] Thread函数定义
 - [v] Thread内嵌网络请求
 """
@@ -36,8 +36,35 @@ class Profile(ScriptProfile):
     SLEEP_BETWEEN_TAP: tuple[int, int] = Field((20, 35), title='随机点击间隔(s)')
 
 
+# 1.API定义: 声明一次, 所有帐户共享; thread函数中通过 caller.api(api_name) 调用, 默认返回 response['data']
+# cache_ttl: 查询类API的缓存时间(App启用缓存时生效), invalidates: 修改数据后失效相关查询的缓存
+API = ApiRegistry(base_url='https://bi.yescoin.gold')
+API.get('getAccountInfo', '/account/getAccountInfo', cache_ttl=10)
+API.get('getGameInfo', '/game/getGameInfo', cache_ttl=10)
+API.get('getSpecialBoxInfo', '/game/getSpecialBoxInfo')
+API.get('getAccountBuildInfo', '/build/getAccountBuildInfo', cache_ttl=300)
+API.post('collectCoin', '/game/collectCoin', invalidates=('getAccountInfo', 'getGameInfo'))
+API.post('collectSpecialBoxCoin', '/game/collectSpecialBoxCoin', invalidates=('getAccountInfo', 'getGameInfo'))
+API.post('recoverCoinPool', '/game/recoverCoinPool', invalidates=('getGameInfo', 'getAccountBuildInfo'))
+API.post('recoverSpecialBox', '/game/recoverSpecialBox', invalidates=('getGameInfo', 'getAccountBuildInfo'))
+API.post('levelUp', '/build/levelUp', invalidates=('getAccountInfo', 'getGameInfo', 'getAccountBuildInfo'))
+API.post('login', '/user/login', extract=('data', 'token'))
+API.post('offline', '/user/offline', extract=(), headers={
+    "accept": "application/json, text/plain, */*",
+    "accept-language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7,hmn;q=0.6",
+    "content-length": "0",
+    "content-type": "application/x-www-form-urlencoded",
+    "origin": "https://www.yescoin.gold",
+    "priority": "u=1, i",
+    "referer": "https://www.yescoin.gold/",
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-site",
+})
+
+
 async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater, caller: APICaller, state: State, ):
-    """1.任务线程定义:
+    """2.任务线程定义:
     :param args: 传入的参数
     :param updater: 用于更新状态(相当于logger)
     :param caller: 发起网络请求/调用API函数
@@ -47,137 +74,41 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
     """
     profile: Profile = args.profile
 
-    # ===
-    # noinspection PyShadowingNames
-    async def _get_account_info() -> dict:
-        try:
-            response = await caller.get(url='https://bi.yescoin.gold/account/getAccountInfo')
-            response.raise_for_status()
-            response_json = await response.json()
-            profile_data = response_json['data']
-            return profile_data
-        except Exception as e:
-            updater.error(f"未知错误 _get_account_info: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
-
-    # noinspection PyShadowingNames
-    async def _get_game_info():
-        try:
-            response = await caller.get(url='https://bi.yescoin.gold/game/getGameInfo')
-            response.raise_for_status()
-            response_json = await response.json()
-            rst = response_json['data']
-            return rst
-        except Exception as e:
-            updater.error(f"未知错误 _get_game_info: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
-
-    # noinspection PyShadowingNames
-    async def _get_special_box_info():
-        try:
-            response = await caller.get(url='https://bi.yescoin.gold/game/getSpecialBoxInfo')
-            response.raise_for_status()
-            response_json = await response.json()
-            special_box_info = response_json['data']
-            return special_box_info
-        except Exception as e:
-            updater.error(f"未知错误 _get_special_box_info: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
-
+    # === API调用见脚本顶部的 API 声明
     # noinspection PyShadowingNames
     async def _send_taps_with_turbo() -> bool:
-        try:
-            special_box_info = await _get_special_box_info()
-            box_type = special_box_info['recoveryBox']['boxType']
-            taps = special_box_info['recoveryBox']['specialBoxTotalCount']
-            await asyncio.sleep(delay=10)
-            response = await caller.post(url='https://bi.yescoin.gold/game/collectSpecialBoxCoin',
-                                         json={'boxType': box_type, 'coinCount': taps})
-            response.raise_for_status()
-            response_json = await response.json()
-            if not response_json['data']:
-                return False
-            status = response_json['data']['collectStatus']
-            return status
-        except Exception as e:
-            updater.error(f"未知错误 when Tapping: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
+        special_box_info = await caller.api('getSpecialBoxInfo')
+        box_type = special_box_info['recoveryBox']['boxType']
+        taps = special_box_info['recoveryBox']['specialBoxTotalCount']
+        await asyncio.sleep(delay=10)
+        data = await caller.api('collectSpecialBoxCoin', data={'boxType': box_type, 'coinCount': taps})
+        return data['collectStatus'] if data else False
 
     # noinspection PyShadowingNames
     async def _send_taps(taps: int, ) -> bool:
-        try:
-            response = await caller.post(url='https://bi.yescoin.gold/game/collectCoin', json=taps)
-            response.raise_for_status()
-            response_json = await response.json()
-            if not response_json['data']:
-                return False
-            status = response_json['data']['collectStatus']
-            return status
-        except Exception as e:
-            updater.error(f"未知错误 _send_taps: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
+        data = await caller.api('collectCoin', data=taps)
+        return data['collectStatus'] if data else False
 
     # noinspection PyShadowingNames
-    async def _get_boosts_info():
+    async def _boost(api_name: str, data=None):
+        """升级/加速: 失败不影响task"""
         try:
-            response = await caller.get(url='https://bi.yescoin.gold/build/getAccountBuildInfo')
-            response.raise_for_status()
-            response_json = await response.json()
-            boosts_info = response_json['data']
-            return boosts_info
+            return await caller.api(api_name, data=data)
         except Exception as e:
-            updater.error(f"未知错误 _get_boosts_info: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
-
-    # noinspection PyShadowingNames
-    async def _apply_energy_boost():
-        try:
-            response = await caller.post(url='https://bi.yescoin.gold/game/recoverCoinPool')
-            response.raise_for_status()
-            response_json = await response.json()
-            return response_json['data']
-        except Exception as e:
-            updater.error(f"未知错误 when _apply_energy_boost: {e}", error=e)
-            await asyncio.sleep(delay=3)
-            return False
-
-    # noinspection PyShadowingNames
-    async def _apply_turbo_boost():
-        try:
-            response = await caller.post(url='https://bi.yescoin.gold/game/recoverSpecialBox')
-            response.raise_for_status()
-            response_json = await response.json()
-            return response_json['data']
-        except Exception as e:
-            updater.error(f"未知错误 _apply_turbo_boost: {e}", error=e)
-            await asyncio.sleep(delay=3)
-            return False
-
-    # noinspection PyShadowingNames
-    async def _level_up(boost_id: int, ) -> bool:
-        try:
-            response = await caller.post(url='https://bi.yescoin.gold/build/levelUp', json=boost_id)
-            response.raise_for_status()
-            response_json = await response.json()
-            return response_json['data']
-        except Exception as e:
-            updater.error(f"未知错误 _level_up {boost_id} Boost: {e}", error=e)
+            updater.error(f"未知错误 {api_name}: {e}", error=e)
             await asyncio.sleep(delay=3)
             return False
 
     # ===
     active_turbo = False
     while True:
-        if state.get('profile_data') is None:  # 只有在登陆成功,且进入游戏获取data后才进行task
-            await asyncio.sleep(2)
-            continue
-        updater.info(f"thread_task-on loop")
+        await state.wait_for('profile_data')  # 只有在登陆成功,且进入游戏获取data后才进行task
+        updater.info("thread_task-on loop")
         balance = state.get('profile_data')['currentAmount']
         try:
             # 刷新状态
             taps = randint(*profile.RANDOM_TAPS_COUNT)
-            game_data = await _get_game_info()
-            # game_data = await call_api(RequestOptions(api_name='get_game_info'))
+            game_data = await caller.api('getGameInfo')
             available_energy = game_data['coinPoolLeftCount']
             coins_by_tap = game_data['singleCoinValue']
             if active_turbo:
@@ -187,7 +118,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                 if taps * coins_by_tap >= available_energy:
                     taps = abs(available_energy // 10 - 1)
                 status = await _send_taps(taps=taps, )
-            profile_data = await _get_account_info()
+            profile_data = await caller.api('getAccountInfo')
             if not profile_data or not status:
                 continue
             state.set('profile_data', profile_data)
@@ -196,7 +127,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
             balance = new_balance
             total = profile_data['totalAmount']
             updater.success(f"点击完成! | 余额: {balance} (+{calc_taps}) | 总数: {total}")
-            boosts_info = await _get_boosts_info()
+            boosts_info = await caller.api('getAccountBuildInfo')
 
             turbo_boost_count = boosts_info['specialBoxLeftRecoveryCount']
             energy_boost_count = boosts_info['coinPoolLeftRecoveryCount']
@@ -216,8 +147,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                     updater.info(f"等待 5s 激活每日 能量升级")
                     await asyncio.sleep(delay=5)
 
-                    status = await _apply_energy_boost()
-                    # status = await call_api(RequestOptions(api_name='apply_energy_boost'))
+                    status = await _boost('recoverCoinPool')
                     if status is True:
                         updater.success(f"能量升级 完成")
                         await asyncio.sleep(delay=1)
@@ -227,7 +157,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                     updater.info(f"等待 5s 激活每日 turbo boost")
                     await asyncio.sleep(delay=5)
 
-                    if await _apply_turbo_boost():
+                    if await _boost('recoverSpecialBox'):
                         updater.success(f"Turbo boost 完成")
                         await asyncio.sleep(delay=1)
                         active_turbo = True
@@ -241,7 +171,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                     updater.info(f"等待 5s: 准备 点击升级到 lv[ {next_tap_level} ]")
                     await asyncio.sleep(delay=5)
 
-                    if await _level_up(boost_id=1, ):
+                    if await _boost('levelUp', data=1):
                         updater.success(f"点击升级到 lv[ {next_tap_level} ]")
                         await asyncio.sleep(delay=1)
                     continue
@@ -252,7 +182,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                     updater.info(f"等待 5s:准备 能量升级到 lv[ {next_energy_level} ]")
                     await asyncio.sleep(delay=5)
 
-                    status = await _level_up(boost_id=3, )
+                    status = await _boost('levelUp', data=3)
                     if status is True:
                         updater.success(f"能量升级到 lv[ {next_energy_level} ]")
                         await asyncio.sleep(delay=1)
@@ -264,7 +194,7 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
                     updater.info(f"等待 5s:准备 升级到 lv[ {next_charge_level} ]")
                     await asyncio.sleep(delay=5)
 
-                    status = await _level_up(boost_id=2, )
+                    status = await _boost('levelUp', data=2)
                     if status is True:
                         updater.success(f"升级到 lv[ {next_charge_level} ]")
                         await asyncio.sleep(delay=1)
@@ -287,75 +217,54 @@ async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater,
             if active_turbo is True:
                 active_turbo = False
 
-            updater.info(f"点击间隔等待[ {sleep_between_clicks} ]s")
+            updater.info("点击间隔等待[ {} ]s", fmt_args=(sleep_between_clicks,))
             await asyncio.sleep(delay=sleep_between_clicks)
     pass
 
 
 async def thread_auth(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater, caller: APICaller, state: State, ):
-    """更新游戏状态: 每1小时刷新用户auth信息
+    """更新游戏状态: tma token到期前(按帐户错开)刷新用户auth信息
      包括token
     """
     tele_proxy = args.tg_session['proxy_ip']
+    session_name = args.tg_session['session_name']
     tma_url = choice(args.profile.TMA_URL)  # 随机选一个
     telegram_plugin = PluginTelegram.of_args(args, updater)
     net_plugin = PluginNetwork.of_args(args, updater)
 
-    from time import time
-
     # noinspection PyShadowingNames
     async def _login(tg_web_data: str, ) -> str:
         try:
             assert tg_web_data is not None, 'tg_web_data为None,获取tg数据失败'
-            response = await caller.post(url='https://bi.yescoin.gold/user/login',
-                                         json={"code": tg_web_data})
-            response.raise_for_status()
-            response_json = await response.json()
-            token = response_json['data']['token']
-            return token
+            return await caller.api('login', data={"code": tg_web_data})
         except Exception as e:
             updater.error(f"未知错误 _login: {e}", error=e, extra={'args': f'tg_web_data#{tg_web_data}'})
             raise e  # 重新抛出,交给loop处理
 
-    # noinspection PyShadowingNames
-    async def _get_account_info() -> dict:
+    while True:
         try:
-            response = await caller.get(url='https://bi.yescoin.gold/account/getAccountInfo')
-            response.raise_for_status()
-            response_json = await response.json()
-            profile_data = response_json['data']
-            return profile_data
+            ip = await net_plugin.check_proxy_ip(proxies=[tele_proxy])  # 检测proxy是否可用
+            updater.info(f"on loop # Tele IP[ {ip} ]")
+            # tg.login === (token未到刷新时间时直接使用缓存; App启动时 PluginTelegram.tokens.attach(store) 后重启也不会重新请求)
+            tma_token = await telegram_plugin.get_tma_token_cached(session_name, tma_url)
+            access_token = await _login(tg_web_data=tma_token)
+            updater.debug('获得token#', extra={'token': access_token})
+            caller.session.headers["Token"] = access_token
+            state.set('access_token', access_token)
+
+            # yescoin.profile ===
+            profile_data = await caller.api('getAccountInfo')
+            state.set('profile_data', profile_data)
+        except FatalExecutorException as e:
+            raise e
+        except ExecutorException as e:  # 普通错误(断网等), 尝试sleep后重试
+            updater.error(f"{e}", error=e)
+            await asyncio.sleep(30)
         except Exception as e:
-            updater.error(f"未知错误 _get_account_info: {e}", error=e)
-            raise e  # 重新抛出,交给loop处理
-
-    access_token_created_time = 0
-    while True:
-        if time() - access_token_created_time >= 3600:  # 每小时更新
-            try:
-                ip = await net_plugin.check_proxy_ip(proxies=[tele_proxy])  # 检测proxy是否可用
-                updater.info(f"on loop # Tele IP[ {ip} ]")
-                # tg.login ===
-                tma_token = await telegram_plugin.get_tma_token(tma_url)
-                access_token = await _login(tg_web_data=tma_token)
-                updater.debug('获得token#', extra={'token': access_token})
-                caller.session.headers["Token"] = access_token
-                access_token_created_time = time()
-                state.set('access_token', access_token)
-
-                # yescoin.profile ===
-                profile_data = await _get_account_info()
-                state.set('profile_data', profile_data)
-            except FatalExecutorException as e:
-                raise e
-            except ExecutorException as e:  # 普通错误(断网等), 尝试sleep后重试
-                updater.error(f"{e}", error=e)
-                await asyncio.sleep(30)
-            except Exception as e:
-                updater.error(f"未知错误 {type(e)}: {e}", error=e)
-                raise e  # 未知的错误等同严重错误,尝试退出任务
+            updater.error(f"未知错误 {type(e)}: {e}", error=e)
+            raise e  # 未知的错误等同严重错误,尝试退出任务
         else:
-            await asyncio.sleep(60)  # 每分钟检查一次
+            await asyncio.sleep(max(60., telegram_plugin.tokens.refresh_in(session_name, tma_url)))
     pass
 
 
@@ -364,35 +273,18 @@ async def thread_offline(args: ScriptRuntimeArgs[Profile], updater: StatusUpdate
 
     async def _offline(token: str, ) -> str | None:
         """活跃时每8s发送一次;否则1分钟一次"""
-        _yes_coin_offline_header = {
-            "accept": "application/json, text/plain, */*",
-            "accept-language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7,hmn;q=0.6",
-            "content-length": "0",
-            "content-type": "application/x-www-form-urlencoded",
-            "origin": "https://www.yescoin.gold",
-            "priority": "u=1, i",
-            "referer": "https://www.yescoin.gold/",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-site",
-            "token": token,
-            "user-agent": useragent
-        }
         try:
-            async with caller.post(url='https://bi.yescoin.gold/user/offline',
-                                   headers=_yes_coin_offline_header, ) as response:
-                response.raise_for_status()
-                response_json = await response.json()
-                updater.info(f"on loop #{response_json}")
-                return response_json['data']
+            response_json = await caller.api('offline', update_headers={"token": token, "user-agent": useragent})
+            updater.info("on loop #{}", fmt_args=(response_json,))  # 仅在INFO启用时格式化
+            return response_json['data']
         except Exception as e:
             updater.warning(f"未知错误 _offline(不影响task): {e}", error=e)
             await asyncio.sleep(delay=1)
             return None
 
     while True:
-        if (tk := state.get('token')) is not None:
-            await _offline(token=tk)
+        tk = await state.wait_for('token')  # 等待登陆, 无需轮询
+        await _offline(token=tk)
         await asyncio.sleep(8)  #
     pass
 
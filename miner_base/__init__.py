@@ -1,3 +1,50 @@
+"""
+按需导入: `import miner_base` 只加载 exception; 其他名称(pydantic模型, 插件等)在首次访问时才导入对应模块
+`from miner_base import *` 仍然导出全部名称
+"""
+import importlib
+
 from .exception import *
-from .model import *
-from .plugins import *
+from .exception import __all__ as _exception_all
+
+_LAZY: dict[str, str] = {
+    **dict.fromkeys(['AgentInfo', 'TgSessionArgs', 'STATE_OP', 'StateListener', 'State', 'RequestOptions',
+                     'APICaller', 'TSK_STATUS', 'LOG_LEVEL', 'LOG_LEVEL_NO', 'LOG_MSG', 'ON_LOG', 'StatusUpdater',
+                     'GFMPlugin', 'ScriptProfile', 'P', 'ScriptRuntimeArgs', 'TmaParam', 'TmaParam_of',
+                     'TeleProxyJSON', 'TeleProxyJSON_to_snapshot', 'TeleMobaiPlat',
+                     # 脚本通过 `from miner_base import *` 使用的依赖
+                     'BaseModel', 'Field', 'PrivateAttr', 'dataclass', 'TypeVar', 'TypedDict'], '.model'),
+    **dict.fromkeys(['ApiSpec', 'ApiRegistry', 'ResponseCache'], '.api'),
+    **dict.fromkeys(['PluginTelegram', 'PluginNetwork'], '.plugins'),
+    'ProxyHealthPool': '.proxy',
+    'TmaTokenCache': '.tma',
+    'TmaTokenBatcher': '.telegram',
+    'ABC': 'abc',
+    'abstractmethod': 'abc',
+    're': 're',
+    **dict.fromkeys(['Optional', 'Any', 'Union', 'Mapping', 'Callable', 'Awaitable', 'Iterable', 'Unpack', 'Generic',
+                     'AsyncIterator', 'Literal'], 'typing'),
+}
+
+# aiohttp类型只能显式导入(from miner_base import ClientSession), `import *` 不再加载aiohttp
+_LAZY_EXPLICIT: dict[str, str] = {
+    **dict.fromkeys(['ClientResponse', 'BasicAuth', 'Fingerprint', 'ClientTimeout', 'ClientSession'], 'aiohttp'),
+    'SSLContext': 'aiohttp.client',
+    **dict.fromkeys(['LooseHeaders', 'StrOrURL', 'LooseCookies', 'Query'], 'aiohttp.typedefs'),
+}
+
+__all__ = [*_exception_all, *_LAZY]
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name) or _LAZY_EXPLICIT.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module = importlib.import_module(module, __name__)
+    value = module if module.__name__ == name else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY, *_LAZY_EXPLICIT})
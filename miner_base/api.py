@@ -0,0 +1,232 @@
+"""
+API注册表: 在脚本中声明一次 api_name => 请求模板, 通过 `caller.api(api_name, ...)` 调用
+模板在声明时编译为不可变对象, 所有帐户共享; 每次调用只合并传入的覆盖参数
+
+>>> API = ApiRegistry(base_url='https://bi.yescoin.gold')
+>>> API.get('getGameInfo', '/game/getGameInfo')  # 默认提取 response['data']
+>>> API.post('levelUp', '/build/levelUp')
+>>> game_info = await caller.api('getGameInfo')
+>>> await caller.api('levelUp', data=1)
+"""
+import asyncio
+import string
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Literal, Mapping, Optional, Callable, Awaitable, Iterable
+
+from miner_base.exception import InteractorArgsException
+
+__all__ = ['ApiSpec', 'ApiRegistry', 'ResponseCache']
+
+_EMPTY: Mapping = MappingProxyType({})
+
+
+def _frozen(mapping: Mapping | None) -> Mapping:
+    return MappingProxyType(dict(mapping)) if mapping else _EMPTY
+
+
+def _merge(base: Mapping, replace: Mapping | None, update: Mapping | None) -> Mapping:
+    """replace替换base; update在此基础上更新; 都为空时直接返回共享的base"""
+    if replace is not None:
+        base = replace
+    if update:
+        return {**base, **update}
+    return base
+
+
+@dataclass(frozen=True, slots=True)
+class ApiSpec:
+    """编译后的请求模板"""
+    name: str
+    method: str
+    url: str
+    headers: Mapping[str, str] = field(default_factory=lambda: _EMPTY)
+    params: Mapping[str, Any] = field(default_factory=lambda: _EMPTY)
+    extract: tuple[str | int, ...] = ('data',)
+    body: Literal['json', 'data'] = 'json'
+    url_fields: tuple[str, ...] = ()  # url模板中的 {field}
+    cache_ttl: float | None = None
+    invalidates: tuple[str, ...] = ()
+
+    def request(self,
+                url: Optional[str] = None,
+                headers: Optional[Mapping] = None,
+                params: Optional[Mapping] = None,
+                data: Any = None,
+                update_headers: Optional[Mapping] = None,
+                update_params: Optional[Mapping] = None,
+                url_vars: Optional[Mapping] = None) -> tuple[str, str, dict]:
+        """合并覆盖参数: headers/params 替换模板, update_* 更新模板
+        :return: (method, url, aiohttp请求参数)
+        """
+        if url is None:
+            url = self.url
+            if self.url_fields:
+                if not url_vars:
+                    raise InteractorArgsException(f'API {self.name} 需要url_vars: {self.url_fields}',
+                                                  {'api_name': self.name})
+                url = url.format_map(url_vars)
+        options = {'headers': _merge(self.headers, headers, update_headers),
+                   'params': _merge(self.params, params, update_params)}
+        if data is not None:
+            options[self.body] = data
+        return self.method, url, options
+
+    def parse(self, payload: Any) -> Any:
+        """按extract路径提取响应数据"""
+        for key in self.extract:
+            if payload is None:
+                return None
+            payload = payload[key]
+        return payload
+
+
+class ApiRegistry:
+    """脚本的API声明, 一般在脚本模块顶层定义一次"""
+
+    def __init__(self, base_url: str = '', headers: Mapping | None = None, params: Mapping | None = None):
+        """
+        :param base_url: 所有API的url前缀
+        :param headers: 所有API共用的请求头
+        :param params: 所有API共用的请求参数
+        """
+        self.base_url = base_url.rstrip('/')
+        self.headers = _frozen(headers)
+        self.params = _frozen(params)
+        self._specs: dict[str, ApiSpec] = {}
+
+    def define(self, name: str, path: str, method: str = 'GET',
+               headers: Mapping | None = None,
+               params: Mapping | None = None,
+               extract: tuple[str | int, ...] = ('data',),
+               body: Literal['json', 'data'] = 'json',
+               cache_ttl: float | None = None,
+               invalidates: tuple[str, ...] = ()) -> ApiSpec:
+        """声明API
+        :param name: api_name
+        :param path: url路径(拼接在base_url后)或完整url, 可包含 {field} 占位, 调用时通过 url_vars 填充
+        :param headers: 该API的请求头, 合并在公共请求头之上
+        :param params: 该API的请求参数
+        :param extract: 响应JSON的提取路径, () 返回完整JSON
+        :param body: 调用时传入的data作为 json(默认) 或 form data 发送
+        :param cache_ttl: 幂等API的响应缓存时间(s), 需要caller启用ResponseCache; 0为只合并同时发出的相同请求
+        :param invalidates: 调用成功后失效这些API的缓存(修改数据的API)
+        """
+        url = path if '://' in path else f'{self.base_url}/{path.lstrip("/")}'
+        fields = tuple(f for _, f, _, _ in string.Formatter().parse(url) if f)
+        spec = ApiSpec(name=name, method=method.upper(), url=url,
+                       headers=_frozen({**self.headers, **(headers or {})}),
+                       params=_frozen({**self.params, **(params or {})}),
+                       extract=tuple(extract), body=body, url_fields=fields,
+                       cache_ttl=cache_ttl, invalidates=tuple(invalidates))
+        self._specs[name] = spec
+        return spec
+
+    def get(self, name: str, path: str, **kwargs) -> ApiSpec:
+        return self.define(name, path, 'GET', **kwargs)
+
+    def post(self, name: str, path: str, **kwargs) -> ApiSpec:
+        return self.define(name, path, 'POST', **kwargs)
+
+    def __getitem__(self, name: str) -> ApiSpec:
+        try:
+            return self._specs[name]
+        except KeyError:
+            raise InteractorArgsException(f'未注册的API: {name}', {'api_name': name}) from None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __iter__(self):
+        return iter(self._specs.values())
+
+    def rebase(self, base_url: str) -> 'ApiRegistry':
+        """替换base_url(例如测试环境/mock服务), 返回新的注册表"""
+        registry = ApiRegistry(base_url, self.headers, self.params)
+        for spec in self._specs.values():
+            path = spec.url[len(self.base_url):] if spec.url.startswith(self.base_url) else spec.url
+            registry.define(spec.name, path, spec.method, spec.headers, spec.params, spec.extract, spec.body,
+                            spec.cache_ttl, spec.invalidates)
+        return registry
+
+
+CacheKey = tuple[Any, str, str, str, tuple, str, tuple]
+
+
+class ResponseCache:
+    """API响应缓存, 仅用于声明了cache_ttl的API
+    - 按(帐户, api_name, method, url, params, data, 其他请求参数)缓存解析后的响应, 到期或被 invalidates 的API调用后失效
+    - 同时发出的相同请求只发送一次(single-flight), 所有调用方共享结果或异常
+    缓存的值在调用方之间共享, 请勿修改
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[CacheKey, tuple[float, Any]] = {}  # key => (time.monotonic() 过期时间, value)
+        self._inflight: dict[CacheKey, asyncio.Future] = {}
+        self._index: dict[tuple[Any, str], set[CacheKey]] = {}  # (帐户, api_name) => keys
+
+    @staticmethod
+    def key_of(account: Any, spec: ApiSpec, method: str, url: str, options: Mapping) -> CacheKey:
+        """options为合并后的aiohttp请求参数; headers不参与(按帐户区分), 其余参数(params/json/data/...)都参与"""
+        params = options.get('params')
+        body = options.get(spec.body)
+        return (account, spec.name, method, str(url),
+                tuple(sorted(params.items())) if params else (),
+                '' if body is None else repr(body),
+                tuple(sorted((k, repr(v)) for k, v in options.items() if k not in ('headers', 'params', spec.body))))
+
+    async def get_or_fetch(self, key: CacheKey, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._drop(key)
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = self._inflight[key] = asyncio.ensure_future(self._fetch(key, ttl, fetch))
+        else:
+            self.hits += 1
+        return await asyncio.shield(future)  # 调用方被取消时不影响其他等待者
+
+    async def _fetch(self, key: CacheKey, ttl: float, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await fetch()
+        finally:
+            invalidated = self._inflight.get(key) is not task  # 请求期间被invalidate: 值可能是修改前的, 不缓存
+            if not invalidated:
+                del self._inflight[key]
+        if ttl > 0 and not invalidated:
+            if len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._index.setdefault(key[:2], set()).add(key)
+        return value
+
+    def _drop(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._index.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._index[key[:2]]
+
+    def invalidate(self, account: Any, api_names: Iterable[str]):
+        """失效帐户的这些API缓存; 进行中的请求结果不再缓存, 之后的调用方重新请求"""
+        for api_name in api_names:
+            for key in self._index.pop((account, api_name), ()):
+                self._entries.pop(key, None)
+        if self._inflight:
+            names = set(api_names)
+            for key in [k for k in self._inflight if k[0] == account and k[1] in names]:
+                del self._inflight[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._index.clear()
@@ -0,0 +1,153 @@
+"""
+JSON编解码: 响应解析(APICaller)、请求body(`json=`)、日志(LoggerStatusUpdater)、State持久化共用
+已安装 orjson 或 msgspec 时自动使用, 否则使用标准库json; 可通过环境变量 MINER_JSON=orjson|msgspec|json 指定
+
+>>> from miner_base import codec
+>>> codec.loads(b'{"code": 0}')
+>>> codec.dumps({'msg': '余额'}, default=str)  # 不转义非ASCII字符, 无多余空格
+>>> codec.use('json')  # 切换后端
+>>> codec.use('orjson', exact_ints=True)  # 超出64位的整数也精确解析(或设置环境变量 MINER_JSON_EXACT_INTS=1)
+
+各后端的结果相同, 例外:
+- NaN/Infinity 在orjson/msgspec中写为null(标准库写为不合法JSON的NaN)
+- 超出64位的整数: 写出始终精确; 解析时orjson/msgspec默认得到float(丢失精度), exact_ints=True 时与标准库相同
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Callable
+
+__all__ = ['JsonCodec', 'available', 'get_codec', 'use', 'loads', 'dumps', 'dumpb']
+
+DEFAULT = Callable[[Any], Any]
+
+
+@dataclass(frozen=True, slots=True)
+class JsonCodec:
+    name: str
+    loads: Callable[[bytes | str], Any]
+    dumps: Callable[..., str]  # (obj, default=None) -> str
+    dumpb: Callable[..., bytes]  # (obj, default=None) -> bytes
+    exact_ints: bool = True  # loads是否精确解析超出64位的整数
+
+
+def _stdlib() -> JsonCodec:
+    def dumps(obj: Any, default: DEFAULT | None = None) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default)
+
+    def dumpb(obj: Any, default: DEFAULT | None = None) -> bytes:
+        return dumps(obj, default).encode()
+
+    return JsonCodec('json', json.loads, dumps, dumpb)
+
+
+# 20位以上的数字可能超出64位整数: orjson解析为float(丢失精度), exact_ints时交给标准库处理
+# 检查方式: 数字映射为b'0', 其他字节映射为b' ', 再查找连续20个b'0'(比正则快数倍)
+# 每次loads多一次全文复制+扫描(约为orjson解析耗时的20%), 因此默认不检查; 检查解析结果中的大float比扫描更慢
+_DIGITS = bytes(0x30 if 0x30 <= i <= 0x39 else 0x20 for i in range(256))
+_LONG_DIGITS = b'0' * 20
+
+
+def _exact(name: str, loads: Callable[[bytes | str], Any], dumpb: Callable[..., bytes],
+           exact_ints: bool) -> JsonCodec:
+    """包装orjson/msgspec: 写出超出64位的整数时使用标准库; exact_ints时解析也与标准库相同"""
+    stdlib = _stdlib()
+
+    def exact_loads(data: bytes | str) -> Any:
+        if _LONG_DIGITS in (data.encode() if isinstance(data, str) else bytes(data)).translate(_DIGITS):
+            return stdlib.loads(data)
+        return loads(data)
+
+    def exact_dumpb(obj: Any, default: DEFAULT | None = None) -> bytes:
+        try:
+            return dumpb(obj, default)
+        except (TypeError, OverflowError):  # 整数超出范围, 或无法序列化的对象(标准库同样抛出TypeError)
+            return stdlib.dumpb(obj, default)
+
+    def exact_dumps(obj: Any, default: DEFAULT | None = None) -> str:
+        return exact_dumpb(obj, default).decode()
+
+    return JsonCodec(name, exact_loads if exact_ints else loads, exact_dumps, exact_dumpb, exact_ints)
+
+
+def _orjson(exact_ints: bool) -> JsonCodec:
+    import orjson
+    option = orjson.OPT_NON_STR_KEYS  # 与标准库相同: int等key转为字符串
+
+    def dumpb(obj: Any, default: DEFAULT | None = None) -> bytes:
+        return orjson.dumps(obj, default=default, option=option)
+
+    return _exact('orjson', orjson.loads, dumpb, exact_ints)
+
+
+def _msgspec(exact_ints: bool) -> JsonCodec:
+    import msgspec
+    encoder, decoder = msgspec.json.Encoder(), msgspec.json.Decoder()
+
+    def dumpb(obj: Any, default: DEFAULT | None = None) -> bytes:
+        if default is None:
+            return encoder.encode(obj)
+        return msgspec.json.encode(obj, enc_hook=default)
+
+    return _exact('msgspec', decoder.decode, dumpb, exact_ints)
+
+
+_BACKENDS: dict[str, Callable[[bool], JsonCodec]] = {'orjson': _orjson, 'msgspec': _msgspec,
+                                                     'json': lambda _: _stdlib()}
+_codecs: dict[tuple[str, bool], JsonCodec] = {}
+_current: JsonCodec | None = None
+
+
+def get_codec(name: str | None = None, exact_ints: bool = False) -> JsonCodec:
+    """按名称获取后端, 未安装时抛出ImportError; None为当前使用的后端
+    :param exact_ints: 精确解析超出64位的整数(见模块说明), 标准库始终精确
+    """
+    if name is None:
+        if _current is not None:
+            return _current
+        return use(os.environ.get('MINER_JSON') or None, os.environ.get('MINER_JSON_EXACT_INTS') == '1')
+    codec = _codecs.get((name, exact_ints))
+    if codec is None:
+        if name not in _BACKENDS:
+            raise ValueError(f'未知的JSON后端: {name}, 可选: {list(_BACKENDS)}')
+        codec = _codecs[(name, exact_ints)] = _BACKENDS[name](exact_ints)
+    return codec
+
+
+def available() -> list[str]:
+    """已安装的后端"""
+    result = []
+    for name in _BACKENDS:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        result.append(name)
+    return result
+
+
+def use(codec: str | JsonCodec | None = None, exact_ints: bool = False) -> JsonCodec:
+    """设置进程内使用的后端; None为自动选择(orjson > msgspec > json)
+    已创建的ClientSession(json=请求body)不受影响
+    :param exact_ints: 见 get_codec; codec为JsonCodec实例时忽略
+    """
+    global _current
+    if isinstance(codec, JsonCodec):
+        _current = codec
+    elif codec is not None:
+        _current = get_codec(codec, exact_ints)
+    else:
+        _current = get_codec(available()[0], exact_ints)
+    return _current
+
+
+def loads(data: bytes | str) -> Any:
+    return get_codec().loads(data)
+
+
+def dumps(obj: Any, default: DEFAULT | None = None) -> str:
+    return get_codec().dumps(obj, default)
+
+
+def dumpb(obj: Any, default: DEFAULT | None = None) -> bytes:
+    return get_codec().dumpb(obj, default)
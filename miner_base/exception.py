@@ -1,6 +1,9 @@
 from abc import ABC
 from typing import Literal
 
+__all__ = ['ExecutorException', 'FatalExecutorException', 'InteractorArgsException', 'SessionException', 'ProxyException',
+           'NormalExecutorException', 'NetworkException', 'HttpStatusException']
+
 
 class ExecutorException(ABC, Exception):
     """交互器内部错误, 用于task mgr管理异常
@@ -17,6 +20,15 @@ class ExecutorException(ABC, Exception):
     def __str__(self):
         return f'<{self.__class__.__name__}> {self.err_name}: {self.msg}'
 
+    def __reduce__(self):  # 子类__init__参数各不相同, pickle时不经过__init__, 直接还原属性
+        return _rebuild, (self.__class__, self.__dict__)
+
+
+def _rebuild(cls: type[ExecutorException], state: dict) -> ExecutorException:
+    error = cls.__new__(cls)
+    error.__dict__.update(state)
+    return error
+
 
 class FatalExecutorException(ExecutorException):
     """抛出此类型异常后,仅由retry重试, 仍然失败则结束任务; 一般用于不可自动恢复的错误
@@ -62,7 +74,20 @@ class NormalExecutorException(ExecutorException):
 class NetworkException(NormalExecutorException):
     """本异常代表网络不可用"""
 
-    def __init__(self, msg: str, err_name: Literal['PROXY_TIMEOUT', 'PROXY_ERROR', 'NET_TIMEOUT'] = 'PROXY_TIMEOUT'):
-        super().__init__(msg, err_name, {})
+    def __init__(self, msg: str,
+                 err_name: Literal['PROXY_TIMEOUT', 'PROXY_ERROR', 'NET_TIMEOUT', 'NET_ERROR',
+                                   'CIRCUIT_OPEN'] = 'PROXY_TIMEOUT'):
+        super().__init__(err_name, msg, {})
 
     pass
+
+
+class HttpStatusException(NormalExecutorException):
+    """本异常代表服务端暂时不可用(429, 5xx), 可以重试"""
+
+    def __init__(self, status: int, msg: str = '', url: str = ''):
+        super().__init__(f'HTTP_{status}', msg, {'status': status, 'url': url})
+
+    @property
+    def status(self) -> int:
+        return self.extra.get('status')
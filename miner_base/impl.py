@@ -1,13 +1,28 @@
-import json
-from typing import Any
+import asyncio
+import atexit
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Mapping, Optional, Unpack, Literal, Coroutine
 
-import loguru
+import aiohttp
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, BaseConnector, ClientResponse
+from aiohttp.typedefs import StrOrURL
+from yarl import URL
 
-from miner_base import StatusUpdater, TSK_STATUS, LOG_LEVEL, ON_LOG
+from miner_base import StatusUpdater, TSK_STATUS, LOG_LEVEL, ON_LOG, APICaller, RequestOptions, TgSessionArgs, \
+    TeleProxyJSON, TeleProxyJSON_to_snapshot, InteractorArgsException, ProxyException, NetworkException, ApiRegistry, \
+    ApiSpec, ResponseCache
+from miner_base import codec
+from miner_base.metrics import ApiMetrics
+from miner_base.ratelimit import RateLimiter
+from miner_base.retry import BreakerRegistry, CircuitBreaker, Retry, classify, is_proxy_error
 
 
 class LoggerStatusUpdater(StatusUpdater):
     """用于Test"""
+    __slots__ = ('on_log', '_min_level_no')
     on_log: ON_LOG
 
     def update(self, status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
@@ -15,21 +30,22 @@ class LoggerStatusUpdater(StatusUpdater):
         pass
 
     @classmethod
-    def of(cls, on_log: ON_LOG):
-        return cls(logger=on_log, compatible=False)
+    def of(cls, on_log: ON_LOG, min_level: LOG_LEVEL = 'TRACE'):
+        return cls(logger=on_log, compatible=False, min_level=min_level)
 
     @classmethod
-    def of_logger(cls, lg):
-        return cls(logger=lg, compatible=True)
+    def of_logger(cls, lg, min_level: LOG_LEVEL = 'TRACE'):
+        return cls(logger=lg, compatible=True, min_level=min_level)
 
     @staticmethod
     def _on_log_compatible(logger: Any) -> ON_LOG:
         """用于兼容早期构造"""
         if logger is None:
+            import loguru  # 只有使用默认logger时才导入
             logger = loguru.logger
 
             def on_log(status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
-                _m = json.dumps({'status': status, 'msg': msg, 'extra': extra, 'error': str(error)}, ensure_ascii=False)
+                _m = codec.dumps({'status': status, 'msg': msg, 'extra': extra, 'error': str(error)}, default=str)
                 if level == 'DEBUG':
                     logger.debug(_m)
                 elif level == 'INFO':
@@ -44,15 +60,471 @@ class LoggerStatusUpdater(StatusUpdater):
                     logger.critical(_m)
         else:  # elif logger is print:
             def on_log(status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
-                _m = json.dumps({'lv': level, 'st': status, 'msg': msg, 'extra': extra, 'error': str(error)},
-                                ensure_ascii=False)
+                _m = codec.dumps({'lv': level, 'st': status, 'msg': msg, 'extra': extra, 'error': str(error)},
+                                 default=str)
                 print(_m)
         return on_log
         pass
 
-    def __init__(self, logger: ON_LOG | Any, compatible=True):
+    def __init__(self, logger: ON_LOG | Any, compatible=True, min_level: LOG_LEVEL = 'TRACE'):
         """可以传入 print ,直接打印到cli"""
         if compatible:
             self.on_log = self._on_log_compatible(logger)
         else:
             self.on_log = logger
+        self.min_level = min_level
+
+
+LOG_RECORD = tuple[TSK_STATUS | None, LOG_LEVEL, str, dict, Exception | None]
+
+
+class LogBatcher:
+    """异步批量日志: put(与ON_LOG签名相同)只将记录加入环形缓冲, 由后台协程批量取出,
+    在线程中完成序列化与写入, 避免loguru/print/GUI等慢速输出阻塞event loop
+
+    >>> batcher = LogBatcher.of_logger(None)
+    >>> batcher.start()
+    >>> updater = batcher.updater()
+    >>> await batcher.aclose()  # 退出前写入缓冲中剩余的日志
+    """
+
+    def __init__(self,
+                 on_log: ON_LOG,
+                 maxsize: int = 10000,
+                 overflow: Literal['drop_oldest', 'drop_newest', 'flush'] = 'drop_oldest',
+                 batch_size: int = 500,
+                 flush_interval: float = 0.1):
+        """
+        :param on_log: 实际的日志输出, 在线程中调用
+        :param maxsize: 缓冲上限
+        :param overflow: 缓冲满时的策略: drop_oldest 丢弃最早的记录; drop_newest 丢弃新记录; flush 在调用方同步写入一批
+        :param batch_size: 单批最大记录数
+        :param flush_interval: 批次间隔(s), 期间到达的记录合并写入
+        """
+        self.on_log = on_log
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer: deque[LOG_RECORD] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        # on_log同一时间只在一个线程中调用; 在loop线程中先加锁再取出批次, 保证按取出顺序写入
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of_logger(cls, lg, **kwargs):
+        """兼容LoggerStatusUpdater.of_logger: loguru(None) 或 print"""
+        return cls(LoggerStatusUpdater._on_log_compatible(lg), **kwargs)
+
+    def updater(self, min_level: LOG_LEVEL = 'TRACE') -> LoggerStatusUpdater:
+        return LoggerStatusUpdater.of(self.put, min_level=min_level)
+
+    def put(self, status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
+        if len(self._buffer) >= self.maxsize:
+            if self.overflow == 'drop_newest':
+                self.dropped += 1
+                return
+            if self.overflow == 'drop_oldest':
+                self._buffer.popleft()
+                self.dropped += 1
+            else:
+                with self._lock:  # 等待后台线程写完当前批次, 再写入更新的一批
+                    self._write(self._take())
+        self._buffer.append((status, level, msg, extra, error))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take(self) -> list[LOG_RECORD]:
+        buffer = self._buffer
+        return [buffer.popleft() for _ in range(min(self.batch_size, len(buffer)))]
+
+    def _write(self, batch: list[LOG_RECORD]):
+        for record in batch:
+            try:
+                self.on_log(*record)
+            except Exception as e:
+                print(f'LogBatcher: 写入日志失败 {e!r}', file=sys.stderr)
+
+    def _write_and_release(self, batch: list[LOG_RECORD]):
+        try:
+            self._write(batch)
+        finally:
+            self._lock.release()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._buffer:
+                self._lock.acquire()
+                try:
+                    future = loop.run_in_executor(None, self._write_and_release, self._take())
+                except BaseException:
+                    self._lock.release()
+                    raise
+                await asyncio.shield(future)  # 被取消时线程仍会写完并释放锁
+            if self._closing:
+                return
+            await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        """在event loop中启动后台写入协程"""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._wakeup.set()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name='LogBatcher')
+            atexit.register(self.flush)
+
+    def flush(self):
+        """同步写入缓冲中的所有记录"""
+        while self._buffer:
+            with self._lock:
+                self._write(self._take())
+
+    async def aclose(self):
+        """停止后台协程, 并写入剩余记录"""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = self._wakeup = None
+            self._closing = False
+            atexit.unregister(self.flush)
+        await asyncio.to_thread(self.flush)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def proxy_snapshot_of(proxy: str | TeleProxyJSON | None) -> str | None:
+    """统一proxy表示: `tg_session['proxy_ip']` 或 TeleProxyJSON => 快照字符串"""
+    if proxy is None or isinstance(proxy, str):
+        return proxy or None
+    return TeleProxyJSON_to_snapshot(proxy)
+
+
+class SessionPool:
+    """按proxy快照共享的连接池管理器
+    共用同一proxy的帐户共享一个connector(socket keep-alive复用), 而不是每个帐户一个连接池;
+    每个帐户仍然持有独立的ClientSession(headers/cookies互不影响)
+    """
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 10,
+                 keepalive_timeout: float = 30,
+                 ttl_dns_cache: int | None = 300,
+                 timeout: ClientTimeout | None = None,
+                 rate_limiter: RateLimiter | None = None,
+                 breakers: BreakerRegistry | None = None,
+                 metrics: ApiMetrics | None = None):
+        """
+        :param limit: 单个proxy连接池的总连接数上限
+        :param limit_per_host: 单个proxy连接池内, 每个(host, port)的连接数上限
+        :param keepalive_timeout: 空闲连接保持时间(s)
+        :param ttl_dns_cache: DNS缓存时间(s), None为永久
+        :param timeout: session默认超时
+        :param rate_limiter: 所有帐户共享的限速器, None为不限速
+        :param breakers: 所有帐户共享的熔断器(按proxy/host), None为不熔断
+        :param metrics: 所有帐户共享的请求指标(aiohttp TraceConfig), None为不统计
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout or ClientTimeout(total=60)
+        self.rate_limiter = rate_limiter
+        self.breakers = breakers
+        self.metrics = metrics
+        self._connectors: dict[str | None, BaseConnector] = {}
+        self._refs: dict[str | None, int] = {}
+        self._closed = False
+
+    def _create_connector(self, proxy_snap: str | None) -> BaseConnector:
+        options = dict(limit=self.limit, limit_per_host=self.limit_per_host,
+                       keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.ttl_dns_cache)
+        if proxy_snap is not None and proxy_snap.startswith('socks'):
+            try:
+                from aiohttp_socks import ProxyConnector
+            except ImportError:
+                raise ProxyException(proxy_snap, msg='socks代理需要安装 aiohttp_socks')
+            return ProxyConnector.from_url(proxy_snap, **options)
+        return TCPConnector(**options)
+
+    def acquire(self, proxy_snap: str | None) -> BaseConnector:
+        """获取proxy对应的共享connector(引用计数+1), 必须在event loop内调用"""
+        if self._closed:
+            raise RuntimeError('SessionPool is closed')
+        connector = self._connectors.get(proxy_snap)
+        if connector is None or connector.closed:
+            connector = self._connectors[proxy_snap] = self._create_connector(proxy_snap)
+            self._refs[proxy_snap] = 0
+        self._refs[proxy_snap] += 1
+        return connector
+
+    async def release(self, proxy_snap: str | None):
+        """引用计数-1, 不再被任何帐户使用的connector将被关闭"""
+        if proxy_snap not in self._refs:
+            return
+        self._refs[proxy_snap] -= 1
+        if self._refs[proxy_snap] <= 0:
+            del self._refs[proxy_snap]
+            await self._connectors.pop(proxy_snap).close()
+
+    def session(self, proxy_snap: str | None, headers: Mapping | None = None) -> ClientSession:
+        """创建帐户独立的ClientSession, 底层共享proxy对应的connector
+        session关闭时不会关闭connector, 需调用 release"""
+        proxy = proxy_snap if proxy_snap is not None and not proxy_snap.startswith('socks') else None
+        trace_configs = [self.metrics.trace_config] if self.metrics is not None else None
+        return ClientSession(connector=self.acquire(proxy_snap), connector_owner=False,
+                             headers=headers, timeout=self.timeout, proxy=proxy, trace_configs=trace_configs,
+                             json_serialize=codec.get_codec().dumps)
+
+    def stats(self) -> dict[str | None, int]:
+        """proxy快照 => 正在使用的帐户数"""
+        return dict(self._refs)
+
+    async def close(self):
+        self._closed = True
+        connectors, self._connectors = self._connectors, {}
+        self._refs.clear()
+        for connector in connectors.values():
+            await connector.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class _RequestContext:
+    """与aiohttp的 `_RequestContextManager` 用法相同: 可以 await, 也可以 async with"""
+
+    __slots__ = ('_coro', '_response')
+
+    def __init__(self, coro: Coroutine[Any, Any, ClientResponse]):
+        self._coro = coro
+        self._response: ClientResponse | None = None
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self) -> ClientResponse:
+        self._response = await self._coro
+        return self._response
+
+    async def __aexit__(self, *exc):
+        self._response.release()
+        await self._response.wait_for_close()
+
+
+def _loads(body: bytes) -> Any:
+    """与 `response.json(content_type=None)` 相同, 空body返回None; 使用codec直接解析bytes"""
+    return codec.loads(body) if body.strip() else None
+
+
+class AiohttpAPICaller(APICaller):
+    """基于aiohttp的APICaller实现, 连接由SessionPool按proxy共享"""
+
+    def __init__(self, pool: SessionPool, proxy: str | TeleProxyJSON | None = None, headers: Mapping | None = None,
+                 registry: ApiRegistry | None = None, cache: ResponseCache | None = None, account: Any = None,
+                 retry: Retry | None = None):
+        """
+        :param pool: 共享连接池
+        :param proxy: 帐户的proxy
+        :param headers: 帐户session的默认请求头
+        :param registry: 脚本的API注册表, 用于 api()
+        :param cache: API响应缓存(可多个帐户共享), None为不缓存
+        :param account: 帐户标识, 用于区分缓存
+        :param retry: 重试引擎, 只重试 retry.policy.methods 中的方法; None为不重试(也不转换异常)
+        """
+        self._pool = pool
+        self._proxy_snap = proxy_snapshot_of(proxy)
+        self._headers = headers
+        self._session: ClientSession | None = None
+        self.registry = registry
+        self.cache = cache
+        self.account = account
+        self.retry = retry
+
+    @classmethod
+    def of(cls, pool: SessionPool, tg_session: TgSessionArgs, registry: ApiRegistry | None = None,
+           cache: ResponseCache | None = None, retry: Retry | None = None, **kwargs):
+        """:param kwargs: 子类构造参数"""
+        agent_info = tg_session.get('agent_info') or {}
+        headers = {'User-Agent': agent_info['useragent']} if agent_info.get('useragent') else None
+        return cls(pool, proxy=tg_session.get('proxy_ip'), headers=headers, registry=registry, cache=cache,
+                   account=tg_session.get('id'), retry=retry, **kwargs)
+
+    def use(self, registry: ApiRegistry):
+        """设置脚本的API注册表"""
+        self.registry = registry
+        return self
+
+    @property
+    def proxy_snap(self) -> str | None:
+        return self._proxy_snap
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None:
+            self._session = self._pool.session(self._proxy_snap, headers=self._headers)
+        return self._session
+
+    def _request(self, method: str, url: StrOrURL, **kwargs: Unpack[RequestOptions]) -> '_RequestContext':
+        return _RequestContext(self._send(method, url, kwargs))
+
+    def _attempts(self, method: str) -> int | None:
+        """非幂等方法只尝试一次(异常仍按retry转换)"""
+        return None if method.upper() in self.retry.policy.methods else 1
+
+    async def _send(self, method: str, url: StrOrURL, kwargs: dict) -> ClientResponse:
+        if self.retry is not None:
+            return await self.retry.run(lambda: self._send_once(method, url, kwargs), self._proxy_snap,
+                                        self._attempts(method))
+        return await self._send_once(method, url, kwargs)
+
+    async def _send_once(self, method: str, url: StrOrURL, kwargs: dict) -> ClientResponse:
+        if self._pool.metrics is not None and 'trace_request_ctx' not in kwargs:  # 非api()的请求, 按proxy统计
+            kwargs = {**kwargs, 'trace_request_ctx': self._pool.metrics.trace(None, self._proxy_snap)}
+        limiter, breakers = self._pool.rate_limiter, self._pool.breakers
+        if limiter is None and breakers is None:
+            return await self.session.request(method, url, **kwargs)
+        host = URL(url).host
+        proxy_breaker = host_breaker = None
+        probes: list[CircuitBreaker] = []  # 本次请求作为半开探测的熔断器, 没有record时在finally中释放
+        try:
+            if breakers is not None:
+                if self._proxy_snap is not None:
+                    proxy_breaker = breakers.get('proxy', self._proxy_snap)
+                    if proxy_breaker.check():
+                        probes.append(proxy_breaker)
+                host_breaker = breakers.get('host', host)
+                if host_breaker.check():
+                    probes.append(host_breaker)
+            if limiter is not None:
+                await limiter.acquire(host, self.account)
+            t0 = time.monotonic()
+            try:
+                response = await self.session.request(method, url, **kwargs)
+            except Exception as e:
+                if limiter is not None:
+                    limiter.release(host, None)
+                if breakers is not None:
+                    if is_proxy_error(e):  # proxy故障只计入proxy熔断器
+                        if proxy_breaker is not None:
+                            proxy_breaker.record(False)
+                    elif isinstance(classify(e, self._proxy_snap), NetworkException):  # 超时/连接错误: 计入host
+                        host_breaker.record(False)
+                raise
+            except BaseException:
+                if limiter is not None:
+                    limiter.release(host, None)
+                raise
+            if limiter is not None:
+                limiter.release(host, response.status, time.monotonic() - t0,
+                                response.headers.get(aiohttp.hdrs.RETRY_AFTER))
+            if breakers is not None:
+                if proxy_breaker is not None:
+                    proxy_breaker.record(True)
+                host_breaker.record(response.status != 429 and response.status < 500)
+            return response
+        finally:
+            for breaker in probes:  # 已record的熔断器不再是半开状态, release无效果
+                breaker.release()
+
+    async def api(self, api_name: str,
+                  url: Optional[StrOrURL] = None,
+                  headers: Optional[dict] = None,
+                  params: Optional[dict] = None,
+                  data: Optional[dict] = None,
+                  update_headers: Optional[dict] = None,
+                  update_params: Optional[dict] = None,
+                  url_vars: Optional[dict] = None,
+                  **kwargs: Unpack[RequestOptions],
+                  ) -> str | dict:
+        if self.registry is None:
+            raise InteractorArgsException(f'未注册的API: {api_name}', {'api_name': api_name})
+        spec = self.registry[api_name]
+        method, url, options = spec.request(url, headers, params, data, update_headers, update_params, url_vars)
+        if kwargs:
+            options = {**options, **kwargs}
+        if self.cache is not None and spec.cache_ttl is not None:
+            key = self.cache.key_of(self.account, spec, method, url, options)
+            result = await self.cache.get_or_fetch(key, spec.cache_ttl, lambda: self._call(spec, method, url, options))
+        else:
+            result = await self._call(spec, method, url, options)
+        if self.cache is not None and spec.invalidates:  # 缓存的API也可以声明invalidates
+            self.cache.invalidate(self.account, spec.invalidates)
+        return result
+
+    async def _call(self, spec: ApiSpec, method: str, url: StrOrURL, options: dict):
+        """整个请求(包括状态码检查与响应解析)作为一次尝试重试"""
+        if self.retry is not None:
+            return await self.retry.run(lambda: self._call_once(spec, method, url, options), self._proxy_snap,
+                                        self._attempts(method))
+        return await self._call_once(spec, method, url, options)
+
+    async def _call_once(self, spec: ApiSpec, method: str, url: StrOrURL, options: dict):
+        metrics = self._pool.metrics if self._pool is not None else None
+        if metrics is not None and 'trace_request_ctx' not in options:
+            trace = metrics.trace(spec.name, self._proxy_snap)
+            options = {**options, 'trace_request_ctx': trace}
+            try:
+                async with _RequestContext(self._send_once(method, url, options)) as response:
+                    response.raise_for_status()
+                    return spec.parse(_loads(await response.read()))
+            finally:  # 失败(状态码/解析/超时)的调用也计入total, 否则慢或失败的API看起来更快
+                metrics.observe_total(trace)
+        async with _RequestContext(self._send_once(method, url, options)) as response:
+            response.raise_for_status()
+            return spec.parse(_loads(await response.read()))
+
+    def invalidate(self, *api_names: str):
+        """失效本帐户的API缓存"""
+        if self.cache is not None:
+            self.cache.invalidate(self.account, api_names)
+
+    def get(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_GET, url, **kwargs)
+
+    def options(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_OPTIONS, url, **kwargs)
+
+    def head(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_HEAD, url, **kwargs)
+
+    def post(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_POST, url, **kwargs)
+
+    def put(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_PUT, url, **kwargs)
+
+    def patch(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_PATCH, url, **kwargs)
+
+    def delete(self, url: StrOrURL, **kwargs: Unpack[RequestOptions]):
+        return self._request(aiohttp.hdrs.METH_DELETE, url, **kwargs)
+
+    async def close(self):
+        """关闭帐户session并释放共享connector"""
+        if self._session is None:
+            return
+        session, self._session = self._session, None
+        await session.close()
+        await self._pool.release(self._proxy_snap)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,213 @@
+"""
+脚本加载器
+- 通过AST静态读取脚本中的 `thread_` 协程函数与Profile类, 不执行脚本顶层代码
+- 编译后的code对象按路径与内容hash缓存(内存 + 可选的磁盘目录), 内容未变时不再重新解析
+- 同一脚本只加载一次, 所有帐户共享同一个模块
+- 热更新: 脚本内容变化后加载新模块; 正在运行的thread函数不受影响, 之后(重)启动的thread函数使用新代码
+
+>>> loader = ScriptLoader(cache_dir='.script_cache')
+>>> info = loader.inspect('examples/example4_tg_yescoin.py')  # 只解析, 不执行
+>>> script = loader.load('examples/example4_tg_yescoin.py')
+>>> runner = TaskRunner(script.threads)
+>>> asyncio.create_task(loader.watch(script.path, runner))  # 热更新
+"""
+import ast
+import asyncio
+import hashlib
+import importlib.util
+import inspect
+import marshal
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from types import CodeType, ModuleType
+from typing import Callable
+
+from miner_base.api import ApiRegistry
+from miner_base.exception import InteractorArgsException
+from miner_base.model import ScriptProfile
+from miner_base.runner import THREAD_PREFIX, TaskRunner, ThreadFunc, discover_registry
+
+
+@dataclass(frozen=True, slots=True)
+class ScriptInfo:
+    """AST静态解析结果"""
+    name: str  # 脚本名(不含扩展名); 模块名为 miner_script_{name}_{hash}
+    path: str
+    digest: str  # 内容sha256
+    threads: tuple[str, ...]  # thread_ 协程函数名
+    profile: str | None  # Profile类名(最后定义的ScriptProfile子类, 与 runner.discover_profile 相同)
+    doc: str | None = None
+
+
+def inspect_source(source: bytes | str, path: str = '<script>') -> ScriptInfo:
+    """静态解析脚本源码"""
+    if isinstance(source, str):
+        source = source.encode()
+    tree = ast.parse(source, path)
+    threads = []
+    profiles: set[str] = {'ScriptProfile'}
+    profile = None
+    for node in tree.body:
+        if isinstance(node, ast.AsyncFunctionDef) and node.name.startswith(THREAD_PREFIX):
+            threads.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            bases = {b.id if isinstance(b, ast.Name) else b.attr if isinstance(b, ast.Attribute) else None
+                     for b in node.bases}
+            if bases & profiles:  # 直接或间接继承ScriptProfile, 取最后定义的(最终的子类)
+                profiles.add(node.name)
+                profile = node.name
+    name = os.path.splitext(os.path.basename(path))[0]
+    return ScriptInfo(name=name, path=path, digest=hashlib.sha256(source).hexdigest(), threads=tuple(threads),
+                      profile=profile, doc=ast.get_docstring(tree))
+
+
+@dataclass(slots=True, eq=False)
+class LoadedScript:
+    """已加载的脚本, 所有帐户共享"""
+    info: ScriptInfo
+    module: ModuleType
+    threads: dict[str, ThreadFunc]
+    profile: type[ScriptProfile]
+    registry: ApiRegistry | None
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def path(self) -> str:
+        return self.info.path
+
+
+class ScriptLoader:
+    """进程内共享的脚本加载器"""
+
+    def __init__(self, cache_dir: str | None = None):
+        """
+        :param cache_dir: 编译结果的磁盘缓存目录(按内容hash), 多个worker进程共用; None为只缓存在内存中
+        """
+        self.cache_dir = cache_dir
+        self.compiles = 0
+        self._code: dict[str, CodeType] = {}  # _key_of(info) => code
+        self._info: dict[str, ScriptInfo] = {}  # digest => info
+        self._scripts: dict[str, LoadedScript] = {}  # abspath => script
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise InteractorArgsException(f'无法读取脚本: {path}: {e}', {'script': path}) from e
+
+    def _inspect(self, source: bytes, path: str) -> ScriptInfo:
+        digest = hashlib.sha256(source).hexdigest()
+        info = self._info.get(digest)
+        if info is None or info.path != path:
+            info = self._info[digest] = inspect_source(source, path)
+        return info
+
+    def inspect(self, path: str) -> ScriptInfo:
+        """静态解析脚本, 不执行顶层代码"""
+        return self._inspect(self._read(path), os.path.abspath(path))
+
+    @staticmethod
+    def _key_of(info: ScriptInfo) -> str:
+        """编译缓存与模块名的key: 内容相同但路径不同的脚本分别编译(co_filename为各自的路径)"""
+        return hashlib.sha256(f'{info.path}\0{info.digest}'.encode()).hexdigest()
+
+    def _cache_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.{sys.implementation.cache_tag}.pyc')
+
+    def _compile(self, source: bytes, info: ScriptInfo) -> CodeType:
+        key = self._key_of(info)
+        code = self._code.get(key)
+        if code is not None:
+            return code
+        cache_file = self._cache_file(key) if self.cache_dir is not None else None
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, 'rb') as f:
+                data = f.read()
+            if data[:len(importlib.util.MAGIC_NUMBER)] == importlib.util.MAGIC_NUMBER:
+                try:
+                    code = marshal.loads(data[len(importlib.util.MAGIC_NUMBER):])
+                except (ValueError, EOFError, TypeError):  # 缓存文件损坏或不完整: 重新编译并覆盖
+                    code = None
+        if code is None:
+            code = compile(source, info.path, 'exec', dont_inherit=True)
+            self.compiles += 1
+            if cache_file is not None:
+                tmp = f'{cache_file}.{os.getpid()}'
+                with open(tmp, 'wb') as f:
+                    f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+                os.replace(tmp, cache_file)
+        self._code[key] = code
+        return code
+
+    def _exec(self, source: bytes, info: ScriptInfo) -> LoadedScript:
+        code = self._compile(source, info)
+        # pydantic泛型/pickle等需要通过sys.modules找到脚本模块; 使用带hash的模块名, 不覆盖同名的标准库/第三方模块
+        module_name = f'miner_script_{info.name}_{self._key_of(info)[:12]}'
+        module = ModuleType(module_name, info.doc)
+        module.__file__ = info.path
+        previous = sys.modules.get(module_name)
+        sys.modules[module_name] = module
+        try:
+            exec(code, module.__dict__)
+        except BaseException:
+            if previous is not None:
+                sys.modules[module_name] = previous
+            else:
+                del sys.modules[module_name]
+            raise
+        threads = {name: getattr(module, name) for name in info.threads
+                   if inspect.iscoroutinefunction(getattr(module, name, None))}
+        profile = getattr(module, info.profile) if info.profile is not None else ScriptProfile
+        return LoadedScript(info=info, module=module, threads=threads, profile=profile,
+                            registry=discover_registry(module))
+
+    def load(self, path: str) -> LoadedScript:
+        """加载脚本; 已加载且内容未变化时返回同一个模块"""
+        path = os.path.abspath(path)
+        source = self._read(path)
+        info = self._inspect(source, path)
+        script = self._scripts.get(path)
+        if script is None or script.info.digest != info.digest:
+            previous, script = script, self._exec(source, info)
+            self._scripts[path] = script
+            # 旧模块不再通过sys.modules引用(正在运行的thread函数仍持有), 避免每次内容变化都残留一个模块
+            if previous is not None and sys.modules.get(previous.module.__name__) is previous.module:
+                del sys.modules[previous.module.__name__]
+        return script
+
+    def reload(self, path: str) -> LoadedScript | None:
+        """脚本内容变化时重新加载, 返回新脚本; 未变化返回None"""
+        path = os.path.abspath(path)
+        previous = self._scripts.get(path)
+        script = self.load(path)
+        return None if script is previous else script
+
+    async def watch(self, path: str, runner: TaskRunner, interval: float = 2,
+                    on_error: Callable[[Exception], None] | None = None):
+        """定时检查脚本文件, 内容变化时热更新runner的thread函数(不重启正在运行的thread)
+        :param on_error: 重新加载失败时的回调 `(error) -> None`, 默认打印; 失败时继续使用旧代码
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                current = os.stat(path).st_mtime_ns
+                if current == mtime:
+                    continue
+                mtime = current
+                script = self.reload(path)
+            except Exception as e:
+                if on_error is None:
+                    print(f'ScriptLoader: 重新加载失败 {path}: {e}', file=sys.stderr)
+                else:
+                    on_error(e)
+                continue
+            if script is not None:
+                runner.update_threads(script.threads)
@@ -0,0 +1,217 @@
+"""
+event loop健康监控: 找出阻塞event loop的脚本
+- 持续测量调度延迟(lag): 定时sleep, 实际唤醒时间与预期的差
+- 慢回调: 单次回调(协程的一步)运行超过阈值时, 归属到所在的Task;
+  TaskRunner创建的Task名为 `帐户:thread函数名`, 位置取协程调用链中最内层的脚本代码(文件:行 函数)
+- 通过StatusUpdater报告, 同一帐户/thread在report_interval内只报告一次(期间的次数合并到下一次报告)
+
+>>> async with LoopMonitor(updater, slow_threshold=0.05) as monitor:
+>>>     await runner.run(tasks)
+>>> monitor.stats()
+"""
+import asyncio
+import os
+import sys
+import time
+from asyncio import events
+from dataclasses import dataclass
+from typing import Any
+
+from miner_base.metrics import Histogram
+from miner_base.model import StatusUpdater
+
+__all__ = ['SlowCallback', 'LoopMonitor']
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+_LIBRARY_DIRS = tuple({os.path.dirname(asyncio.__file__), os.path.dirname(os.path.abspath(__file__)),
+                       *(p for p in sys.path if p.endswith('site-packages'))})
+
+_original_run = events.Handle._run
+_monitors: dict[asyncio.AbstractEventLoop, 'LoopMonitor'] = {}
+
+
+def _timed_run(self: events.Handle):
+    monitor = _monitors.get(self._loop)
+    if monitor is None:
+        return _original_run(self)
+    t0 = time.perf_counter()
+    try:
+        return _original_run(self)
+    finally:
+        if (elapsed := time.perf_counter() - t0) >= monitor.slow_threshold:
+            monitor._on_slow(self, elapsed)
+
+
+@dataclass(slots=True)
+class SlowCallback:
+    """一次慢回调"""
+    duration: float
+    task: str | None  # Task名, 非Task的回调为None
+    account: str | None
+    thread: str | None
+    location: str  # 文件:行 函数
+    script: str | None = None  # 脚本文件, 无法定位到脚本代码时为None
+    line: int | None = None
+
+
+@dataclass(slots=True)
+class _Offender:
+    count: int = 0
+    total: float = 0.
+    max: float = 0.
+    last: SlowCallback | None = None
+    reported_at: float = 0.
+    pending: int = 0  # 上次报告后的次数
+
+
+def _coro_frames(coro: Any) -> list:
+    """协程调用链(外 => 内)中的frame"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return frames
+
+
+def _describe(handle: events.Handle, elapsed: float) -> SlowCallback:
+    callback = handle._callback
+    task = getattr(callback, '__self__', None)
+    if not isinstance(task, asyncio.Task):
+        code = getattr(callback, '__code__', None)
+        location = (f'{os.path.basename(code.co_filename)}:{code.co_firstlineno} {callback.__qualname__}'
+                    if code is not None else repr(callback))
+        return SlowCallback(elapsed, None, None, None, location, code and code.co_filename,
+                            code and code.co_firstlineno)
+    name = task.get_name()
+    account, sep, thread = name.partition(':')
+    coro = task.get_coro()
+    frames = _coro_frames(coro)
+    frame = next((f for f in reversed(frames) if not f.f_code.co_filename.startswith(_LIBRARY_DIRS)), None)
+    script = frame is not None
+    if frame is None and frames:  # 脚本函数已返回, 或阻塞在库代码中
+        frame = frames[-1]
+    if frame is not None:
+        filename, line, func = frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_qualname
+    else:  # Task已结束
+        code = getattr(coro, 'cr_code', None)
+        filename, line, func = (code.co_filename, code.co_firstlineno, code.co_qualname) if code else (None, None, '?')
+    location = f'{os.path.basename(filename)}:{line} {func}' if filename else func
+    return SlowCallback(elapsed, name, account if sep else None, thread if sep else None, location,
+                        filename if script else None, line if script else None)
+
+
+class LoopMonitor:
+    """监控当前event loop, 每个loop同时只能有一个"""
+
+    def __init__(self, updater: StatusUpdater | None = None, slow_threshold: float = 0.1, interval: float = 0.25,
+                 report_interval: float = 60, max_offenders: int = 1000):
+        """
+        :param updater: 报告慢回调, None为只统计
+        :param slow_threshold: 慢回调阈值(s)
+        :param interval: lag采样间隔(s), 同时也是报告的检查间隔
+        :param report_interval: 同一帐户/thread的报告间隔(s)
+        :param max_offenders: 记录的帐户/thread数上限
+        """
+        self.updater = updater
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        self.report_interval = report_interval
+        self.max_offenders = max_offenders
+        self.lag = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.
+        self.slow_callbacks = 0
+        self.reports = 0
+        self._offenders: dict[str, _Offender] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+
+    def _on_slow(self, handle: events.Handle, elapsed: float):
+        """在event loop中同步调用, 只记录, 报告在采样协程中进行"""
+        self.slow_callbacks += 1
+        slow = _describe(handle, elapsed)
+        key = f'{slow.account}:{slow.thread}' if slow.task is not None and slow.thread else slow.location
+        offender = self._offenders.get(key)
+        if offender is None:
+            if len(self._offenders) >= self.max_offenders:
+                return
+            offender = self._offenders[key] = _Offender()
+        offender.count += 1
+        offender.total += elapsed
+        offender.max = max(offender.max, elapsed)
+        if offender.last is None or slow.script is not None or offender.last.script is None:
+            offender.last = slow  # 优先保留能定位到脚本代码的记录
+        offender.pending += 1
+
+    def _report(self, now: float, force: bool = False):
+        for offender in self._offenders.values():
+            if not offender.pending or (not force and now - offender.reported_at < self.report_interval):
+                continue
+            slow, pending = offender.last, offender.pending
+            offender.reported_at, offender.pending = now, 0
+            self.reports += 1
+            self.updater.warning(
+                lambda: f'阻塞event loop {slow.duration * 1e3:.0f}ms: {slow.task or "-"} @ {slow.location}'
+                        + (f' (共{pending}次)' if pending > 1 else ''),
+                extra={'account': slow.account, 'thread': slow.thread, 'location': slow.location,
+                       'script': slow.script, 'line': slow.line, 'duration': slow.duration, 'count': pending})
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0., loop.time() - t0 - self.interval)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if self.updater is not None:
+                self._report(time.monotonic())
+
+    def start(self):
+        """在event loop中开始监控"""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if loop in _monitors:
+            raise RuntimeError('event loop已有LoopMonitor')
+        _monitors[loop] = self
+        events.Handle._run = _timed_run
+        self._loop = loop
+        self._task = loop.create_task(self._sample(), name='LoopMonitor')
+
+    async def stop(self):
+        """停止监控, 并报告尚未报告的慢回调"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        _monitors.pop(self._loop, None)
+        self._loop = None
+        if not _monitors:
+            events.Handle._run = _original_run
+        if self.updater is not None:
+            self._report(time.monotonic(), force=True)
+
+    def top(self, n: int = 10) -> list[dict]:
+        """按累计阻塞时间排序的帐户/thread"""
+        offenders = sorted(self._offenders.items(), key=lambda item: item[1].total, reverse=True)[:n]
+        return [{'key': key, 'count': o.count, 'total': o.total, 'max': o.max, 'location': o.last.location}
+                for key, o in offenders]
+
+    def stats(self) -> dict:
+        return {'lag_p50': self.lag.quantile(0.5), 'lag_p99': self.lag.quantile(0.99), 'lag_max': self.max_lag,
+                'slow_callbacks': self.slow_callbacks, 'reports': self.reports, 'top': self.top()}
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
@@ -0,0 +1,237 @@
+"""
+请求指标: 基于aiohttp TraceConfig, 找出变慢的API/host/proxy
+- 直方图: DNS, 建立连接, TTFB(收到响应头), total(api()的完整调用, 包括读取与解析body)
+  分别按 api_name / host / proxy 三个维度统计(不做组合, 避免维度爆炸); 桶边界固定, 每个序列预分配计数
+- 计数器: 按api的状态码与异常类型, 不采样
+- 采样: sample_rate < 1 时只有被采样的请求记录直方图
+
+>>> metrics = ApiMetrics(sample_rate=0.1)
+>>> pool = SessionPool(metrics=metrics)
+>>> runner = await metrics.serve(port=9464)  # GET http://127.0.0.1:9464/metrics (Prometheus文本格式)
+>>> metrics.snapshot()
+"""
+import random
+import time
+from bisect import bisect_left
+from types import SimpleNamespace
+from typing import Any, Literal
+
+from yarl import URL
+
+__all__ = ['Histogram', 'RequestTrace', 'ApiMetrics', 'DEFAULT_BUCKETS']
+
+PHASE = Literal['dns', 'connect', 'ttfb', 'total']
+DIMENSION = Literal['api', 'host', 'proxy']
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """固定桶边界的直方图, counts[i] 为落在 (bounds[i-1], bounds[i]] 的次数, 最后一个为 +Inf"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶内线性插值估计分位数; 落在+Inf桶时返回最大的边界"""
+        if not self.count:
+            return 0.
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': list(self.counts)}
+
+
+def proxy_label(proxy_snap: str | None) -> str:
+    """proxy快照去掉用户名/密码后作为标签"""
+    if not proxy_snap:
+        return '-'
+    url = URL(proxy_snap)
+    return str(url.with_user(None)) if url.user is not None else proxy_snap
+
+
+class RequestTrace:
+    """单次请求的标签与计时, 通过 `trace_request_ctx` 传给TraceConfig回调"""
+
+    __slots__ = ('api', 'proxy', 'host', 'sampled', 'started', 'dns_started', 'connect_started')
+
+    def __init__(self, api: str | None, proxy: str, sampled: bool):
+        self.api = api or '-'
+        self.proxy = proxy
+        self.host = '-'
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.dns_started = self.connect_started = 0.
+
+
+class ApiMetrics:
+    """所有帐户共享的请求指标"""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, sample_rate: float = 1.0,
+                 namespace: str = 'miner'):
+        """
+        :param buckets: 直方图桶边界(s), 升序
+        :param sample_rate: 记录直方图的请求比例
+        :param namespace: Prometheus指标名前缀
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.sample_rate = sample_rate
+        self.namespace = namespace
+        self._histograms: dict[tuple[PHASE, DIMENSION, str], Histogram] = {}
+        self._status: dict[tuple[str, int], int] = {}
+        self._exceptions: dict[tuple[str, str], int] = {}
+        self._random = random.random
+        self.trace_config = self._create_trace_config()
+
+    def _create_trace_config(self):
+        from aiohttp import TraceConfig
+        config = TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        config.on_request_start.append(self._on_request_start)
+        config.on_dns_resolvehost_start.append(self._on_dns_start)
+        config.on_dns_resolvehost_end.append(self._on_dns_end)
+        config.on_connection_create_start.append(self._on_connect_start)
+        config.on_connection_create_end.append(self._on_connect_end)
+        config.on_request_end.append(self._on_request_end)
+        config.on_request_exception.append(self._on_request_exception)
+        return config
+
+    def trace(self, api: str | None, proxy_snap: str | None) -> RequestTrace:
+        """创建请求的trace, 作为 `trace_request_ctx` 传入 session.request"""
+        return RequestTrace(api, proxy_label(proxy_snap), self.sample_rate >= 1 or self._random() < self.sample_rate)
+
+    def observe(self, phase: PHASE, trace: RequestTrace, value: float):
+        """按api/host/proxy三个维度记录"""
+        histograms = self._histograms
+        for key in ((phase, 'api', trace.api), (phase, 'host', trace.host), (phase, 'proxy', trace.proxy)):
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def observe_total(self, trace: RequestTrace):
+        """api()调用结束(包括body解析), 成功或失败"""
+        if trace.sampled:
+            self.observe('total', trace, time.perf_counter() - trace.started)
+
+    @staticmethod
+    def _trace_of(ctx: SimpleNamespace) -> RequestTrace | None:
+        trace = ctx.trace_request_ctx
+        return trace if isinstance(trace, RequestTrace) else None
+
+    async def _on_request_start(self, session, ctx, params):
+        trace = self._trace_of(ctx)
+        if trace is None:  # 未经过AiohttpAPICaller的请求
+            trace = ctx.trace_request_ctx = self.trace(None, None)
+        trace.host = params.url.host or '-'
+        trace.started = time.perf_counter()  # 不包括限速等待
+
+    async def _on_dns_start(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is not None and trace.sampled:
+            trace.dns_started = time.perf_counter()
+
+    async def _on_dns_end(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is not None and trace.sampled and trace.dns_started:
+            self.observe('dns', trace, time.perf_counter() - trace.dns_started)
+
+    async def _on_connect_start(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is not None and trace.sampled:
+            trace.connect_started = time.perf_counter()
+
+    async def _on_connect_end(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is not None and trace.sampled and trace.connect_started:
+            self.observe('connect', trace, time.perf_counter() - trace.connect_started)
+
+    async def _on_request_end(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is None:
+            return
+        key = (trace.api, params.response.status)
+        self._status[key] = self._status.get(key, 0) + 1
+        if trace.sampled:
+            self.observe('ttfb', trace, time.perf_counter() - trace.started)
+
+    async def _on_request_exception(self, session, ctx, params):
+        if (trace := self._trace_of(ctx)) is None:
+            return
+        key = (trace.api, type(params.exception).__name__)
+        self._exceptions[key] = self._exceptions.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        """`{'histograms': {phase: {dimension: {label: {...}}}}, 'status': {api: {status: n}},
+        'exceptions': {api: {type: n}}}`"""
+        histograms: dict[str, dict[str, dict[str, Any]]] = {}
+        for (phase, dimension, label), histogram in self._histograms.items():
+            histograms.setdefault(phase, {}).setdefault(dimension, {})[label] = histogram.snapshot()
+        status: dict[str, dict[int, int]] = {}
+        for (api, code), n in self._status.items():
+            status.setdefault(api, {})[code] = n
+        exceptions: dict[str, dict[str, int]] = {}
+        for (api, name), n in self._exceptions.items():
+            exceptions.setdefault(api, {})[name] = n
+        return {'histograms': histograms, 'status': status, 'exceptions': exceptions}
+
+    def reset(self):
+        self._histograms.clear()
+        self._status.clear()
+        self._exceptions.clear()
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        name = f'{self.namespace}_request_duration_seconds'
+        lines = [f'# HELP {name} Request latency by phase (dns, connect, ttfb, total).', f'# TYPE {name} histogram']
+        bounds = [*(repr(float(b)) for b in self.buckets), '+Inf']
+        for (phase, dimension, label), histogram in sorted(self._histograms.items()):
+            labels = f'phase="{phase}",{dimension}="{_escape(label)}"'
+            cumulative = 0
+            for le, n in zip(bounds, histogram.counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        name = f'{self.namespace}_responses_total'
+        lines += [f'# HELP {name} Responses by api and status code.', f'# TYPE {name} counter']
+        lines += [f'{name}{{api="{_escape(api)}",status="{code}"}} {n}'
+                  for (api, code), n in sorted(self._status.items())]
+        name = f'{self.namespace}_request_exceptions_total'
+        lines += [f'# HELP {name} Request exceptions by api and type.', f'# TYPE {name} counter']
+        lines += [f'{name}{{api="{_escape(api)}",type="{_escape(exc)}"}} {n}'
+                  for (api, exc), n in sorted(self._exceptions.items())]
+        return '\n'.join(lines) + '\n'
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 9464, path: str = '/metrics'):
+        """启动本地HTTP endpoint, 返回 aiohttp.web.AppRunner (调用 `await runner.cleanup()` 停止)"""
+        from aiohttp import web
+
+        async def handler(request):
+            return web.Response(body=self.render().encode(),
+                                headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+        app = web.Application()
+        app.router.add_get(path, handler)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
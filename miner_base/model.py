@@ -1,14 +1,22 @@
+from __future__ import annotations
+
+import asyncio
+import gc
 import re
-from abc import abstractmethod
-from typing import TypedDict, Optional, Any, Union, Mapping, Callable, Awaitable, Iterable, Unpack, Generic
-
-from aiohttp import ClientResponse, BasicAuth, Fingerprint, ClientTimeout
-# noinspection PyProtectedMember
-from aiohttp.client import SSLContext, ClientSession
-from aiohttp.typedefs import LooseHeaders, StrOrURL, LooseCookies, Query
-from pydantic import BaseModel, Field, PrivateAttr
+import sys
+from time import monotonic
+from abc import ABC, abstractmethod
+from typing import Optional, Any, Union, Mapping, Callable, Awaitable, Iterable, Unpack, Generic, AsyncIterator, \
+    Literal, TYPE_CHECKING
+
+if TYPE_CHECKING:  # aiohttp只用于类型注解, 运行时不导入(见 miner_base.__init__)
+    from aiohttp import ClientResponse, BasicAuth, Fingerprint, ClientTimeout
+    # noinspection PyProtectedMember
+    from aiohttp.client import SSLContext, ClientSession
+    from aiohttp.typedefs import LooseHeaders, StrOrURL, LooseCookies, Query
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, TypeAdapter
 from pydantic.dataclasses import dataclass
-from typing_extensions import TypeVar
+from typing_extensions import TypeVar, TypedDict
 
 from miner_base.exception import *
 
@@ -31,23 +39,228 @@ class TgSessionArgs(TypedDict):
     agent_info: AgentInfo
 
 
-@dataclass
+STATE_OP = Literal['set', 'delete', 'clear']
+
+StateListener = Callable[[STATE_OP, str | None, Any], None]
+"""State变更回调: (op, key, value); clear时key为None"""
+
+
+def _sizeof(value: Any, depth: int = 3) -> int:
+    """估算value占用的内存(bytes), 只展开有限层容器"""
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, depth - 1) + _sizeof(v, depth - 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(v, depth - 1) for v in value)
+    return size
+
+
 class State:
-    """脚本状态管理器"""
-    data: dict = Field(dict)
+    """脚本状态管理器
+    除get/set外, 还可以等待状态变化(由set触发, 无需轮询):
+    >>> token = await state.wait_for('token')  # 等待key被设置为非None值
+    >>> await state.wait_until(lambda s: s.get('count', 0) > 8)
+    >>> async for profile_data in state.subscribe('profile_data'): ...
+
+    长期运行时可限制内存:
+    >>> state.set('game_info', game_info, ttl=60)  # 60s后过期, get返回default
+    >>> State({}, max_entries=100, max_bytes=1 << 20)  # 超出时淘汰最久未使用(LRU)的key
+
+    每个帐户一个实例: 使用__slots__, 回调/过期/大小记录在首次使用时才创建
+    """
+    __slots__ = ('data', 'max_entries', 'max_bytes', '_listeners', '_expires', '_sizes', '_bytes', '_bounded',
+                 '_sets')
+
+    def __init__(self, data: dict | None = None, max_entries: int | None = None, max_bytes: int | None = None):
+        self.data: dict = dict(data) if data else {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._listeners: dict[str | None, list[StateListener]] | None = None
+        self._expires: dict[str, float] | None = None  # key => time.monotonic() 过期时间
+        self._sizes: dict[str, int] | None = {} if max_bytes is not None else None  # 仅在设置了max_bytes时记录
+        self._bytes = 0
+        self._bounded = max_entries is not None or max_bytes is not None
+        self._sets = 0
+
+    def __repr__(self):
+        return f'State(data={self.data!r}, max_entries={self.max_entries!r}, max_bytes={self.max_bytes!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, State):
+            return NotImplemented
+        return (self.data, self.max_entries, self.max_bytes) == (other.data, other.max_entries, other.max_bytes)
+
+    __hash__ = None
 
     def get(self, key: str, default=None):
+        if self._expires and key in self._expires and self._expires[key] <= monotonic():
+            self.delete(key)
+            return default
+        if self._bounded and key in self.data:  # LRU: 移到末尾
+            value = self.data[key] = self.data.pop(key)
+            return value
         return self.data.get(key, default)
 
     def __call__(self, key: str, default=None):
         return self.get(key, default)
 
-    def set(self, key: str, value: Any) -> Any:
+    def set(self, key: str, value: Any, ttl: float | None = None) -> Any:
+        """
+        :param ttl: 过期时间(s), None为不过期
+        """
+        if self._bounded:
+            self.data.pop(key, None)
         self.data[key] = value
+        if ttl is not None:
+            if self._expires is None:
+                self._expires = {}
+            self._expires[key] = monotonic() + ttl
+        elif self._expires:
+            self._expires.pop(key, None)
+        if self._bounded:
+            if self.max_bytes is not None:
+                size = _sizeof(value)
+                self._bytes += size - self._sizes.get(key, 0)
+                self._sizes[key] = size
+            self._evict()
+        if self._listeners:
+            self._notify('set', key, value)
+        if self._expires:
+            self._sets += 1
+            if self._sets & 0x3f == 0:  # 均摊清理: 没有被读取的过期key也会被删除
+                self.purge_expired()
+        return value
+
+    def delete(self, key: str) -> Any:
+        value = self.data.pop(key, None)
+        if self._expires:
+            self._expires.pop(key, None)
+        if self._sizes:
+            self._bytes -= self._sizes.pop(key, 0)
+        if self._listeners:
+            self._notify('delete', key, value)
         return value
 
     def clear(self):
-        return self.data.clear()
+        self.data.clear()
+        if self._expires:
+            self._expires.clear()
+        if self._sizes:
+            self._sizes.clear()
+        self._bytes = 0
+        if self._listeners:
+            self._notify('clear', None, None)
+
+    # === 过期与淘汰
+    def ttl_of(self, key: str) -> float | None:
+        """剩余过期时间(s), 不过期时为None"""
+        if not self._expires or key not in self._expires:
+            return None
+        return self._expires[key] - monotonic()
+
+    def purge_expired(self) -> int:
+        """删除所有已过期的key, 返回删除数量"""
+        if not self._expires:
+            return 0
+        now = monotonic()
+        expired = [key for key, deadline in self._expires.items() if deadline <= now]
+        for key in expired:
+            self.delete(key)
+        return len(expired)
+
+    def _evict(self):
+        if ((self.max_entries is not None and len(self.data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self.purge_expired()
+        while len(self.data) > 1 and (
+                (self.max_entries is not None and len(self.data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            self.delete(next(iter(self.data)))
+
+    def memory_usage(self) -> dict:
+        """内存使用情况: key数量, 估算字节数, 设置了ttl的key数量"""
+        return {
+            'entries': len(self.data),
+            'bytes': self._bytes if self.max_bytes is not None else sum(map(_sizeof, self.data.values())),
+            'expiring': len(self._expires or ()),
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+    # === 变更通知
+    def _notify(self, op: STATE_OP, key: str | None, value: Any):
+        if key is None:  # clear: 通知所有回调
+            listeners = [listener for ls in self._listeners.values() for listener in ls]
+        else:
+            listeners = [*self._listeners.get(key, ()), *self._listeners.get(None, ())]
+        for listener in listeners:
+            listener(op, key, value)
+
+    def add_listener(self, listener: StateListener, key: str | None = None):
+        """注册变更回调, key为None时监听所有key"""
+        if self._listeners is None:
+            self._listeners = {}
+        self._listeners.setdefault(key, []).append(listener)
+
+    def remove_listener(self, listener: StateListener, key: str | None = None):
+        listeners = self._listeners.get(key) if self._listeners else None
+        if listeners and listener in listeners:
+            listeners.remove(listener)
+            if not listeners:
+                del self._listeners[key]
+
+    async def wait_until(self, predicate: Callable[['State'], Any], key: str | None = None,
+                         timeout: float | None = None) -> Any:
+        """等待 predicate(state) 为真; 仅在(key的)状态变化时重新判断
+        :param key: 只在该key变化时判断, None为任意key
+        :param timeout: 超时抛出 TimeoutError
+        :return: 使等待结束的 predicate 返回值
+        """
+        if result := predicate(self):
+            return result
+        future = asyncio.get_running_loop().create_future()
+
+        def listener(*_):
+            if future.done():
+                return
+            try:
+                if result_ := predicate(self):
+                    future.set_result(result_)
+            except Exception as e:  # 异常交给等待方, 而不是调用set()的协程
+                future.set_exception(e)
+
+        self.add_listener(listener, key)
+        try:
+            async with asyncio.timeout(timeout):
+                return await future
+        finally:
+            self.remove_listener(listener, key)
+
+    async def wait_for(self, key: str, timeout: float | None = None) -> Any:
+        """等待key被设置为非None值, 已设置时立即返回
+        返回触发时的值: 之后key被删除/过期/淘汰也不影响"""
+        def predicate(state: State) -> tuple[Any] | None:
+            value = state.get(key)
+            return None if value is None else (value,)
+
+        return (await self.wait_until(predicate, key=key, timeout=timeout))[0]
+
+    async def subscribe(self, key: str) -> AsyncIterator[Any]:
+        """迭代key的每一次新值(set); 迭代期间的值按顺序缓冲"""
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def listener(op: STATE_OP, _, value: Any):
+            if op == 'set':
+                queue.put_nowait(value)
+
+        self.add_listener(listener, key)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.remove_listener(listener, key)
 
 
 class RequestOptions(TypedDict, total=False):
@@ -90,9 +303,10 @@ class APICaller(ABC):
                   data: Optional[dict] = None,
                   update_headers: Optional[dict] = None,  # 更新
                   update_params: Optional[dict] = None,
+                  url_vars: Optional[dict] = None,  # 填充url模板中的 {field}
                   **kwargs: Unpack[RequestOptions],
                   ) -> str | dict:
-        """调用API函数"""
+        """调用API函数: api_name 对应脚本中 ApiRegistry 声明的API"""
         pass
 
     @property
@@ -164,35 +378,72 @@ TSK_STATUS = Literal['initialized', 'queued', 'running', 'completed', 'canceled'
 ON_LOG = Callable[[TSK_STATUS | None, LOG_LEVEL, str, dict, Exception | None], None]
 
 
+LOG_LEVEL_NO: dict[LOG_LEVEL, int] = {
+    'TRACE': 5, 'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+LOG_MSG = str | Callable[[], str]
+"""日志消息: 字符串(可配合fmt_args使用 str.format), 或返回字符串的函数; 仅在日志级别启用时才会格式化/调用"""
+
+
 class StatusUpdater(ABC):
     """状态更新器, 可替代logger, 用于将状态(日志等信息)共享给UI
     success以上级别(warning, error, ...)的日志将展示在 GUI-任务状态栏; 其他日志(info, debug...)需要进入日志管理查看
+    低于 min_level 的日志不会调用 update; 带有status的记录(状态变更)始终会调用
+    >>> updater.info(lambda: f'余额: {balance}')  # 延迟格式化
+    >>> updater.info('余额: {}', fmt_args=(balance,))
     """
+    __slots__ = ()  # 子类可以定义__slots__(每个帐户一个实例), 此时需包含 _min_level_no 并在__init__中赋值
+    _min_level_no: int = 0
+
+    @property
+    def min_level(self) -> LOG_LEVEL:
+        return next((lv for lv, no in LOG_LEVEL_NO.items() if no >= self._min_level_no), 'TRACE')
+
+    @min_level.setter
+    def min_level(self, level: LOG_LEVEL):
+        self._min_level_no = LOG_LEVEL_NO[level]
+
+    def is_enabled(self, level: LOG_LEVEL) -> bool:
+        """该级别的日志是否会被输出, 可用于跳过仅用于日志的计算"""
+        return LOG_LEVEL_NO[level] >= self._min_level_no
 
     @abstractmethod
     def update(self, status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
         pass
 
-    def debug(self, msg: str, level: LOG_LEVEL = 'DEBUG', status: TSK_STATUS = None, extra: dict = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra)
+    def _log(self, level: LOG_LEVEL, msg: LOG_MSG, fmt_args: tuple, status: TSK_STATUS | None, extra: dict | None,
+             error: Exception = None):
+        if status is None and LOG_LEVEL_NO[level] < self._min_level_no:
+            return None
+        if callable(msg):
+            msg = msg()
+        elif fmt_args:
+            msg = msg.format(*fmt_args)
+        return self.update(status=status, level=level, msg=msg, extra=extra, error=error)
 
-    def info(self, msg: str, level: LOG_LEVEL = 'INFO', status: TSK_STATUS = None, extra: dict = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra)
+    def debug(self, msg: LOG_MSG, level: LOG_LEVEL = 'DEBUG', status: TSK_STATUS = None, extra: dict = None,
+              fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra)
 
-    def success(self, msg: str, level: LOG_LEVEL = 'SUCCESS', status: TSK_STATUS = None, extra: dict = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra)
+    def info(self, msg: LOG_MSG, level: LOG_LEVEL = 'INFO', status: TSK_STATUS = None, extra: dict = None,
+             fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra)
 
-    def warning(self, msg: str, level: LOG_LEVEL = 'WARNING', status: TSK_STATUS = None, extra: dict = None,
-                error: Exception = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra, error=error)
+    def success(self, msg: LOG_MSG, level: LOG_LEVEL = 'SUCCESS', status: TSK_STATUS = None, extra: dict = None,
+                fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra)
 
-    def error(self, msg: str, level: LOG_LEVEL = 'ERROR', status: TSK_STATUS = None, extra: dict = None,
-              error: Exception = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra, error=error)
+    def warning(self, msg: LOG_MSG, level: LOG_LEVEL = 'WARNING', status: TSK_STATUS = None, extra: dict = None,
+                error: Exception = None, fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra, error)
 
-    def critical(self, msg: str, level: LOG_LEVEL = 'CRITICAL', status: TSK_STATUS = None, extra: dict = None,
-                 error: Exception = None):
-        return self.update(status=status, level=level, msg=msg, extra=extra, error=error)
+    def error(self, msg: LOG_MSG, level: LOG_LEVEL = 'ERROR', status: TSK_STATUS = None, extra: dict = None,
+              error: Exception = None, fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra, error)
+
+    def critical(self, msg: LOG_MSG, level: LOG_LEVEL = 'CRITICAL', status: TSK_STATUS = None, extra: dict = None,
+                 error: Exception = None, fmt_args: tuple = ()):
+        return self._log(level, msg, fmt_args, status, extra, error)
 
 
 TeleMobaiPlat = Literal['android', 'ios']
@@ -232,6 +483,11 @@ class ScriptRuntimeArgs(BaseModel, Generic[P]):
     def plugins(self) -> list[GFMPlugin]:
         return self._plugins
 
+    def __reduce__(self):
+        """`ScriptRuntimeArgs[Profile]` 无法按名称pickle: 按Profile类pickle, 加载时重新specialize"""
+        args = type(self).__pydantic_generic_metadata__['args']
+        return _unpickle_args, (args[0] if args else None, self.__getstate__())
+
     @classmethod
     def of(cls,
            tg_session: TgSessionArgs,
@@ -241,6 +497,140 @@ class ScriptRuntimeArgs(BaseModel, Generic[P]):
         args._plugins = plugins_factory(args)
         return args
 
+    @classmethod
+    def specialize(cls, profile_cls: type[P]) -> type['ScriptRuntimeArgs[P]']:
+        """缓存的 `ScriptRuntimeArgs[profile_cls]`"""
+        args_cls = _SPECIALIZED.get(profile_cls)
+        if args_cls is None:
+            args_cls = _SPECIALIZED[profile_cls] = ScriptRuntimeArgs[profile_cls]
+        return args_cls
+
+    @classmethod
+    def bulk_of(cls,
+                tg_sessions: list[TgSessionArgs] | list[dict],
+                profile: P | dict,
+                plugins_factory: Callable[['ScriptRuntimeArgs'], list[GFMPlugin]],
+                profile_cls: type[P] | None = None,
+                validate: bool = True,
+                compact: bool = True) -> list['ScriptRuntimeArgs[P]']:
+        """批量构造: 所有session一次校验, 所有帐户共享同一个profile实例
+        :param profile: Profile实例, 或dict(按profile_cls校验一次)
+        :param profile_cls: profile为dict时必须提供; 默认 type(profile)
+        :param validate: False时跳过session校验(数据已校验过, 例如来自数据库)
+        :param compact: 共享的profile冻结(见 freeze_profile); 内容相同的agent_info共享同一个只读dict(见 intern_agent_info),
+            脚本需要修改 tg_session['agent_info'] 时先复制
+        """
+        if not isinstance(profile, ScriptProfile):
+            profile = profile_cls.model_validate(profile)
+        args_cls = cls.specialize(profile_cls or _FROZEN_OF.get(type(profile), type(profile)))
+        if compact:
+            profile = freeze_profile(profile)
+        gc_enabled = gc.isenabled()
+        gc.disable()  # 大量创建长期存活的对象, 避免期间反复触发分代回收
+        try:
+            if validate:
+                tg_sessions = _sessions_adapter().validate_python(tg_sessions)
+            if compact:  # 返回副本, 不修改调用方的dict
+                tg_sessions = map(compact_session, tg_sessions)
+            # 等同 model_construct, 省去每个实例的默认值/私有属性处理; 直接使用BaseModel的slot描述符赋值
+            new, set_dict = object.__new__, object.__setattr__
+            set_fields, set_extra, set_private = (BaseModel.__dict__[name].__set__ for name in (
+                '__pydantic_fields_set__', '__pydantic_extra__', '__pydantic_private__'))
+            result = []
+            append = result.append
+            for tg_session in tg_sessions:
+                args = new(args_cls)
+                set_dict(args, '__dict__', {'tg_session': tg_session, 'profile': profile})
+                set_fields(args, {'tg_session', 'profile'})
+                set_extra(args, None)
+                set_private(args, private := {'_plugins': []})
+                private['_plugins'] = plugins_factory(args)
+                append(args)
+            return result
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+
+_SPECIALIZED: dict[type, type[ScriptRuntimeArgs]] = {}
+_FROZEN: dict[type, type] = {}  # Profile类 => 冻结的子类
+_FROZEN_OF: dict[type, type] = {}  # 冻结的子类 => Profile类
+_AGENT_INFOS: dict[tuple, AgentInfo] = {}
+
+
+def freeze_profile(profile: P) -> P:
+    """返回不可修改的profile副本, 用于多个帐户共享(修改时抛出ValidationError, 而不是影响所有帐户)
+    副本的类型为原Profile类的冻结子类, isinstance仍然成立"""
+    cls = type(profile)
+    if cls.model_config.get('frozen'):
+        return profile
+    frozen_cls = _FROZEN.get(cls)
+    if frozen_cls is None:
+        frozen_cls = type(f'Frozen{cls.__name__}', (cls,), {
+            'model_config': ConfigDict(frozen=True), '__module__': cls.__module__,
+            '__qualname__': f'Frozen{cls.__qualname__}', '__doc__': cls.__doc__, '__reduce__': _reduce_frozen})
+        _FROZEN[cls], _FROZEN_OF[frozen_cls] = frozen_cls, cls
+    return frozen_cls.model_construct(_fields_set=profile.model_fields_set, **profile.__dict__)
+
+
+def _unpickle_args(profile_cls: type | None, state: dict) -> ScriptRuntimeArgs:
+    cls = ScriptRuntimeArgs if profile_cls is None else ScriptRuntimeArgs.specialize(profile_cls)
+    args = cls.__new__(cls)
+    args.__setstate__(state)
+    return args
+
+
+def _reduce_frozen(profile: BaseModel):
+    """冻结的子类是动态创建的, 无法按名称pickle: 按原Profile类pickle, 加载时重新冻结"""
+    cls = _FROZEN_OF[type(profile)]
+    return freeze_profile, (cls.model_construct(_fields_set=profile.model_fields_set, **profile.__dict__),)
+
+
+class _ReadOnlyDict(dict):
+    """多个帐户共享的只读dict, 修改时抛出TypeError; 需要修改时先复制: dict(d)"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f'共享的{type(self).__name__}只读, 请先复制: dict(...)')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def intern_agent_info(agent_info: AgentInfo) -> AgentInfo:
+    """内容相同的agent_info返回同一个dict(字符串也被intern), 进程内共享; 共享的dict只读, 修改时抛出TypeError"""
+    if type(agent_info) is _ReadOnlyDict:
+        return agent_info
+    items = tuple(agent_info.items())
+    shared = _AGENT_INFOS.get(items)  # 命中时无需intern: 大量帐户的agent_info相同
+    if shared is None:
+        items = tuple((k, sys.intern(v) if isinstance(v, str) else v) for k, v in items)
+        shared = _AGENT_INFOS[items] = _ReadOnlyDict(items)
+    return shared
+
+
+def compact_session(tg_session: TgSessionArgs) -> TgSessionArgs:
+    """返回共享agent_info, intern proxy_ip(大量帐户使用相同的proxy)的副本, 不修改传入的tg_session"""
+    tg_session = tg_session.copy()
+    agent_info, proxy_ip = tg_session.get('agent_info'), tg_session.get('proxy_ip')
+    if agent_info is not None:
+        tg_session['agent_info'] = intern_agent_info(agent_info)
+    if type(proxy_ip) is str:
+        tg_session['proxy_ip'] = sys.intern(proxy_ip)
+    return tg_session
+
+
+_SESSIONS_ADAPTER: TypeAdapter | None = None
+
+
+def _sessions_adapter() -> TypeAdapter:
+    global _SESSIONS_ADAPTER
+    if _SESSIONS_ADAPTER is None:
+        _SESSIONS_ADAPTER = TypeAdapter(list[TgSessionArgs])
+    return _SESSIONS_ADAPTER
+
 
 class TmaParam(TypedDict):
     bot_name: str
@@ -0,0 +1,167 @@
+"""
+State持久化: 将State的 set/delete/clear 增量写入本地SQLite日志, 重启后恢复(warm restart)
+state.set 只在内存中记录变更(O(1)), 由后台协程定时合并、序列化并批量写入
+"""
+import asyncio
+import sqlite3
+import sys
+import time
+from typing import Any
+
+from miner_base import codec
+from miner_base.model import State, STATE_OP
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS journal (
+    seq   INTEGER PRIMARY KEY AUTOINCREMENT,
+    ns    TEXT NOT NULL,
+    key   TEXT,
+    op    TEXT NOT NULL,
+    value TEXT,
+    expires REAL -- time.time() 过期时间
+);
+CREATE INDEX IF NOT EXISTS journal_ns ON journal (ns, seq);
+'''
+
+# 旧版本创建的表缺少的列: (列名, 类型)
+_MIGRATIONS = (
+    ('expires', 'REAL'),
+)
+
+_COMPACT = (
+    # clear之前的记录全部失效
+    "DELETE FROM journal WHERE seq < (SELECT MAX(j.seq) FROM journal j WHERE j.ns = journal.ns AND j.op = 'clear')",
+    # 每个key只保留最后一条
+    "DELETE FROM journal WHERE seq NOT IN (SELECT MAX(seq) FROM journal GROUP BY ns, key)",
+    "DELETE FROM journal WHERE op != 'set'",
+)
+
+
+class StateStore:
+    """按命名空间(一般为帐户id)保存多个State
+    >>> store = StateStore('state.db')
+    >>> state = store.attach(State({}), ns=str(tg_session['id']))  # 恢复已保存的数据, 并开始记录变更
+    >>> store.start()
+    >>> await store.aclose()  # 退出前写入剩余变更
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1, compact_threshold: int = 50000):
+        """
+        :param path: SQLite文件路径
+        :param flush_interval: 批量写入间隔(s)
+        :param compact_threshold: 日志新增行数超过该值后压缩(每个key只保留最新值)
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+        self._pending: dict[tuple[str, str | None], tuple[STATE_OP, Any, float | None]] = {}
+        self._appended = 0
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+
+    def _migrate(self):
+        """为旧版本创建的journal表补充缺少的列"""
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(journal)')}
+        for column, type_ in _MIGRATIONS:
+            if column not in columns:
+                self._db.execute(f'ALTER TABLE journal ADD COLUMN {column} {type_}')
+
+    def load(self, ns: str) -> dict[str, tuple[Any, float | None]]:
+        """读取命名空间的数据: key => (value, 剩余ttl), 已过期的key被忽略"""
+        data = {}
+        loads = codec.get_codec(codec.get_codec().name, exact_ints=True).loads  # 不在热路径上: 大整数按原值恢复
+        rows = self._db.execute('SELECT key, op, value, expires FROM journal WHERE ns = ? ORDER BY seq', (ns,))
+        for key, op, value, expires in rows:
+            if op == 'set':
+                data[key] = (loads(value), expires)
+            elif op == 'delete':
+                data.pop(key, None)
+            else:
+                data.clear()
+        now = time.time()
+        return {key: (value, None if expires is None else expires - now)
+                for key, (value, expires) in data.items() if expires is None or expires > now}
+
+    def attach(self, state: State, ns: str) -> State:
+        """恢复数据(包括ttl)到state, 并记录之后的所有变更"""
+        for key, (value, ttl) in self.load(ns).items():
+            state.set(key, value, ttl=ttl)
+
+        def listener(op: STATE_OP, key: str | None, value: Any):
+            if op == 'clear':
+                for k in [k for k in self._pending if k[0] == ns]:
+                    del self._pending[k]
+            ttl = state.ttl_of(key) if op == 'set' else None
+            self._pending[(ns, key)] = (op, value, None if ttl is None else time.time() + ttl)
+
+        state.add_listener(listener)
+        return state
+
+    def _serialize(self) -> list[tuple[str, str | None, STATE_OP, str | None, float | None]]:
+        pending, self._pending = self._pending, {}
+        rows = []
+        for (ns, key), (op, value, expires) in pending.items():
+            if op == 'set':
+                try:
+                    value = codec.dumps(value)
+                except (TypeError, ValueError) as e:
+                    print(f'StateStore: 无法保存 {ns}.{key}: {e}', file=sys.stderr)
+                    continue
+            else:
+                value = None
+            rows.append((ns, key, op, value, expires))
+        return rows
+
+    def _write(self, rows: list):
+        with self._db:
+            self._db.execute('BEGIN')
+            self._db.executemany('INSERT INTO journal (ns, key, op, value, expires) VALUES (?, ?, ?, ?, ?)', rows)
+        self._appended += len(rows)
+        if self._appended >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """压缩日志: 每个key只保留最新值"""
+        with self._db:
+            self._db.execute('BEGIN')
+            for sql in _COMPACT:
+                self._db.execute(sql)
+        self._appended = 0
+
+    async def flush(self):
+        """序列化(在event loop中, 避免与脚本并发修改value)后在线程中写入"""
+        if self._pending:
+            await asyncio.to_thread(self._write, self._serialize())
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                async with asyncio.timeout(self.flush_interval):
+                    await self._stop.wait()
+            except TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stop = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name='StateStore')
+
+    async def aclose(self):
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        await asyncio.to_thread(self.compact)
+        self._db.close()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
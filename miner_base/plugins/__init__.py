@@ -3,11 +3,21 @@ Plugin是Miner的依赖项
 这意味着Plugin将依赖miner数据库, (例如从数据库读取tg帐户信息)
 """
 from abc import ABC
+from typing import AsyncIterator, Iterable
 
 from miner_base import GFMPlugin
+from miner_base.proxy import ProxyHealthPool, ProxyLike, ProxyChain
+from miner_base.tma import TmaTokenCache
+from miner_base.telegram import TmaTokenBatcher, TmaTokenResult
 
 
 class PluginTelegram(GFMPlugin, ABC):
+    """
+    tokens 默认只保存在内存中, 重启后所有帐户都会重新请求Telegram; 需要持久化时在启动时(创建StateStore后)调用一次:
+    >>> PluginTelegram.tokens.attach(store)  # 恢复已保存的token, 之后的变更写入store
+    """
+    tokens: TmaTokenCache = TmaTokenCache()  # 进程内所有帐户共享, 可在实现类中替换; 持久化见 TmaTokenCache.attach
+    batcher: TmaTokenBatcher | None = None  # 实现类提供TgClient后设置, 用于 get_tma_tokens
 
     async def get_tma_token(self, tma_url: str) -> str:
         """ 获取tg对特定小程序的accessToken
@@ -16,6 +26,35 @@ class PluginTelegram(GFMPlugin, ABC):
         """
         ...
 
+    async def get_tma_token_cached(self, session_name: str, tma_url: str, force: bool = False) -> str:
+        """ 带缓存的 get_tma_token: 到期前(按帐户错开)才重新获取
+        :param session_name: 帐户session, 缓存key的一部分
+        :param force: 忽略缓存(例如token被服务端拒绝)
+        """
+        return await self.tokens.get_or_fetch(session_name, tma_url, lambda: self.get_tma_token(tma_url), force)
+
+    def get_tma_tokens(self, pairs: Iterable[tuple[str, str]]) -> AsyncIterator[TmaTokenResult]:
+        """ 批量获取多个帐户的token, 复用已连接的客户端, 按完成顺序返回
+        :param pairs: (session_name, tma_url) 列表
+        :return: (session_name, tma_url, token, error) 的异步迭代器
+        """
+        assert self.batcher is not None, f'{type(self).__name__} 未设置 batcher'
+        return self.batcher.fetch(pairs)
+
 
 class PluginNetwork(GFMPlugin, ABC):
-    ...
+    health: ProxyHealthPool = ProxyHealthPool()  # 进程内所有帐户共享, 可在实现类中替换
+
+    async def check_proxy_ip(self, proxies: list[ProxyLike]) -> str:
+        """ 检测proxy是否可用, 结果按proxy快照缓存(共用同一proxy的帐户只检测一次)
+        :param proxies: 候选proxy(或proxy链)列表, 返回其中最快的可用proxy的出口ip
+        :return: 出口ip
+        :raise ProxyException: 所有proxy都不可用
+        """
+        if len(proxies) == 1:
+            return await self.health.check_ip(proxies[0])
+        return await self.health.check_ip(await self.health.fastest(proxies))
+
+    async def select_proxy(self, proxies: list[ProxyLike]) -> ProxyChain:
+        """ 选出最快的可用proxy(链)"""
+        return await self.health.fastest(proxies)
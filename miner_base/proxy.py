@@ -0,0 +1,211 @@
+"""
+proxy健康检测: 进程内共享, 按proxy(链)快照缓存检测结果
+- 有界并发检测, 同一proxy同时只检测一次(共用同一proxy的帐户共享结果)
+- 成功结果缓存ttl秒, 失败结果缓存fail_ttl秒
+- 记录延迟(EWMA)与最近的成功/失败历史, 按评分选出最快的可用proxy
+- failover: 根据 ProxyException.proxy_snap 排除失败的proxy(链), 切换到其他可用proxy
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Sequence
+
+from miner_base.exception import ProxyException
+from miner_base.model import TeleProxyJSON, TeleProxyJSON_to_snapshot
+
+ProxyChain = tuple[str, ...]  # proxy快照, 多个为proxy链(按顺序连接)
+ProxyLike = str | TeleProxyJSON | Sequence[str | TeleProxyJSON]
+ProxyChecker = Callable[[ProxyChain], Awaitable[str]]  # 返回出口ip, 失败时抛出异常
+
+
+def chain_of(proxies: ProxyLike) -> ProxyChain:
+    """统一proxy表示: 快照字符串 / TeleProxyJSON / 二者的列表(proxy链) => ProxyChain"""
+    if isinstance(proxies, (str, dict)):
+        proxies = [proxies]
+    return tuple(p if isinstance(p, str) else TeleProxyJSON_to_snapshot(p) for p in proxies)
+
+
+@dataclass(slots=True)
+class ProxyHealth:
+    """proxy(链)的检测结果"""
+    chain: ProxyChain
+    ok: bool = False
+    ip: str | None = None
+    latency: float | None = None  # 成功检测延迟的EWMA(s)
+    checked_at: float = 0.  # time.monotonic()
+    failures: int = 0  # 连续失败次数
+    error: Exception | None = None
+    history: deque[tuple[bool, float | None]] = field(default_factory=lambda: deque(maxlen=20))
+
+    @property
+    def failure_rate(self) -> float:
+        if not self.history:
+            return 0.
+        return sum(1 for ok, _ in self.history if not ok) / len(self.history)
+
+    @property
+    def score(self) -> float:
+        """越小越好; 不可用为inf"""
+        if not self.ok or self.latency is None:
+            return float('inf')
+        return self.latency * (1 + self.failure_rate)
+
+    def record(self, ok: bool, latency: float | None = None, ip: str | None = None, error: Exception | None = None,
+               alpha: float = 0.3):
+        self.ok = ok
+        self.checked_at = time.monotonic()
+        self.history.append((ok, latency))
+        if ok:
+            self.ip = ip
+            self.failures = 0
+            self.error = None
+            self.latency = latency if self.latency is None else alpha * latency + (1 - alpha) * self.latency
+        else:
+            self.failures += 1
+            self.error = error
+
+
+def ip_checker(url: str = 'https://api.ipify.org', timeout: float = 10) -> ProxyChecker:
+    """默认检测方式: 通过proxy(链)请求url, 响应文本为出口ip
+    socks代理与proxy链需要安装 aiohttp_socks
+    """
+
+    async def check(chain: ProxyChain) -> str:
+        import aiohttp
+        proxy = None
+        if len(chain) == 1 and not chain[0].startswith('socks'):
+            connector, proxy = aiohttp.TCPConnector(force_close=True), chain[0]
+        elif chain:
+            try:
+                from aiohttp_socks import ChainProxyConnector
+            except ImportError:
+                raise ProxyException(list(chain), msg='socks代理需要安装 aiohttp_socks')
+            connector = ChainProxyConnector.from_urls(list(chain), force_close=True)
+        else:
+            connector = aiohttp.TCPConnector(force_close=True)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.get(url, proxy=proxy) as response:
+                response.raise_for_status()
+                return (await response.text()).strip()
+
+    return check
+
+
+class ProxyHealthPool:
+    """进程内共享的proxy健康检测池
+    >>> pool = ProxyHealthPool(concurrency=32)
+    >>> ip = await pool.check_ip(tele_proxy)  # 不可用时抛出 ProxyException
+    >>> chain = await pool.fastest([proxy_a, proxy_b, [proxy_c, proxy_d]])
+    """
+
+    def __init__(self, checker: ProxyChecker | None = None, ttl: float = 300, fail_ttl: float = 30,
+                 concurrency: int = 32, history: int = 20):
+        """
+        :param checker: 检测函数 `(chain) -> ip`, 默认 ip_checker()
+        :param ttl: 成功结果的缓存时间(s)
+        :param fail_ttl: 失败结果的缓存时间(s)
+        :param concurrency: 同时检测的proxy数上限
+        :param history: 每个proxy保留的检测历史条数
+        """
+        self.checker = checker or ip_checker()
+        self.ttl = ttl
+        self.fail_ttl = fail_ttl
+        self.concurrency = concurrency
+        self.history = history
+        self._health: dict[ProxyChain, ProxyHealth] = {}
+        self._inflight: dict[ProxyChain, asyncio.Future] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _health_of(self, chain: ProxyChain) -> ProxyHealth:
+        health = self._health.get(chain)
+        if health is None:
+            health = self._health[chain] = ProxyHealth(chain, history=deque(maxlen=self.history))
+        return health
+
+    def _fresh(self, health: ProxyHealth) -> bool:
+        if health.checked_at == 0:
+            return False
+        return time.monotonic() - health.checked_at < (self.ttl if health.ok else self.fail_ttl)
+
+    async def check(self, proxies: ProxyLike, force: bool = False) -> ProxyHealth:
+        """检测proxy(链), 优先返回缓存的结果"""
+        chain = chain_of(proxies)
+        health = self._health_of(chain)
+        if not force and self._fresh(health):
+            return health
+        future = self._inflight.get(chain)
+        if future is None:
+            future = self._inflight[chain] = asyncio.ensure_future(self._check(health))
+        return await asyncio.shield(future)
+
+    async def _check(self, health: ProxyHealth) -> ProxyHealth:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # 每个event loop(进程)独立的并发上限
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                t0 = time.monotonic()
+                try:
+                    ip = await self.checker(health.chain)
+                except Exception as e:
+                    health.record(False, error=e)
+                else:
+                    health.record(True, time.monotonic() - t0, ip)
+        finally:
+            del self._inflight[health.chain]
+        return health
+
+    async def check_ip(self, proxies: ProxyLike) -> str:
+        """:return: 出口ip
+        :raise ProxyException: proxy不可用
+        """
+        health = await self.check(proxies)
+        if health.ok:
+            return health.ip
+        if isinstance(health.error, ProxyException):
+            raise health.error
+        snap = health.chain[0] if len(health.chain) == 1 else list(health.chain)
+        raise ProxyException(snap, 'ProxyUnavailable', f'{type(health.error).__name__}: {health.error}')
+
+    async def check_many(self, candidates: Iterable[ProxyLike], force: bool = False) -> list[ProxyHealth]:
+        """并发检测多个proxy(链)"""
+        return list(await asyncio.gather(*(self.check(p, force) for p in candidates)))
+
+    def ranked(self, candidates: Iterable[ProxyLike] | None = None) -> list[ProxyHealth]:
+        """按评分排序的已检测结果(只使用缓存, 不发起检测); candidates为None时为所有proxy"""
+        if candidates is None:
+            healths = list(self._health.values())
+        else:
+            healths = [h for h in (self._health.get(chain_of(p)) for p in candidates) if h is not None]
+        return sorted(healths, key=lambda h: h.score)
+
+    async def fastest(self, candidates: Iterable[ProxyLike]) -> ProxyChain:
+        """检测并返回最快的可用proxy(链)
+        :raise ProxyException: 所有proxy都不可用; proxy_snap为None(已逐个记录失败), extra['candidates']为检测的proxy(链)
+        """
+        healths = sorted(await self.check_many(candidates), key=lambda h: h.score)
+        if not healths or not healths[0].ok:
+            error = ProxyException(None, 'NoHealthyProxy', '没有可用的proxy')
+            error.extra['candidates'] = [list(h.chain) for h in healths]
+            raise error
+        return healths[0].chain
+
+    def mark_failed(self, proxies: ProxyLike, error: Exception | None = None):
+        """请求中发现proxy不可用时记录失败, 在fail_ttl内不会被选中"""
+        self._health_of(chain_of(proxies)).record(False, error=error)
+
+    async def failover(self, error: ProxyException, candidates: Iterable[ProxyLike]) -> ProxyChain:
+        """proxy(链)失败后切换: 记录 error.proxy_snap 的失败, 从其他候选中选出最快的可用proxy"""
+        snap = error.proxy_snap
+        failed = chain_of(snap) if snap else ()
+        if failed:
+            self.mark_failed(failed, error)
+        return await self.fastest(c for c in map(chain_of, candidates) if c != failed)
+
+    def stats(self) -> dict[ProxyChain, dict]:
+        return {chain: {'ok': h.ok, 'ip': h.ip, 'latency': h.latency, 'failures': h.failures,
+                        'failure_rate': h.failure_rate}
+                for chain, h in self._health.items()}
+
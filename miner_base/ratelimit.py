@@ -0,0 +1,184 @@
+"""
+限速: 进程内所有帐户共享, 代替脚本中分散的 asyncio.sleep(randint(...))
+- 令牌桶: 按host, 按帐户限制请求速率
+- AIMD并发上限: 按host, 根据延迟与错误率自动调整(成功时缓慢增加, 429/5xx/超时/高延迟时减半)
+- Retry-After: 服务端返回后, 该host的所有请求暂停到指定时间
+"""
+import asyncio
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+
+class TokenBucket:
+    """令牌桶: 允许令牌为负(预约), 等待者按调用顺序依次获得令牌, 无需轮询"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float):
+        """
+        :param rate: 每秒产生的令牌数
+        :param burst: 令牌上限(允许的突发请求数)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, n: float = 1) -> float:
+        """预约n个令牌, 返回需要等待的时间(s)"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self, n: float = 1):
+        if (delay := self.reserve(n)) > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveLimit:
+    """AIMD并发上限: 成功且延迟低于目标时 limit += 1/limit; 失败或延迟过高时 limit *= backoff
+    同一个延迟周期内最多减小一次, 避免并发的大量失败使limit瞬间降到最小
+    """
+
+    def __init__(self, initial: float = 16, min_limit: float = 1, max_limit: float = 512,
+                 latency_target: float = 2, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.inflight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._decreased = 0.
+
+    async def acquire(self):
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():  # 已分配的名额转给下一个等待者
+                self.inflight -= 1
+                self._wakeup()
+            raise
+
+    def release(self, ok: bool, latency: float | None = None):
+        """
+        :param ok: 请求是否成功(非429/5xx/网络错误)
+        :param latency: 请求延迟(s)
+        """
+        self.inflight -= 1
+        now = time.monotonic()
+        if not ok or (latency is not None and latency > self.latency_target):
+            if now - self._decreased > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._decreased = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wakeup()
+
+    def _wakeup(self):
+        while self._waiters and self.inflight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.inflight += 1
+                future.set_result(None)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After: 秒数 或 HTTP-date"""
+    if not value:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0., parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """进程内共享的限速器, 一般设置在 SessionPool(rate_limiter=...) 上, 由所有帐户的APICaller共用"""
+
+    def __init__(self,
+                 host_rate: float = 50, host_burst: float = 100,
+                 account_rate: float | None = 2, account_burst: float = 5,
+                 host_limits: dict[str, tuple[float, float]] | None = None,
+                 adaptive: bool = True,
+                 **adaptive_options):
+        """
+        :param host_rate: 每个host每秒请求数
+        :param host_burst: 每个host的突发请求数
+        :param account_rate: 每个帐户每秒请求数, None为不限制
+        :param account_burst: 每个帐户的突发请求数
+        :param host_limits: 指定host的 (rate, burst), 覆盖 host_rate/host_burst
+        :param adaptive: 是否按host启用AIMD并发上限
+        :param adaptive_options: AdaptiveLimit 参数
+        """
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.host_limits = host_limits or {}
+        self.adaptive = adaptive
+        self.adaptive_options = adaptive_options
+        self._host_buckets: dict[str, TokenBucket] = {}
+        self._account_buckets: dict[Any, TokenBucket] = {}
+        self._limits: dict[str, AdaptiveLimit] = {}
+        self._blocked: dict[str, float] = {}  # host => time.monotonic() 暂停到
+
+    def _host_bucket(self, host: str) -> TokenBucket:
+        bucket = self._host_buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_limits.get(host, (self.host_rate, self.host_burst))
+            bucket = self._host_buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def limit_of(self, host: str) -> AdaptiveLimit | None:
+        if not self.adaptive:
+            return None
+        limit = self._limits.get(host)
+        if limit is None:
+            limit = self._limits[host] = AdaptiveLimit(**self.adaptive_options)
+        return limit
+
+    async def acquire(self, host: str, account: Any = None):
+        """等待直到可以向host发送请求; 之后必须调用 release"""
+        if self.account_rate is not None and account is not None:
+            bucket = self._account_buckets.get(account)
+            if bucket is None:
+                bucket = self._account_buckets[account] = TokenBucket(self.account_rate, self.account_burst)
+            await bucket.acquire()
+        while (blocked := self._blocked.get(host, 0) - time.monotonic()) > 0:
+            await asyncio.sleep(blocked)
+        await self._host_bucket(host).acquire()
+        if (limit := self.limit_of(host)) is not None:
+            await limit.acquire()
+
+    def release(self, host: str, status: int | None, latency: float | None = None, retry_after: str | None = None):
+        """
+        :param status: 响应状态码, None为网络错误
+        :param latency: 响应延迟(s)
+        :param retry_after: 响应头 Retry-After
+        """
+        ok = status is not None and status != 429 and status < 500
+        if (delay := parse_retry_after(retry_after)) is not None and not ok:
+            self._blocked[host] = max(self._blocked.get(host, 0), time.monotonic() + delay)
+        if (limit := self._limits.get(host)) is not None:
+            limit.release(ok, latency)
+
+    def stats(self) -> dict[str, dict]:
+        """host => 当前并发上限, 并发数, 暂停剩余时间"""
+        now = time.monotonic()
+        return {host: {'limit': limit.limit, 'inflight': limit.inflight,
+                       'blocked': max(0., self._blocked.get(host, 0) - now)}
+                for host, limit in self._limits.items()}
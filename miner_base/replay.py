@@ -0,0 +1,278 @@
+"""
+流量录制/回放: 离线复现脚本的请求, 用于在无网络的CI上做可重复的性能测试
+- 录制: RecordingAPICaller 在正常请求的同时, 将请求与响应(状态码/headers/body/耗时)写入gzip压缩的JSON Lines文件
+- 回放: ReplayAPICaller 按 (帐户, method, url) 顺序返回录制的响应, 不访问网络; 可按录制的时间线(开始时间+耗时)或加速回放
+
+>>> with TrafficRecorder('traffic.jsonl.gz') as recorder:
+>>>     caller = RecordingAPICaller.of(pool, tg_session, registry=API, recorder=recorder)
+>>>     ...
+>>> player = TrafficPlayer('traffic.jsonl.gz', speed=10)  # 10倍速; speed=None 不等待
+>>> caller = ReplayAPICaller.of(None, tg_session, registry=API, player=player)
+"""
+import asyncio
+import base64
+import gzip
+import json
+import time
+from typing import Any, Iterable, Mapping
+
+import aiohttp
+from aiohttp import ClientResponse
+from aiohttp.typedefs import StrOrURL
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from miner_base import codec
+from miner_base.exception import InteractorArgsException
+from miner_base.impl import AiohttpAPICaller, SessionPool
+
+__all__ = ['TrafficRecorder', 'RecordingAPICaller', 'TrafficPlayer', 'ReplayResponse', 'ReplayAPICaller']
+
+VERSION = 1
+
+_KEY = tuple[Any, str, str]  # (account, method, url)
+
+
+def _url_of(url: StrOrURL, params: Mapping | None, ignore_params: frozenset[str] = frozenset()) -> str:
+    """url与params合并为完整url, 忽略ignore_params中的参数(时间戳等每次都不同的参数)"""
+    url = URL(url)
+    if params:
+        url = url.update_query({k: v for k, v in params.items() if v is not None})
+    if ignore_params and url.query:
+        url = url.with_query({k: v for k, v in url.query.items() if k not in ignore_params})
+    return str(url)
+
+
+def _body_of(kwargs: Mapping) -> Any:
+    body = kwargs.get('json')
+    if body is None:
+        body = kwargs.get('data')
+    if isinstance(body, bytes):
+        return body.decode(errors='replace')
+    return body
+
+
+class TrafficRecorder:
+    """录制文件: 第一行为header, 之后每行一个请求
+    `{"t": 开始时间(相对录制开始, s), "d": 耗时(s), "a": 帐户, "m": method, "u": url, "q": 请求body,
+      "s": 状态码, "r": reason, "h": [[header, value]], "c": 文本body | "c64": base64 body | "e": [异常类型, 信息]}`
+    """
+
+    def __init__(self, path: str, compresslevel: int = 6):
+        self.path = path
+        self.entries = 0
+        self._started = time.monotonic()
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=compresslevel)
+        self._write({'v': VERSION, 'started': time.time()})
+
+    def _write(self, entry: dict):
+        self._file.write(codec.dumps(entry, default=str))
+        self._file.write('\n')
+
+    def record(self, account: Any, method: str, url: StrOrURL, kwargs: Mapping, started: float,
+               response: ClientResponse | None = None, body: bytes | None = None, error: Exception | None = None):
+        """
+        :param started: 请求开始的 time.monotonic()
+        """
+        if self._file is None:
+            return
+        now = time.monotonic()
+        entry = {'t': round(started - self._started, 6), 'd': round(now - started, 6), 'a': account,
+                 'm': method.upper(), 'u': _url_of(url, kwargs.get('params'))}
+        if (request_body := _body_of(kwargs)) is not None:
+            entry['q'] = request_body
+        if error is not None:
+            entry['e'] = [type(error).__name__, str(error)]
+        else:
+            entry['s'] = response.status
+            entry['r'] = response.reason
+            entry['h'] = list(response.headers.items())
+            try:
+                entry['c'] = body.decode()
+            except UnicodeDecodeError:
+                entry['c64'] = base64.b64encode(body).decode()
+        self._write(entry)
+        self.entries += 1
+
+    def close(self):
+        if self._file is not None:
+            file, self._file = self._file, None
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingAPICaller(AiohttpAPICaller):
+    """正常请求, 同时录制每个请求(包括重试)的响应"""
+
+    def __init__(self, pool: SessionPool, *args, recorder: TrafficRecorder, **kwargs):
+        super().__init__(pool, *args, **kwargs)
+        self.recorder = recorder
+
+    async def _send_once(self, method: str, url: StrOrURL, kwargs: dict) -> ClientResponse:
+        started = time.monotonic()
+        try:
+            response = await super()._send_once(method, url, kwargs)
+            body = await response.read()  # body缓存在response中, 脚本仍可正常读取
+        except Exception as e:
+            self.recorder.record(self.account, method, url, kwargs, started, error=e)
+            raise
+        self.recorder.record(self.account, method, url, kwargs, started, response=response, body=body)
+        return response
+
+
+class ReplayResponse:
+    """录制的响应, 接口与aiohttp.ClientResponse的常用部分相同"""
+
+    __slots__ = ('method', 'url', 'status', 'reason', 'headers', '_body')
+
+    def __init__(self, method: str, url: str, status: int, reason: str | None, headers: list, body: bytes):
+        self.method = method
+        self.url = URL(url)
+        self.status = status
+        self.reason = reason
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+
+    @classmethod
+    def of_entry(cls, entry: dict) -> 'ReplayResponse':
+        body = entry['c'].encode() if 'c' in entry else base64.b64decode(entry.get('c64', ''))
+        return cls(entry['m'], entry['u'], entry['s'], entry.get('r'), entry.get('h') or [], body)
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get(aiohttp.hdrs.CONTENT_TYPE, 'application/octet-stream').split(';')[0].strip()
+
+    @property
+    def request_info(self) -> aiohttp.RequestInfo:
+        return aiohttp.RequestInfo(self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise aiohttp.ClientResponseError(self.request_info, (), status=self.status, message=self.reason or '',
+                                              headers=self.headers)
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: str | None = None, errors: str = 'strict') -> str:
+        return self._body.decode(encoding or 'utf-8', errors)
+
+    async def json(self, *, encoding: str | None = None, loads=json.loads, content_type: str | None = None) -> Any:
+        stripped = self._body.strip()
+        if not stripped:
+            return None
+        return loads(stripped.decode(encoding or 'utf-8'))
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+    async def wait_for_close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class TrafficPlayer:
+    """加载录制文件, 多个帐户共享
+    匹配顺序: 同一帐户的 (method, url) 按录制顺序依次返回, 用完后重复最后一个;
+    帐户没有录制时(回放的帐户数多于录制的), 循环使用其他帐户同一 (method, url) 的录制
+    """
+
+    def __init__(self, path: str, speed: float | None = 1.0, strict: bool = False,
+                 ignore_params: Iterable[str] = ()):
+        """
+        :param speed: 回放速度倍数; None为不等待
+            请求不早于录制时的开始时间 t/speed(相对第一次回放)发出, 再等待录制耗时 d/speed 后返回;
+            脚本比录制时慢时, 只等待耗时
+        :param strict: 为True时, 帐户的录制用完或没有录制都抛出异常, 而不是复用
+        :param ignore_params: 匹配时忽略的query参数
+        """
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.ignore_params = frozenset(ignore_params)
+        self.hits = 0
+        self.reused = 0
+        self._by_account: dict[_KEY, list[dict]] = {}
+        self._by_url: dict[tuple[str, str], list[dict]] = {}
+        self._cursor: dict[_KEY, int] = {}
+        self._clock: float | None = None  # 第一次回放的 time.monotonic(), 对应录制开始
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = codec.loads(f.readline() or '{}')
+            if header.get('v') != VERSION:
+                raise InteractorArgsException(f'不支持的录制文件: {path}', {'path': path, 'version': header.get('v')})
+            for line in f:
+                entry = codec.loads(line)
+                url = _url_of(entry['u'], None, self.ignore_params)
+                self._by_account.setdefault((entry['a'], entry['m'], url), []).append(entry)
+                self._by_url.setdefault((entry['m'], url), []).append(entry)
+
+    def __len__(self):
+        return sum(map(len, self._by_account.values()))
+
+    def match(self, account: Any, method: str, url: StrOrURL, params: Mapping | None = None) -> dict:
+        method = method.upper()
+        url = _url_of(url, params, self.ignore_params)
+        key = (account, method, url)
+        cursor = self._cursor.get(key, 0)
+        self._cursor[key] = cursor + 1
+        entries = self._by_account.get(key)
+        if entries is not None and cursor < len(entries):
+            self.hits += 1
+            return entries[cursor]
+        if not self.strict:
+            if entries is not None:
+                self.reused += 1
+                return entries[-1]
+            if (entries := self._by_url.get((method, url))) is not None:
+                self.reused += 1
+                return entries[cursor % len(entries)]
+        raise InteractorArgsException(f'没有录制的响应: {method} {url}',
+                                      {'account': account, 'method': method, 'url': url, 'index': cursor})
+
+    async def play(self, account: Any, method: str, url: StrOrURL, kwargs: Mapping) -> ReplayResponse:
+        entry = self.match(account, method, url, kwargs.get('params'))
+        if self.speed is not None:
+            now = time.monotonic()
+            if self._clock is None:
+                self._clock = now
+            started = max(now, self._clock + entry['t'] / self.speed)
+            if (delay := started + entry['d'] / self.speed - now) > 0:
+                await asyncio.sleep(delay)
+        if 'e' in entry:
+            name, msg = entry['e']
+            if 'Timeout' in name:
+                raise asyncio.TimeoutError(msg)
+            raise aiohttp.ClientConnectionError(f'{name}: {msg}')
+        return ReplayResponse.of_entry(entry)
+
+
+class ReplayAPICaller(AiohttpAPICaller):
+    """从录制文件返回响应, 不访问网络(不需要SessionPool, 不经过限速/熔断); 重试仍然生效"""
+
+    def __init__(self, pool: SessionPool | None, *args, player: TrafficPlayer, **kwargs):
+        super().__init__(pool, *args, **kwargs)
+        self.player = player
+
+    @property
+    def session(self):
+        raise InteractorArgsException('回放模式不支持直接使用session', {'account': self.account})
+
+    async def _send_once(self, method: str, url: StrOrURL, kwargs: dict) -> ReplayResponse:
+        return await self.player.play(self.account, method, url, kwargs)
@@ -0,0 +1,208 @@
+"""
+重试引擎: 按 ExecutorException 的语义统一处理重试, 代替脚本中的 try/except + asyncio.sleep(3)
+- classify: 将aiohttp/asyncio异常转换为 NetworkException / ProxyException / HttpStatusException
+- 只重试 NormalExecutorException; FatalExecutorException 与未知异常直接抛出(交给TaskRunner处理)
+- 指数退避 + full jitter, RetryBudget 限制重试占总请求的比例
+- CircuitBreaker: 按proxy快照 / host熔断, 连续失败后快速失败, 不再占用连接与event loop
+
+>>> @retry(attempts=5)
+... async def _get_game_info():
+...     return await caller.api('getGameInfo')
+"""
+import asyncio
+import functools
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Literal, TypeVar
+
+import aiohttp
+
+from miner_base.exception import ExecutorException, NormalExecutorException, NetworkException, ProxyException, \
+    HttpStatusException
+
+T = TypeVar('T')
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+def classify(error: BaseException, proxy_snap: str | None = None) -> BaseException:
+    """将异常转换为 ExecutorException; 无法识别的异常原样返回(按严重错误处理)"""
+    if isinstance(error, ExecutorException):
+        return error
+    if isinstance(error, aiohttp.ClientHttpProxyError) and error.status == 407:
+        return ProxyException(proxy_snap or '', 'ProxyAuthError', str(error))
+    if isinstance(error, aiohttp.ClientResponseError):
+        if error.status in RETRY_STATUS:
+            url = str(error.request_info.real_url) if error.request_info is not None else ''
+            return HttpStatusException(error.status, error.message, url)
+        return error
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ServerTimeoutError)):
+        return NetworkException(f'{type(error).__name__}: {error}', 'PROXY_TIMEOUT' if proxy_snap else 'NET_TIMEOUT')
+    if isinstance(error, (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError)):
+        return NetworkException(f'{type(error).__name__}: {error}', 'PROXY_ERROR')
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return NetworkException(f'{type(error).__name__}: {error}', 'PROXY_ERROR' if proxy_snap else 'NET_ERROR')
+    if type(error).__module__.startswith('python_socks'):  # aiohttp_socks
+        return NetworkException(f'{type(error).__name__}: {error}', 'PROXY_ERROR')
+    return error
+
+
+def is_proxy_error(error: BaseException) -> bool:
+    """是否确定为proxy本身的故障(连接proxy失败 / proxy返回错误)
+    经过proxy的超时与连接错误也可能是游戏服务器的问题, 不计入proxy熔断器"""
+    return (isinstance(error, (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError))
+            or type(error).__module__.startswith('python_socks'))
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """
+    :param attempts: 最多尝试次数(含第一次)
+    :param base: 首次重试的退避上限(s), 之后每次翻倍
+    :param cap: 退避上限(s)
+    :param methods: APICaller中允许重试的HTTP方法(默认只重试幂等请求)
+    """
+    attempts: int = 3
+    base: float = 0.5
+    cap: float = 30
+    methods: frozenset[str] = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+    def delay(self, attempt: int) -> float:
+        """full jitter: [0, min(cap, base * 2^attempt)]"""
+        return random.uniform(0, min(self.cap, self.base * (1 << attempt)))
+
+
+class RetryBudget:
+    """重试预算: 每次请求存入ratio个令牌, 每次重试消耗1个; 另外每秒补充min_per_sec个
+    后端整体故障时, 重试量被限制为请求量的ratio倍, 避免重试风暴
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_sec: float = 1, max_tokens: float = 100):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def deposit(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """熔断器: 连续失败failure_threshold次后打开, reset_timeout后半开, 允许1个探测请求
+    打开时抛出可重试的 NetworkException(CIRCUIT_OPEN), 不会让TaskRunner结束帐户"""
+
+    __slots__ = ('kind', 'key', 'failure_threshold', 'reset_timeout', 'failures', 'state', 'opened_at')
+
+    def __init__(self, kind: Literal['proxy', 'host'], key: str, failure_threshold: int = 5,
+                 reset_timeout: float = 30):
+        self.kind = kind
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state: Literal['closed', 'open', 'half_open'] = 'closed'
+        self.opened_at = 0.
+
+    def check(self) -> bool:
+        """打开时抛出 NetworkException(CIRCUIT_OPEN)
+        :return: 是否为半开状态的探测请求; 探测请求必须调用 record() 或 release()
+        """
+        if self.state == 'closed':
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:  # open => 半开; 半开超时 => 重新探测
+            self.state = 'half_open'
+            self.opened_at = time.monotonic()
+            return True
+        raise NetworkException(f'熔断中: {self.kind} {self.key} 连续失败{self.failures}次', 'CIRCUIT_OPEN')
+
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            self.state = 'closed'
+            return
+        self.failures += 1
+        if self.state == 'half_open' or self.failures >= self.failure_threshold:
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """探测请求没有结果(被取消, 其他熔断器拒绝, 非网络错误)时释放探测名额, 下一个请求立即重新探测"""
+        if self.state == 'half_open':
+            self.state = 'open'
+            self.opened_at = time.monotonic() - self.reset_timeout
+
+
+class BreakerRegistry:
+    """进程内共享的熔断器, 一般设置在 SessionPool(breakers=...) 上"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: dict[tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, kind: Literal['proxy', 'host'], key: str) -> CircuitBreaker:
+        breaker = self._breakers.get((kind, key))
+        if breaker is None:
+            breaker = self._breakers[(kind, key)] = CircuitBreaker(kind, key, self.failure_threshold,
+                                                                   self.reset_timeout)
+        return breaker
+
+    def open_breakers(self) -> list[CircuitBreaker]:
+        return [b for b in self._breakers.values() if b.state != 'closed']
+
+
+class Retry:
+    """重试引擎, 可作为装饰器, 也可设置为 AiohttpAPICaller(retry=...)"""
+
+    def __init__(self, policy: RetryPolicy | None = None, budget: RetryBudget | None = None):
+        self.policy = policy or RetryPolicy()
+        self.budget = budget
+
+    async def run(self, fn: Callable[[], Awaitable[T]], proxy_snap: str | None = None, attempts: int | None = None,
+                  on_retry: Callable[[int, BaseException, float], None] | None = None) -> T:
+        """执行fn, 失败时按策略重试; 最终抛出的是 classify 转换后的异常
+        :param attempts: 覆盖 policy.attempts
+        :param on_retry: 重试前回调 (attempt, error, delay), 可用于 updater.warning
+        """
+        attempts = attempts or self.policy.attempts
+        if self.budget is not None:
+            self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                error = classify(e, proxy_snap)
+                attempt += 1
+                if (not isinstance(error, NormalExecutorException) or attempt >= attempts
+                        or error.err_name == 'CIRCUIT_OPEN'  # 熔断中, 快速失败
+                        or (self.budget is not None and not self.budget.withdraw())):
+                    if error is e:
+                        raise
+                    raise error from e
+                delay = self.policy.delay(attempt - 1)
+                if on_retry is not None:
+                    on_retry(attempt, error, delay)
+                await asyncio.sleep(delay)
+
+    def __call__(self, func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await self.run(lambda: func(*args, **kwargs))
+
+        return wrapper
+
+
+def retry(attempts: int = 3, base: float = 0.5, cap: float = 30, budget: RetryBudget | None = None):
+    """装饰器: 按 RetryPolicy 重试 async 函数"""
+    return Retry(RetryPolicy(attempts=attempts, base=base, cap=cap), budget)
@@ -0,0 +1,158 @@
+"""
+Task运行器: 发现脚本中的 `thread_` 函数, 在同一个event loop中为多个帐户并发运行
+
+异常语义(与 exception.py 保持一致):
+- NormalExecutorException: 仅重启出错的thread函数(sleep后重试), 不影响其他thread
+- FatalExecutorException 及未知异常: 取消该帐户的所有thread函数; 按 retry 次数重启整个任务, 仍然失败则结束任务
+"""
+import asyncio
+import inspect
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Callable, Awaitable, Mapping, Iterable
+
+from miner_base.api import ApiRegistry
+from miner_base.exception import NormalExecutorException
+from miner_base.model import ScriptRuntimeArgs, StatusUpdater, APICaller, State, TSK_STATUS, ScriptProfile
+
+THREAD_PREFIX = 'thread_'
+
+ThreadFunc = Callable[[ScriptRuntimeArgs, StatusUpdater, APICaller, State], Awaitable[None]]
+
+
+def discover_threads(module: ModuleType) -> dict[str, ThreadFunc]:
+    """读取脚本模块中所有以 `thread_` 开头的协程函数"""
+    return {name: func for name, func in vars(module).items()
+            if name.startswith(THREAD_PREFIX) and inspect.iscoroutinefunction(func)}
+
+
+def discover_profile(module: ModuleType) -> type[ScriptProfile]:
+    """读取脚本模块中定义的Profile类: 最后定义的ScriptProfile子类(最终的子类, 与 loader.inspect_source 相同),
+    没有定义时使用ScriptProfile"""
+    profile = ScriptProfile
+    for value in vars(module).values():
+        if (isinstance(value, type) and issubclass(value, ScriptProfile) and value is not ScriptProfile
+                and value.__module__ == module.__name__):
+            profile = value
+    return profile
+
+
+def discover_registry(module: ModuleType) -> ApiRegistry | None:
+    """读取脚本模块顶层声明的API注册表"""
+    return next((value for value in vars(module).values() if isinstance(value, ApiRegistry)), None)
+
+
+def _first_error(error: BaseException) -> BaseException:
+    """TaskGroup抛出ExceptionGroup, 取第一个真实异常用于报告"""
+    while isinstance(error, BaseExceptionGroup):
+        error = error.exceptions[0]
+    return error
+
+
+@dataclass(slots=True, eq=False)
+class AccountTask:
+    """单个帐户的运行上下文: thread函数的4个参数 + 运行状态"""
+    args: ScriptRuntimeArgs
+    updater: StatusUpdater
+    caller: APICaller
+    state: State = field(default_factory=lambda: State({}))
+    name: str = ''
+    status: TSK_STATUS = 'initialized'
+    error: BaseException | None = None
+
+    def __post_init__(self):
+        if not self.name:
+            tg_session = getattr(self.args, 'tg_session', None) or {}
+            self.name = str(tg_session.get('id', id(self)))
+
+    def set_status(self, status: TSK_STATUS, msg: str, error: BaseException | None = None):
+        self.status = status
+        if error is None:
+            self.updater.info(msg, status=status)
+        else:
+            self.error = error
+            self.updater.error(msg, status=status, error=error)
+
+
+class TaskRunner:
+    """在单个event loop中运行多个帐户的thread函数"""
+
+    def __init__(self,
+                 threads: Mapping[str, ThreadFunc],
+                 max_concurrency: int | None = None,
+                 retry: int = 0,
+                 retry_delay: float = 30,
+                 normal_retry_delay: float = 3):
+        """
+        :param threads: thread函数, 见 discover_threads
+        :param max_concurrency: 同时运行的帐户数上限, None为不限制; 超出的帐户处于queued状态
+        :param retry: Fatal错误后重启整个任务的次数
+        :param retry_delay: 重启任务前等待(s)
+        :param normal_retry_delay: Normal错误后重启thread函数前等待(s)
+        """
+        if not threads:
+            raise ValueError('脚本中没有 thread_ 函数')
+        self.threads = dict(threads)
+        self.retry = retry
+        self.retry_delay = retry_delay
+        self.normal_retry_delay = normal_retry_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    @classmethod
+    def of_module(cls, module: ModuleType, **kwargs):
+        return cls(discover_threads(module), **kwargs)
+
+    def update_threads(self, threads: Mapping[str, ThreadFunc]):
+        """热更新thread函数: 正在运行的thread不受影响, 之后(重)启动的thread使用新函数
+        新增的thread在帐户下次启动任务时运行"""
+        if not threads:
+            raise ValueError('脚本中没有 thread_ 函数')
+        self.threads = dict(threads)
+
+    async def _run_thread(self, task: AccountTask, thread_name: str, func: ThreadFunc):
+        while True:
+            try:
+                return await func(task.args, task.updater, task.caller, task.state)
+            except NormalExecutorException as e:
+                task.updater.warning(f'{func.__name__}: {e}', error=e)
+                await asyncio.sleep(self.normal_retry_delay)
+                func = self.threads.get(thread_name, func)
+
+    async def _run_once(self, task: AccountTask):
+        async with asyncio.TaskGroup() as tg:
+            for thread_name, func in self.threads.items():
+                tg.create_task(self._run_thread(task, thread_name, func), name=f'{task.name}:{thread_name}')
+
+    async def _run_account(self, task: AccountTask) -> AccountTask:
+        task.set_status('running', '任务开始运行')
+        for attempt in range(self.retry + 1):
+            try:
+                await self._run_once(task)
+            except Exception as e:
+                error = _first_error(e)
+                if attempt >= self.retry:
+                    task.set_status('failed', f'任务失败: {error}', error=error)
+                    return task
+                task.updater.warning(f'任务出错, {self.retry_delay}s后重试({attempt + 1}/{self.retry}): {error}',
+                                     error=error)
+                await asyncio.sleep(self.retry_delay)
+            else:
+                task.set_status('completed', '任务完成')
+                return task
+        return task
+
+    async def run_account(self, task: AccountTask) -> AccountTask:
+        """运行单个帐户直到完成/失败; 被取消时状态为canceled并继续抛出CancelledError"""
+        try:
+            if self._semaphore is None:
+                return await self._run_account(task)
+            task.set_status('queued', '任务排队中')
+            async with self._semaphore:
+                return await self._run_account(task)
+        except asyncio.CancelledError:
+            task.set_status('canceled', '任务已取消')
+            raise
+
+    async def run(self, tasks: Iterable[AccountTask]) -> list[AccountTask]:
+        """并发运行所有帐户, 单个帐户失败不影响其他帐户"""
+        return list(await asyncio.gather(*(self.run_account(task) for task in tasks)))
@@ -0,0 +1,195 @@
+"""
+多进程模式: 将帐户列表分片到多个worker进程, 每个进程运行独立的event loop + TaskRunner
+worker中的状态/日志事件批量通过 multiprocessing.Queue 转发回父进程的 StatusUpdater
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import pickle
+from queue import Empty
+from typing import Any, Callable, Sequence
+
+from miner_base.model import StatusUpdater, TgSessionArgs, TSK_STATUS, LOG_LEVEL, ScriptRuntimeArgs, GFMPlugin, \
+    APICaller
+from miner_base.loader import ScriptLoader
+from miner_base.runner import TaskRunner, AccountTask, discover_threads, discover_profile, discover_registry
+
+# (account, status, level, msg, extra, error)
+ShardEvent = tuple[str, TSK_STATUS | None, LOG_LEVEL, str, dict | None, Exception | None]
+
+CallerFactory = Callable[[Any, TgSessionArgs], APICaller]
+PluginsFactory = Callable[[ScriptRuntimeArgs], list[GFMPlugin]]
+
+
+def load_script(script: str):
+    """按模块名(examples.example4_tg_yescoin)或文件路径(xxx/script.py)导入脚本
+    文件路径通过 ScriptLoader 加载, 编译结果缓存在 MINER_SCRIPT_CACHE 目录(worker进程间共用)"""
+    if not script.endswith('.py'):
+        return importlib.import_module(script)
+    global _loader
+    if _loader is None:
+        _loader = ScriptLoader(os.environ.get('MINER_SCRIPT_CACHE'))
+    return _loader.load(script).module
+
+
+_loader: ScriptLoader | None = None
+
+
+def no_plugins(_: ScriptRuntimeArgs) -> list[GFMPlugin]:
+    return []
+
+
+def _portable_error(error: Exception | None) -> Exception | None:
+    """第三方异常不一定能被pickle, 无法pickle时转为普通Exception"""
+    if error is None:
+        return None
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return Exception(f'{type(error).__name__}: {error}')
+
+
+class _ShardChannel:
+    """worker侧事件缓冲, 定时批量发送, 每批只做一次pickle+IPC"""
+
+    def __init__(self, queue, flush_interval: float):
+        self.queue = queue
+        self.flush_interval = flush_interval
+        self.buffer: list[ShardEvent] = []
+
+    def flush(self):
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            self.queue.put(('events', batch))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+
+class ShardStatusUpdater(StatusUpdater):
+    """worker侧updater: 只将事件加入缓冲"""
+    __slots__ = ('channel', 'account', '_min_level_no')
+
+    def __init__(self, channel: _ShardChannel, account: str):
+        self.channel = channel
+        self.account = account
+        self._min_level_no = 0
+
+    def update(self, status: TSK_STATUS | None, level: LOG_LEVEL, msg: str, extra: dict, error: Exception = None):
+        self.channel.buffer.append((self.account, status, level, msg, extra, _portable_error(error)))
+
+
+async def _worker_run(script: str, sessions: Sequence[TgSessionArgs], profile: dict, caller_factory: CallerFactory,
+                      plugins_factory: PluginsFactory, runner_options: dict, channel: _ShardChannel):
+    from miner_base.impl import SessionPool
+
+    module = load_script(script)
+    runner = TaskRunner(discover_threads(module), **runner_options)
+    profile = discover_profile(module).model_validate(profile)
+    registry = discover_registry(module)
+    flusher = asyncio.create_task(channel.run())
+    async with SessionPool() as pool:
+        tasks = [AccountTask(args=args,
+                             updater=ShardStatusUpdater(channel, str(args.tg_session['id'])),
+                             caller=caller_factory(pool, args.tg_session))
+                 for args in ScriptRuntimeArgs.bulk_of(list(sessions), profile, plugins_factory)]
+        if registry is not None:
+            for task in tasks:
+                if getattr(task.caller, 'registry', ...) is None:
+                    task.caller.use(registry)
+        await runner.run(tasks)
+        for task in tasks:
+            if (close := getattr(task.caller, 'close', None)) is not None:
+                await close()
+    flusher.cancel()
+    channel.flush()
+    return {task.name: task.status for task in tasks}
+
+
+def _worker_main(script: str, sessions: Sequence[TgSessionArgs], profile: dict, caller_factory: CallerFactory,
+                 plugins_factory: PluginsFactory, runner_options: dict, queue, flush_interval: float):
+    channel = _ShardChannel(queue, flush_interval)
+    try:
+        statuses = asyncio.run(_worker_run(script, sessions, profile, caller_factory, plugins_factory,
+                                           runner_options, channel))
+        queue.put(('done', statuses))
+    except BaseException as e:
+        channel.flush()
+        queue.put(('crashed', _portable_error(e) if isinstance(e, Exception) else Exception(repr(e))))
+
+
+def shard(sessions: Sequence[TgSessionArgs], processes: int) -> list[list[TgSessionArgs]]:
+    """按轮询方式均匀分片"""
+    shards = [list(sessions[i::processes]) for i in range(processes)]
+    return [s for s in shards if s]
+
+
+async def run_sharded(script: str,
+                      sessions: Sequence[TgSessionArgs],
+                      updater: StatusUpdater,
+                      profile: dict | None = None,
+                      processes: int | None = None,
+                      caller_factory: CallerFactory | None = None,
+                      plugins_factory: PluginsFactory = no_plugins,
+                      runner_options: dict | None = None,
+                      flush_interval: float = 0.05) -> dict[str, TSK_STATUS]:
+    """多进程运行脚本, 在父进程event loop中调用
+    :param script: 脚本模块名或文件路径, worker进程内重新导入
+    :param sessions: 帐户列表, 按进程数分片
+    :param updater: 父进程updater, 所有帐户的事件汇总到这里, extra中带有 `account` 字段
+    :param profile: Profile参数(dict), worker内按脚本的Profile类校验
+    :param processes: worker进程数, 默认为cpu核数
+    :param caller_factory: `(SessionPool, tg_session) -> APICaller`, 必须可被pickle; 默认 AiohttpAPICaller.of
+    :param plugins_factory: 见 ScriptRuntimeArgs.of, 必须可被pickle
+    :param runner_options: 传给 TaskRunner 的参数
+    :param flush_interval: worker发送事件批次的间隔(s)
+    :return: 帐户id => 最终状态
+    """
+    if caller_factory is None:
+        from miner_base.impl import AiohttpAPICaller
+        caller_factory = AiohttpAPICaller.of
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_worker_main, daemon=True,
+                           args=(script, part, profile or {}, caller_factory, plugins_factory, runner_options or {},
+                                 queue, flush_interval))
+               for part in shard(sessions, processes or os.cpu_count())]
+    for worker in workers:
+        worker.start()
+
+    loop = asyncio.get_running_loop()
+    statuses: dict[str, TSK_STATUS] = {}
+    pending = len(workers)
+    try:
+        while pending:
+            try:
+                kind, payload = await loop.run_in_executor(None, queue.get, True, 1)
+            except Empty:
+                if any(worker.is_alive() for worker in workers) or not queue.empty():
+                    continue
+                updater.update(None, 'CRITICAL', f'{pending}个worker进程意外退出', {}, None)
+                break
+            if kind == 'events':
+                for account, status, level, msg, extra, error in payload:
+                    updater.update(status, level, msg, {**(extra or {}), 'account': account}, error)
+            elif kind == 'done':
+                statuses.update(payload)
+                pending -= 1
+            else:
+                updater.update(None, 'CRITICAL', f'worker进程异常退出: {payload}', {}, payload)
+                pending -= 1
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    return statuses
+
+
+def run_sharded_sync(*args, **kwargs) -> dict[str, TSK_STATUS]:
+    """run_sharded 的同步版本"""
+    return asyncio.run(run_sharded(*args, **kwargs))
@@ -0,0 +1,210 @@
+"""
+批量获取TMA token: 大量帐户启动时代替逐个 `PluginTelegram.get_tma_token`
+- TgClientPool: 按session复用已连接的Telegram客户端, 空闲客户端按LRU断开
+- 全局并发上限 + 按DC的令牌桶限速; 收到FloodWait时暂停该DC并重试
+- 结果按完成顺序流式返回
+
+Telegram客户端(Telethon, Pyrogram...)由Plugin实现方通过 TgClient 适配
+>>> batcher = TmaTokenBatcher(TgClientPool(lambda session_name: MyTgClient(session_name)))
+>>> async for session_name, tma_url, token, error in batcher.fetch(pairs):
+...     ...
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Iterable
+
+from miner_base.model import TmaParam, TmaParam_of
+from miner_base.exception import InteractorArgsException
+from miner_base.ratelimit import TokenBucket
+from miner_base.tma import TmaTokenCache
+
+# (session_name, tma_url, token, error)
+TmaTokenResult = tuple[str, str, str | None, Exception | None]
+
+
+class FloodWait(Exception):
+    """Telegram要求等待(FLOOD_WAIT_X), TgClient实现需要将库的异常转换为本异常"""
+
+    def __init__(self, seconds: float):
+        super().__init__(f'FLOOD_WAIT_{seconds}')
+        self.seconds = seconds
+
+
+class TgClient(ABC):
+    """Telegram客户端适配器"""
+    session_name: str
+
+    @property
+    @abstractmethod
+    def dc_id(self) -> int:
+        """帐户所在的DC, connect后可用"""
+        ...
+
+    @abstractmethod
+    async def connect(self):
+        ...
+
+    @abstractmethod
+    async def request_web_view(self, tma: TmaParam, tma_url: str) -> str:
+        """:return: tg_web_data"""
+        ...
+
+    @abstractmethod
+    async def disconnect(self):
+        ...
+
+
+class TgClientPool:
+    """按session复用已连接的客户端; 最多保留max_idle个空闲客户端"""
+
+    def __init__(self, factory: Callable[[str], TgClient], max_idle: int = 100):
+        """
+        :param factory: `session_name -> TgClient`, 返回未连接的客户端
+        :param max_idle: 保持连接的空闲客户端数上限, 超过时断开最久未使用的
+        """
+        self.factory = factory
+        self.max_idle = max_idle
+        self.connects = 0
+        self._clients: dict[str, TgClient] = {}
+        self._refs: dict[str, int] = {}
+        self._idle: OrderedDict[str, None] = OrderedDict()
+        self._connecting: dict[str, asyncio.Future] = {}
+
+    async def acquire(self, session_name: str) -> TgClient:
+        """获取已连接的客户端(引用计数+1), 用完后必须 release"""
+        self._idle.pop(session_name, None)
+        self._refs[session_name] = self._refs.get(session_name, 0) + 1
+        try:
+            client = self._clients.get(session_name)
+            if client is not None:
+                return client
+            future = self._connecting.get(session_name)
+            if future is None:
+                future = self._connecting[session_name] = asyncio.ensure_future(self._connect(session_name))
+            return await asyncio.shield(future)
+        except BaseException:
+            await self.release(session_name)
+            raise
+
+    async def _connect(self, session_name: str) -> TgClient:
+        try:
+            client = self.factory(session_name)
+            await client.connect()
+            self.connects += 1
+            self._clients[session_name] = client
+            return client
+        finally:
+            del self._connecting[session_name]
+
+    async def release(self, session_name: str):
+        self._refs[session_name] -= 1
+        if self._refs[session_name] > 0:
+            return
+        del self._refs[session_name]
+        if session_name in self._clients:
+            self._idle[session_name] = None
+        while len(self._idle) > self.max_idle:
+            name, _ = self._idle.popitem(last=False)
+            await self._clients.pop(name).disconnect()
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        self._idle.clear()
+        for client in clients.values():
+            await client.disconnect()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class TmaTokenBatcher:
+    """批量获取TMA token"""
+
+    def __init__(self, pool: TgClientPool, concurrency: int = 16, dc_rate: float = 5, dc_burst: float = 10,
+                 flood_retries: int = 2, max_flood_wait: float = 60, cache: TmaTokenCache | None = None):
+        """
+        :param pool: 客户端池
+        :param concurrency: 同时获取token的帐户数上限
+        :param dc_rate: 每个DC每秒请求数
+        :param dc_burst: 每个DC的突发请求数
+        :param flood_retries: 收到FloodWait后的重试次数
+        :param max_flood_wait: FloodWait超过该值(s)时不再等待, 直接返回错误
+        :param cache: token缓存, 未到刷新时间的token不再请求Telegram
+        """
+        self.pool = pool
+        self.concurrency = concurrency
+        self.dc_rate = dc_rate
+        self.dc_burst = dc_burst
+        self.flood_retries = flood_retries
+        self.max_flood_wait = max_flood_wait
+        self.cache = cache
+        self._buckets: dict[int, TokenBucket] = {}
+        self._blocked: dict[int, float] = {}  # dc_id => time.monotonic() 暂停到
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def _acquire_dc(self, dc_id: int):
+        while (blocked := self._blocked.get(dc_id, 0) - time.monotonic()) > 0:
+            await asyncio.sleep(blocked)
+        bucket = self._buckets.get(dc_id)
+        if bucket is None:
+            bucket = self._buckets[dc_id] = TokenBucket(self.dc_rate, self.dc_burst)
+        await bucket.acquire()
+
+    def _semaphore_of(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # get/fetch共享的并发上限, 每个event loop独立
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _request(self, session_name: str, tma_url: str) -> str:
+        tma = TmaParam_of(tma_url)
+        if tma is None:
+            raise InteractorArgsException(f'无法解析tma_url: {tma_url}', {'tma_url': tma_url})
+        async with self._semaphore_of():
+            return await self._request_web_view(session_name, tma, tma_url)
+
+    async def _request_web_view(self, session_name: str, tma: TmaParam, tma_url: str) -> str:
+        client = await self.pool.acquire(session_name)
+        try:
+            for attempt in range(self.flood_retries + 1):
+                await self._acquire_dc(client.dc_id)
+                try:
+                    return await client.request_web_view(tma, tma_url)
+                except FloodWait as e:
+                    if attempt >= self.flood_retries or e.seconds > self.max_flood_wait:
+                        raise
+                    until = time.monotonic() + e.seconds
+                    self._blocked[client.dc_id] = max(self._blocked.get(client.dc_id, 0), until)
+        finally:
+            await self.pool.release(session_name)
+
+    async def get(self, session_name: str, tma_url: str) -> str:
+        """获取单个帐户的token(与批量请求共享并发上限与DC限速)"""
+        if self.cache is not None:
+            return await self.cache.get_or_fetch(session_name, tma_url, lambda: self._request(session_name, tma_url))
+        return await self._request(session_name, tma_url)
+
+    async def fetch(self, pairs: Iterable[tuple[str, str]]) -> AsyncIterator[TmaTokenResult]:
+        """按完成顺序返回 (session_name, tma_url, token, error); 单个帐户的失败不影响其他帐户"""
+        results: asyncio.Queue[TmaTokenResult] = asyncio.Queue()
+
+        async def one(session_name: str, tma_url: str):
+            try:
+                token = await self.get(session_name, tma_url)
+                results.put_nowait((session_name, tma_url, token, None))
+            except Exception as e:
+                results.put_nowait((session_name, tma_url, None, e))
+
+        tasks = [asyncio.create_task(one(session_name, tma_url)) for session_name, tma_url in pairs]
+        try:
+            for _ in range(len(tasks)):
+                yield await results.get()
+        finally:
+            for task in tasks:
+                task.cancel()
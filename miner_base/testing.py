@@ -0,0 +1,12 @@
+"""测试与benchmark共用的构造函数"""
+
+
+def tg_session(i: int, proxy_ip: str | None = None, useragent: str | None = None) -> dict:
+    """第i个帐户的session; useragent默认为 ua-{i}"""
+    return {'id': i, 'session_name': f's{i}', 'proxy_ip': proxy_ip,
+            'agent_info': {'useragent': useragent or f'ua-{i}', 'percent': 100, 'type': 'mobile', 'system': '',
+                           'browser': '', 'version': 1, 'os': 'ios'}}
+
+
+def tg_sessions(accounts: int, proxy_ip: str | None = None, useragent: str | None = None) -> list[dict]:
+    return [tg_session(i, proxy_ip, useragent) for i in range(accounts)]
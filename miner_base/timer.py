@@ -0,0 +1,172 @@
+"""
+分层时间轮: 代替大量帐户的 asyncio.sleep
+asyncio.sleep 为每次调用在event loop的timer堆中加入一个TimerHandle(插入/弹出O(log n));
+时间轮按tick粒度合并到期时间相近的sleep: 同一tick到期的所有sleep只需要一次loop唤醒, 插入O(1)
+
+- 3层: 第0层 256 个tick, 第1层 64 × 256 tick, 第2层 64 × 16384 tick; 更远的到期时间放入溢出列表
+- 到期时间向上取整到tick, sleep不会提前返回, 最多延迟一个tick
+- 没有到期的timer时不唤醒loop
+
+>>> from miner_base.timer import sleep
+>>> await sleep(randint(*profile.SLEEP_BETWEEN_TAP))  # 与 asyncio.sleep 相同
+>>> TimerWheel.of().stats()  # {'timers': 10000, 'wakeups_per_sec': 20.0, ...}
+"""
+import asyncio
+import math
+import time
+import weakref
+from typing import Any, TypeVar
+
+__all__ = ['TimerWheel', 'sleep']
+
+T = TypeVar('T')
+
+_Entry = tuple[int, asyncio.Future, Any]  # (到期tick, future, result)
+
+
+class TimerWheel:
+    """单个event loop的时间轮"""
+
+    _wheels: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerWheel]' = weakref.WeakKeyDictionary()
+
+    def __init__(self, tick: float = 0.05, loop: asyncio.AbstractEventLoop | None = None,
+                 bits: tuple[int, int, int] = (8, 6, 6)):
+        """
+        :param tick: 时间粒度(s): 越大合并越多, sleep最多延迟一个tick
+        :param bits: 每层槽数的位数(槽数为 2**bits)
+        """
+        self.tick = tick
+        self.loop = loop
+        self.bits = bits
+        self._sizes = [1 << b for b in bits]
+        self._shifts = [0, bits[0], bits[0] + bits[1]]
+        self._spans = [1 << (bits[0]), 1 << (bits[0] + bits[1]), 1 << sum(bits)]  # 各层覆盖的tick数
+        self._levels: list[list[list[_Entry]]] = [[[] for _ in range(n)] for n in self._sizes]
+        self._overflow: list[_Entry] = []
+        self._tick = 0  # 已处理到的tick
+        self._handle: asyncio.TimerHandle | None = None
+        self._wake_tick = 0
+        self.timers = 0
+        self.wakeups = 0
+        self.expired = 0
+        self.cancelled = 0
+        self._stats_at = time.monotonic()
+        self._stats_wakeups = 0
+
+    @classmethod
+    def of(cls, loop: asyncio.AbstractEventLoop | None = None) -> 'TimerWheel':
+        """当前event loop的默认时间轮"""
+        loop = loop or asyncio.get_running_loop()
+        wheel = cls._wheels.get(loop)
+        if wheel is None:
+            wheel = cls._wheels[loop] = cls(loop=loop)
+        return wheel
+
+    @classmethod
+    def install(cls, tick: float = 0.05, loop: asyncio.AbstractEventLoop | None = None, **kwargs) -> 'TimerWheel':
+        """为event loop设置默认时间轮的参数, 须在该loop第一次sleep之前调用"""
+        loop = loop or asyncio.get_running_loop()
+        wheel = cls._wheels[loop] = cls(tick, loop=loop, **kwargs)
+        return wheel
+
+    def _loop(self) -> asyncio.AbstractEventLoop:
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        return self.loop
+
+    def _insert(self, entry: _Entry):
+        diff = entry[0] - self._tick
+        for level, span in enumerate(self._spans):
+            if diff < span:
+                index = (entry[0] >> self._shifts[level]) & (self._sizes[level] - 1)
+                self._levels[level][index].append(entry)
+                return
+        self._overflow.append(entry)
+
+    def _schedule(self, tick: int):
+        if self._handle is not None:
+            if self._wake_tick <= tick:
+                return
+            self._handle.cancel()
+        self._wake_tick = tick
+        self._handle = self._loop().call_at(tick * self.tick, self._run)
+
+    async def sleep(self, delay: float, result: T = None) -> T:
+        """与 asyncio.sleep 相同; 到期时间向上取整到tick"""
+        if delay <= 0:
+            return await asyncio.sleep(0, result)
+        loop = self._loop()
+        if not self.timers and self._handle is None:
+            self._tick = int(loop.time() / self.tick)
+        deadline = max(math.ceil((loop.time() + delay) / self.tick), self._tick + 1)
+        future = loop.create_future()
+        self._insert((deadline, future, result))
+        self.timers += 1
+        self._schedule(deadline)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.cancelled():  # 条目留在槽中, 到期时跳过
+                self.timers -= 1
+                self.cancelled += 1
+            raise
+
+    def _cascade(self, level: int, tick: int):
+        index = (tick >> self._shifts[level]) & (self._sizes[level] - 1)
+        entries, self._levels[level][index] = self._levels[level][index], []
+        for entry in entries:
+            if not entry[1].done():
+                self._insert(entry)
+
+    def _advance(self, tick: int):
+        """处理到期tick为 (self._tick, tick] 的timer"""
+        level0, mask0 = self._levels[0], self._sizes[0] - 1
+        span0, span1 = self._spans[0], self._spans[1]
+        while self._tick < tick:
+            self._tick = current = self._tick + 1
+            if current % span0 == 0:
+                if current % span1 == 0:
+                    if self._overflow and current % self._spans[2] == 0:
+                        overflow, self._overflow = self._overflow, []
+                        for entry in overflow:
+                            if not entry[1].done():
+                                self._insert(entry)
+                    self._cascade(2, current)
+                self._cascade(1, current)
+            slot = level0[current & mask0]
+            if slot:
+                level0[current & mask0] = []
+                for _, future, result in slot:
+                    if not future.done():
+                        future.set_result(result)
+                        self.timers -= 1
+                        self.expired += 1
+
+    def _next_tick(self) -> int:
+        """下一个需要唤醒的tick: 第0层中下一个非空槽, 或下一次层间移动"""
+        level0, mask0 = self._levels[0], self._sizes[0] - 1
+        boundary = (self._tick // self._spans[0] + 1) * self._spans[0]
+        for tick in range(self._tick + 1, boundary):
+            if level0[tick & mask0]:
+                return tick
+        return boundary
+
+    def _run(self):
+        self._handle = None
+        self.wakeups += 1
+        self._advance(max(int(self._loop().time() / self.tick), self._wake_tick))
+        if self.timers > 0:
+            self._schedule(self._next_tick())
+
+    def stats(self) -> dict:
+        """timers: 等待中的sleep数; wakeups_per_sec: 自上次调用stats以来的loop唤醒频率"""
+        now = time.monotonic()
+        elapsed, self._stats_at = now - self._stats_at, now
+        wakeups, self._stats_wakeups = self.wakeups - self._stats_wakeups, self.wakeups
+        return {'timers': self.timers, 'wakeups': self.wakeups, 'wakeups_per_sec': wakeups / elapsed if elapsed else 0.,
+                'expired': self.expired, 'cancelled': self.cancelled, 'tick': self.tick}
+
+
+async def sleep(delay: float, result: T = None) -> T:
+    """使用当前event loop默认时间轮的 asyncio.sleep"""
+    return await TimerWheel.of().sleep(delay, result)
@@ -0,0 +1,121 @@
+"""
+TMA token缓存: 按 (session, bot_name/shot_name) 缓存 `PluginTelegram.get_tma_token` 的结果
+- 从token中解析过期时间(tg_web_data的auth_date, JWT的exp), 无法解析时使用default_ttl
+- 数据保存在State中(带ttl), 通过 `cache.attach(store)` 保存到StateStore, 重启后恢复
+- 在过期前refresh_ahead秒主动刷新, 每个帐户额外错开 [0, jitter) 秒, 避免同时启动的帐户同时请求Telegram
+"""
+import asyncio
+import base64
+import json
+import time
+import zlib
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs
+
+from miner_base.model import State, TmaParam_of
+from miner_base.persist import StateStore
+
+
+def expires_of(token: str, default_ttl: float, max_age: float = 86400) -> float:
+    """解析token的过期时间(time.time())
+    :param default_ttl: 无法解析时, 从现在起的有效期(s)
+    :param max_age: tg_web_data 从auth_date起的有效期(s)
+    """
+    now = time.time()
+    parts = token.split('.')
+    if len(parts) == 3:  # JWT
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(parts[1] + '=' * (-len(parts[1]) % 4)))
+            if isinstance(payload, dict) and isinstance(payload.get('exp'), (int, float)):
+                return float(payload['exp'])
+        except ValueError:
+            pass
+    auth_date = parse_qs(token).get('auth_date')
+    if auth_date and auth_date[0].isdigit():
+        return min(int(auth_date[0]) + max_age, now + default_ttl)
+    return now + default_ttl
+
+
+class TmaTokenCache:
+    """进程内共享的TMA token缓存
+    >>> token = await cache.get_or_fetch(session_name, tma_url, lambda: telegram_plugin.get_tma_token(tma_url))
+    >>> await asyncio.sleep(cache.refresh_in(session_name, tma_url))  # 到期前主动刷新
+    >>> cache.attach(store)  # 启动时调用一次: 恢复已保存的token, 之后的变更写入StateStore
+    """
+
+    def __init__(self, state: State | None = None, default_ttl: float = 3600, max_age: float = 86400,
+                 refresh_ahead: float = 300, jitter: float = 600):
+        """
+        :param state: 保存token的State, 默认新建; 需要持久化时调用 attach
+        :param default_ttl: 无法从token解析过期时间时的有效期(s)
+        :param max_age: tg_web_data 从auth_date起的有效期(s)
+        :param refresh_ahead: 过期前多少秒刷新
+        :param jitter: 每个帐户刷新时间的错开范围(s), 按session固定
+        """
+        self.state = state if state is not None else State({})
+        self.default_ttl = default_ttl
+        self.max_age = max_age
+        self.refresh_ahead = refresh_ahead
+        self.jitter = jitter
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._stores: set[int] = set()  # 已attach的StateStore(id), 重复attach无效果
+
+    def attach(self, store: StateStore, ns: str = 'tma') -> 'TmaTokenCache':
+        """保存到StateStore: 恢复已保存的token(重启后不重新请求Telegram), 并记录之后的变更"""
+        if id(store) not in self._stores:
+            self._stores.add(id(store))
+            store.attach(self.state, ns)
+        return self
+
+    @staticmethod
+    def key_of(session: str, tma_url: str) -> str:
+        param = TmaParam_of(tma_url)
+        if param is None:
+            return f'{session}:{tma_url}'
+        return f"{session}:{param['bot_name']}/{param['shot_name']}"
+
+    def _offset(self, session: str) -> float:
+        """帐户固定的错开时间, 重启后不变"""
+        return zlib.crc32(str(session).encode()) / 0xFFFFFFFF * self.jitter
+
+    def get(self, session: str, tma_url: str) -> str | None:
+        """缓存中未过期的token"""
+        entry = self.state.get(self.key_of(session, tma_url))
+        return None if entry is None else entry['token']
+
+    def refresh_in(self, session: str, tma_url: str) -> float:
+        """距离主动刷新的时间(s), 没有缓存时为0"""
+        entry = self.state.get(self.key_of(session, tma_url))
+        if entry is None:
+            return 0.
+        return max(0., entry['expires'] - self.refresh_ahead - self._offset(session) - time.time())
+
+    def put(self, session: str, tma_url: str, token: str):
+        expires = expires_of(token, self.default_ttl, self.max_age)
+        self.state.set(self.key_of(session, tma_url), {'token': token, 'expires': expires},
+                       ttl=max(0., expires - time.time()))
+
+    def invalidate(self, session: str, tma_url: str):
+        """token被服务端拒绝时调用"""
+        self.state.delete(self.key_of(session, tma_url))
+
+    async def get_or_fetch(self, session: str, tma_url: str, fetch: Callable[[], Awaitable[str]],
+                           force: bool = False) -> str:
+        """返回缓存的token; 没有缓存, 已到刷新时间 或 force 时调用fetch获取
+        同一帐户同时只获取一次"""
+        if not force and (token := self.get(session, tma_url)) is not None and self.refresh_in(session, tma_url) > 0:
+            return token
+        key = self.key_of(session, tma_url)
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._fetch(key, session, tma_url, fetch))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, key: str, session: str, tma_url: str, fetch: Callable[[], Awaitable[str]]) -> str:
+        try:
+            token = await fetch()
+        finally:
+            del self._inflight[key]
+        if token:
+            self.put(session, tma_url, token)
+        return token
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base import ApiRegistry, InteractorArgsException, ResponseCache
+from miner_base.impl import SessionPool, AiohttpAPICaller
+
+
+def test_api_spec_request():
+    api = ApiRegistry('https://bi.yescoin.gold/', headers={'origin': 'https://www.yescoin.gold'})
+    info = api.get('getGameInfo', '/game/getGameInfo', params={'v': 1})
+    level_up = api.post('levelUp', '/build/levelUp/{boost}', extract=())
+
+    method, url, options = info.request()
+    assert (method, url) == ('GET', 'https://bi.yescoin.gold/game/getGameInfo')
+    assert options['headers'] is info.headers and options['params'] is info.params  # 没有覆盖参数时共享模板
+    _, _, options = info.request(update_headers={'token': 't'}, params={'v': 2})
+    assert options['headers'] == {'origin': 'https://www.yescoin.gold', 'token': 't'}
+    assert options['params'] == {'v': 2}
+
+    _, url, options = level_up.request(data=1, url_vars={'boost': 3})
+    assert url == 'https://bi.yescoin.gold/build/levelUp/3' and options['json'] == 1
+    with pytest.raises(InteractorArgsException):
+        level_up.request()
+    assert api.rebase('http://127.0.0.1:1')['getGameInfo'].url == 'http://127.0.0.1:1/game/getGameInfo'
+
+
+def test_caller_api():
+    async def handler(request: web.Request):
+        return web.json_response({'code': 0, 'data': {'coin': await request.json(), 'token': request.headers['token']}})
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/game/collectCoin', handler)
+        async with TestServer(app) as server, SessionPool() as pool:
+            api = ApiRegistry(str(server.make_url('/')))
+            api.post('collectCoin', '/game/collectCoin')
+            api.post('collectCoinToken', '/game/collectCoin', extract=('data', 'token'))
+            async with AiohttpAPICaller(pool, registry=api) as caller:
+                assert await caller.api('collectCoin', data=10, update_headers={'token': 'a'}) == {'coin': 10,
+                                                                                                  'token': 'a'}
+                assert await caller.api('collectCoinToken', data=1, headers={'token': 'b'}) == 'b'
+
+    asyncio.run(run())
+
+
+def test_caller_api_cache():
+    calls = {'info': 0}
+
+    async def info(request: web.Request):
+        calls['info'] += 1
+        await asyncio.sleep(0.01)
+        return web.json_response({'data': {'n': calls['info']}})
+
+    async def tap(request: web.Request):
+        return web.json_response({'data': True})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/info', info)
+        app.router.add_post('/tap', tap)
+        async with TestServer(app) as server, SessionPool() as pool:
+            api = ApiRegistry(str(server.make_url('/')))
+            api.get('info', '/info', cache_ttl=60)
+            api.post('tap', '/tap', invalidates=('info',))
+            api.post('refresh', '/tap', cache_ttl=60, invalidates=('info',))
+            cache = ResponseCache()
+            a = AiohttpAPICaller(pool, registry=api, cache=cache, account='a')
+            b = AiohttpAPICaller(pool, registry=api, cache=cache, account='b')
+            results = await asyncio.gather(*(a.api('info') for _ in range(5)))
+            assert results == [{'n': 1}] * 5 and calls['info'] == 1  # 合并为1次请求
+            assert await a.api('info') == {'n': 1}
+            assert await b.api('info') == {'n': 2}  # 不同帐户不共享
+            await a.api('tap')
+            assert await a.api('info') == {'n': 3}
+            assert await b.api('info') == {'n': 2}
+            assert await a.api('info', params={'page': 2}) == {'n': 4}  # 请求参数不同, 不共用缓存
+            assert await a.api('info', json={'page': 2}) == {'n': 5}
+            assert await a.api('info', params={'page': 2}) == {'n': 4}
+            await a.api('refresh')  # 缓存的API也会执行invalidates
+            assert await a.api('info') == {'n': 6}
+            await a.close()
+            await b.close()
+
+    asyncio.run(run())
+
+
+def test_cache_invalidate_inflight():
+    async def run():
+        cache = ResponseCache()
+        spec = ApiRegistry('http://game').get('info', '/info', cache_ttl=60)
+        key = cache.key_of('a', spec, 'GET', spec.url, {})
+        values = iter(['before', 'after'])
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(0.01)
+            return next(values)
+
+        inflight = asyncio.ensure_future(cache.get_or_fetch(key, 60, fetch))
+        await started.wait()
+        cache.invalidate('a', ['info'])  # 修改类API在请求期间完成
+        assert await cache.get_or_fetch(key, 60, fetch) == 'after'  # 不合并到修改前发出的请求
+        assert await inflight == 'before'
+        assert await cache.get_or_fetch(key, 60, fetch) == 'after'  # 修改前的结果没有覆盖缓存
+
+    asyncio.run(run())
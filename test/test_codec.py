@@ -0,0 +1,68 @@
+import asyncio
+import datetime
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base import codec, ApiRegistry
+from miner_base.impl import SessionPool, AiohttpAPICaller
+
+
+@pytest.mark.parametrize('name', codec.available())
+def test_codec_backends(name):
+    c = codec.get_codec(name)
+    payload = {'code': 0, 'data': {'msg': '余额', 'amount': 12345678901, 'ratio': 0.5, 'ok': True, 'none': None,
+                                   'items': [1, 'a', {'b': []}]}}
+    text = c.dumps(payload)
+    assert '余额' in text and ': ' not in text
+    assert c.loads(text) == c.loads(text.encode()) == c.loads(c.dumpb(payload)) == payload
+    assert c.loads(c.dumps({1: 'a'})) == {'1': 'a'}
+    now = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    assert c.loads(c.dumps({'t': object()}, default=lambda o: 'obj')) == {'t': 'obj'}
+    assert isinstance(c.loads(c.dumps({'t': now}, default=str))['t'], str)
+    with pytest.raises(TypeError):
+        c.dumps({'t': object()})
+    big = {'balance': 123456789012345678901234567890, 'neg': -2 ** 70, 'u64': 2 ** 64 - 1, 'id': '1' * 25}
+    assert json.loads(c.dumps(big)) == json.loads(c.dumpb(big)) == big  # 写出始终精确
+    exact = codec.get_codec(name, exact_ints=True)
+    assert exact.exact_ints and exact.name == name
+    assert exact.loads(c.dumps(big)) == exact.loads(c.dumpb(big)) == exact.loads(json.dumps(big).encode()) == big
+    assert c.loads(json.dumps(big))['u64'] == big['u64']  # 64位以内始终精确
+
+
+def test_codec_use():
+    default = codec.get_codec()
+    assert default.name == codec.available()[0]
+    try:
+        assert codec.use('json').name == 'json'
+        assert codec.dumps({'a': 1}) == '{"a":1}'
+        assert codec.use(default.name, exact_ints=True).exact_ints
+    finally:
+        codec.use(default)
+    with pytest.raises(ValueError):
+        codec.get_codec('yaml')
+
+
+def test_caller_uses_codec():
+    async def echo(request: web.Request):
+        return web.json_response({'code': 0, 'data': await request.json()})
+
+    async def empty(request: web.Request):
+        return web.Response(body=b'')
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/echo', echo)
+        app.router.add_get('/empty', empty)
+        async with TestServer(app) as server, SessionPool() as pool:
+            api = ApiRegistry(str(server.make_url('')))
+            api.post('echo', '/echo')
+            api.get('empty', '/empty')
+            caller = AiohttpAPICaller(pool, registry=api)
+            assert await caller.api('echo', data={'msg': '余额', 'n': 1}) == {'msg': '余额', 'n': 1}
+            assert await caller.api('empty') is None
+            await caller.close()
+
+    asyncio.run(run())
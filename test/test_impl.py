@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base.impl import SessionPool, AiohttpAPICaller, LogBatcher
+from miner_base.testing import tg_session
+
+
+def test_session_pool_shared_connector():
+    async def handler(request: web.Request):
+        return web.json_response({'ua': request.headers['User-Agent']})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with TestServer(app) as server, SessionPool(limit_per_host=2) as pool:
+            callers = [AiohttpAPICaller.of(pool, tg_session(i)) for i in range(3)]
+            for i, caller in enumerate(callers):
+                async with caller.get(server.make_url('/')) as response:
+                    assert (await response.json())['ua'] == f'ua-{i}'
+            assert callers[0].session.connector is callers[2].session.connector
+            assert pool.stats() == {None: 3}
+            for caller in callers:
+                await caller.close()
+            assert pool.stats() == {}
+
+    asyncio.run(run())
+
+
+def test_log_batcher():
+    written = []
+
+    def slow_sink(status, level, msg, extra, error=None):
+        time.sleep(0.001)
+        written.append(msg)
+
+    async def run():
+        async with LogBatcher(slow_sink, maxsize=50, overflow='drop_oldest', flush_interval=0.01) as batcher:
+            updater = batcher.updater()
+            t0 = time.perf_counter()
+            for i in range(100):
+                updater.info(f'm{i}')
+            assert time.perf_counter() - t0 < 0.05  # 调用方不等待sink
+        return batcher
+
+    batcher = asyncio.run(run())
+    assert batcher.dropped == 50
+    assert written == [f'm{i}' for i in range(50, 100)]
+
+
+def test_log_batcher_flush_overflow():
+    written = []
+    running = {'now': 0, 'max': 0}
+
+    def slow_sink(status, level, msg, extra, error=None):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        time.sleep(0.0005)
+        written.append(msg)
+        running['now'] -= 1
+
+    async def run():
+        async with LogBatcher(slow_sink, maxsize=10, overflow='flush', batch_size=10, flush_interval=0) as batcher:
+            updater = batcher.updater()
+            for i in range(200):
+                updater.info(f'm{i}')
+                if i % 7 == 0:
+                    await asyncio.sleep(0)  # 让后台写入线程启动
+        return batcher
+
+    assert asyncio.run(run()).dropped == 0
+    assert running['max'] == 1  # 调用方同步写入时不与后台线程同时调用sink
+    assert written == [f'm{i}' for i in range(200)]
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+
+def _loaded(statement: str) -> set[str]:
+    code = f'{statement}\nimport sys\nprint(" ".join(m for m in ("pydantic", "aiohttp", "loguru") if m in sys.modules))'
+    return set(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout.split())
+
+
+def test_lazy_import():
+    assert _loaded('import miner_base') == set()
+    assert _loaded('from miner_base import State') == {'pydantic'}
+    assert _loaded('from miner_base import *\nassert Field and PluginNetwork and ProxyException') == {'pydantic'}
+    assert _loaded('from miner_base import ClientSession') == {'aiohttp'}
+    assert 'loguru' not in _loaded('import miner_base.impl')
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sys
+
+from miner_base import NetworkException, State
+from miner_base.loader import ScriptLoader, inspect_source
+from miner_base.runner import TaskRunner, AccountTask, discover_profile
+
+SCRIPT = '''
+"""测试脚本"""
+from miner_base import *
+
+LOADED = []
+LOADED.append(1)  # 顶层代码只在加载时执行
+
+
+class Base(ScriptProfile):
+    pass
+
+
+class Profile(Base):
+    VERSION: int = {version}
+
+
+async def thread_task(args, updater, caller, state):
+    state.set('task', state.get('task', ()) + ({version},))
+    if state.get('fail'):
+        state.set('fail', False)
+        raise NetworkException('retry')
+
+
+def thread_not_async(args, updater, caller, state):
+    pass
+'''
+
+
+def test_inspect_source():
+    info = inspect_source(SCRIPT.format(version=1), '/tmp/my_script.py')
+    assert info.name == 'my_script' and info.doc == '测试脚本'
+    assert info.threads == ('thread_task',) and info.profile == 'Profile'
+
+
+def test_loader_cache_and_reload(tmp_path):
+    path = str(tmp_path / 'hot_script.py')
+    with open(path, 'w') as f:
+        f.write(SCRIPT.format(version=1))
+    cache_dir = str(tmp_path / 'cache')
+
+    loader = ScriptLoader(cache_dir)
+    script = loader.load(path)
+    assert loader.load(path) is script and script.module.LOADED == [1]
+    assert list(script.threads) == ['thread_task'] and script.profile().VERSION == 1
+    assert script.profile is discover_profile(script.module) and script.profile.__name__ == 'Profile'
+    assert loader.compiles == 1 and os.listdir(cache_dir)
+    assert ScriptLoader(cache_dir).load(path).profile().VERSION == 1  # 从磁盘缓存加载
+    assert loader.reload(path) is None
+
+    async def run():
+        runner = TaskRunner(script.threads, normal_retry_delay=0.05)
+        state = State({'fail': True})
+        task = AccountTask(args=None, updater=_NullUpdater(), caller=None, state=state, name='a')
+        running = asyncio.create_task(runner.run([task]))
+        await state.wait_for('task')
+        with open(path, 'w') as f:
+            f.write(SCRIPT.format(version=2))
+        new = loader.reload(path)
+        assert new is not None and new.module is not script.module and new.profile().VERSION == 2
+        runner.update_threads(new.threads)
+        await running
+        assert state.get('task') == (1, 2)  # 正在运行的thread使用旧代码, 重启后使用新代码
+
+    asyncio.run(run())
+
+    loader = ScriptLoader()
+    old = loader.load(path)
+    with open(path, 'w') as f:
+        f.write(SCRIPT.format(version=3))
+    new = loader.reload(path)
+    assert old.module.__name__ not in sys.modules and sys.modules[new.module.__name__] is new.module
+
+
+def test_loader_isolation(tmp_path):
+    import json
+    cache_dir = str(tmp_path / 'cache')
+    paths = [str(tmp_path / 'json.py'), str(tmp_path / 'copy.py')]
+    for path in paths:
+        with open(path, 'w') as f:
+            f.write(SCRIPT.format(version=1))
+    loader = ScriptLoader(cache_dir)
+    scripts = [loader.load(path) for path in paths]
+    assert sys.modules['json'] is json  # 脚本模块不覆盖同名模块
+    assert sys.modules[scripts[0].module.__name__] is scripts[0].module
+    # 内容相同, 路径不同: 各自的co_filename
+    assert [s.threads['thread_task'].__code__.co_filename for s in scripts] == paths
+
+    for name in os.listdir(cache_dir):  # 损坏的磁盘缓存: 重新编译
+        with open(os.path.join(cache_dir, name), 'r+b') as f:
+            f.truncate(20)
+    loader = ScriptLoader(cache_dir)
+    assert loader.load(paths[0]).profile().VERSION == 1 and loader.compiles == 1
+
+
+class _NullUpdater:
+    def __getattr__(self, _):
+        return lambda *args, **kwargs: None
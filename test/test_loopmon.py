@@ -0,0 +1,47 @@
+import asyncio
+import time
+from asyncio import events
+
+from miner_base.impl import LoggerStatusUpdater
+from miner_base.loopmon import LoopMonitor
+from miner_base.runner import TaskRunner, AccountTask
+
+
+async def thread_block(args, updater, caller, state):
+    for _ in range(3):
+        await asyncio.sleep(0.02)
+        time.sleep(0.06)  # 阻塞event loop
+
+
+async def thread_idle(args, updater, caller, state):
+    for _ in range(10):
+        await asyncio.sleep(0.01)
+
+
+def test_loop_monitor():
+    reports = []
+    updater = LoggerStatusUpdater.of(lambda status, level, msg, extra, error=None: reports.append((level, extra)))
+    original = events.Handle._run
+
+    async def run():
+        runner = TaskRunner({'thread_block': thread_block, 'thread_idle': thread_idle})
+        tasks = [AccountTask(args=None, updater=LoggerStatusUpdater.of(lambda *_: None), caller=None, name=str(i))
+                 for i in range(2)]
+        async with LoopMonitor(updater, slow_threshold=0.04, interval=0.01, report_interval=60) as monitor:
+            assert events.Handle._run is not original
+            await runner.run(tasks)
+        return monitor
+
+    monitor = asyncio.run(run())
+    assert events.Handle._run is original
+    assert monitor.slow_callbacks == 6
+    assert monitor.stats()['lag_max'] >= 0.04
+    top = monitor.top()
+    assert {o['key'] for o in top} == {'0:thread_block', '1:thread_block'}
+    assert all(o['count'] == 3 and o['location'].startswith('test_loopmon.py:') for o in top)
+
+    # 每个帐户/thread: 第一次立即报告, 其余在停止时合并报告
+    assert len(reports) == 4
+    assert all(level == 'WARNING' and extra['thread'] == 'thread_block' for level, extra in reports)
+    assert sorted(extra['count'] for _, extra in reports) == [1, 1, 2, 2]
+    assert reports[0][1]['script'].endswith('test_loopmon.py')
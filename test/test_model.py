@@ -1,4 +1,15 @@
-from miner_base import State
+import asyncio
+import pickle
+
+import pytest
+
+from miner_base import State, ScriptRuntimeArgs, ScriptProfile
+from miner_base.impl import LoggerStatusUpdater
+from miner_base.shard import no_plugins
+
+
+class PickledProfile(ScriptProfile):  # pickle需要模块级的类
+    TAPS: int = 10
 
 
 def test_state():
@@ -7,5 +18,142 @@ def test_state():
     print(r)
 
 
+def test_state_wait():
+    async def run():
+        s = State({})
+        waiter = asyncio.create_task(s.wait_for('token'))
+        until = asyncio.create_task(s.wait_until(lambda st: st.get('count', 0) > 2))
+        received = []
+
+        async def consume():
+            async for v in s.subscribe('count'):
+                received.append(v)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        s.set('token', None)
+        for i in range(4):
+            s.set('count', i)
+        s.set('token', 'tk')
+        assert await waiter == 'tk'
+        await until
+        await asyncio.sleep(0)
+        consumer.cancel()
+        assert received == [0, 1, 2, 3]
+        assert await s.wait_for('token') == 'tk'
+        with pytest.raises(TimeoutError):
+            await s.wait_for('missing', timeout=0.01)
+        assert s._listeners == {}
+
+        deleted = asyncio.create_task(s.wait_for('gone'))
+        await asyncio.sleep(0)
+        s.set('gone', 1)
+        s.delete('gone')  # 等待方恢复执行前key已被删除
+        assert await deleted == 1
+
+        bad = asyncio.create_task(s.wait_until(lambda st: 1 / st.get('n', 1) > 1, key='n'))
+        await asyncio.sleep(0)
+        s.set('n', 0)  # 异常交给等待方, set()正常返回
+        with pytest.raises(ZeroDivisionError):
+            await bad
+
+    asyncio.run(run())
+
+
+def test_state_ttl_and_eviction():
+    s = State({}, max_entries=3)
+    s.set('token', 'tk', ttl=-1)
+    assert s.get('token', 'expired') == 'expired' and 'token' not in s.data
+    for key in 'abc':
+        s.set(key, key)
+    s.get('a')  # a 最近被使用
+    s.set('d', 'd')
+    assert list(s.data) == ['c', 'a', 'd']
+
+    s = State({}, max_bytes=2000)
+    for i in range(10):
+        s.set(f'k{i}', 'x' * 500)
+    usage = s.memory_usage()
+    assert usage['bytes'] <= 2000 and usage['entries'] == 3
+    assert s.get('k9') is not None and s.get('k0') is None
+
+
+def test_status_updater_level():
+    records = []
+    updater = LoggerStatusUpdater.of(lambda status, level, msg, extra, error=None: records.append((status, level, msg)),
+                                     min_level='INFO')
+    calls = []
+
+    def lazy_msg():
+        calls.append(1)
+        return 'lazy'
+
+    updater.debug(lazy_msg)
+    updater.debug('status change', status='running')
+    updater.info(lazy_msg)
+    updater.success('余额: {} (+{})', fmt_args=(100, 5))
+    assert not updater.is_enabled('DEBUG') and updater.is_enabled('WARNING')
+    assert updater.min_level == 'INFO'
+    assert calls == [1]
+    assert records == [('running', 'DEBUG', 'status change'), (None, 'INFO', 'lazy'), (None, 'SUCCESS', '余额: 100 (+5)')]
+
+
+def test_script_args_bulk_of():
+    class Profile(ScriptProfile):
+        TAPS: int = 10
+
+    sessions = [{'id': i, 'session_name': str(i), 'proxy_ip': None,
+                 'agent_info': {'useragent': 'u', 'percent': 100, 'type': 'mobile', 'system': 'ios', 'browser': 'edge',
+                                'version': 117, 'os': 'ios'}} for i in range(3)]
+    args = ScriptRuntimeArgs.bulk_of(sessions, {'TAPS': 5}, lambda a: [a.tg_session['id']], profile_cls=Profile)
+    assert ScriptRuntimeArgs.specialize(Profile) is ScriptRuntimeArgs.specialize(Profile)
+    assert type(args[0]) is ScriptRuntimeArgs.specialize(Profile)
+    assert args[0].profile is args[2].profile and args[0].profile.TAPS == 5
+    assert [a.plugins() for a in args] == [[0], [1], [2]]
+    assert args[1] == ScriptRuntimeArgs[Profile].of(sessions[1], args[1].profile, lambda a: [a.tg_session['id']])
+    with pytest.raises(ValueError):
+        ScriptRuntimeArgs.bulk_of([{'id': 1}], Profile(), lambda a: [])
+
+
+def test_compact_runtime_objects():
+    from pydantic import ValidationError
+    from miner_base.model import freeze_profile, intern_agent_info
+
+    s = State({'a': 1})
+    assert not hasattr(s, '__dict__') and s == State({'a': 1})
+    assert not hasattr(LoggerStatusUpdater.of(print), '__dict__')
+
+    class Profile(ScriptProfile):
+        TAPS: int = 10
+
+    frozen = freeze_profile(Profile(TAPS=5))
+    assert isinstance(frozen, Profile) and frozen.TAPS == 5 and freeze_profile(frozen) is frozen
+    assert type(freeze_profile(Profile())) is type(frozen)
+    with pytest.raises(ValidationError):
+        frozen.TAPS = 1
+
+    agent_info = {'useragent': 'u', 'percent': 100, 'type': 'mobile', 'system': 'ios', 'browser': 'edge',
+                  'version': 117, 'os': 'ios'}
+    assert intern_agent_info(dict(agent_info)) is intern_agent_info(dict(agent_info))
+    sessions = [{'id': i, 'session_name': str(i), 'proxy_ip': 'http://1.2.3.4:80', 'agent_info': dict(agent_info)}
+                for i in range(3)]
+    args = ScriptRuntimeArgs.bulk_of(sessions, {'TAPS': 5}, lambda a: [], profile_cls=Profile)
+    assert type(args[0]) is ScriptRuntimeArgs.specialize(Profile)
+    assert args[0].tg_session['agent_info'] is args[2].tg_session['agent_info'] == agent_info
+    assert args[0].profile is args[2].profile and args[0].profile.model_config.get('frozen')
+    with pytest.raises(TypeError):
+        args[0].tg_session['agent_info']['useragent'] = 'x'  # 共享的agent_info只读
+    trusted = ScriptRuntimeArgs.bulk_of(sessions, Profile(), lambda a: [], validate=False)
+    assert trusted[0].tg_session['agent_info'] is args[0].tg_session['agent_info']
+    assert type(sessions[0]['agent_info']) is dict and trusted[0].tg_session is not sessions[0]  # 不修改调用方的dict
+    args = ScriptRuntimeArgs.bulk_of(sessions, {'TAPS': 5}, no_plugins, profile_cls=PickledProfile)
+    loaded = pickle.loads(pickle.dumps(args[0]))
+    assert loaded == args[0] and type(loaded.profile) is type(args[0].profile)
+    assert type(args[0].profile).__name__ == 'FrozenPickledProfile'
+    args = ScriptRuntimeArgs.bulk_of(sessions, Profile(), lambda a: [], compact=False)
+    assert args[0].tg_session['agent_info'] is not args[2].tg_session['agent_info']
+    args[0].profile.TAPS = 1
+
+
 if __name__ == '__main__':
     test_state()
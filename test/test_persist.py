@@ -0,0 +1,59 @@
+import asyncio
+import sqlite3
+
+from miner_base import State
+from miner_base.persist import StateStore
+
+
+def test_state_store_restore(tmp_path):
+    path = str(tmp_path / 'state.db')
+
+    async def first_run():
+        async with StateStore(path, flush_interval=0.01, compact_threshold=3) as store:
+            a = store.attach(State({}), ns='a')
+            b = store.attach(State({}), ns='b')
+            a.set('token', 'old')
+            b.set('count', 1)
+            await asyncio.sleep(0.05)
+            a.clear()
+            a.set('token', 'tk')
+            a.set('profile_data', {'currentAmount': 10, 'totalAmount': 2 ** 80 + 1})
+            a.set('tmp', 1)
+            a.delete('tmp')
+            a.set('expired', 1, ttl=0.001)
+            a.set('cached', 1, ttl=600)
+            b.set('count', 2)
+            b.set('obj', object())  # 无法序列化, 跳过
+
+    asyncio.run(first_run())
+
+    async def second_run():
+        store = StateStore(path)
+        a = store.attach(State({}), ns='a')
+        b = store.attach(State({}), ns='b')
+        rows = store._db.execute('SELECT COUNT(*) FROM journal').fetchone()[0]
+        await store.aclose()
+        return a, b, rows
+
+    a, b, rows = asyncio.run(second_run())
+    assert a.data == {'token': 'tk', 'profile_data': {'currentAmount': 10, 'totalAmount': 2 ** 80 + 1}, 'cached': 1}
+    assert 590 < a.ttl_of('cached') <= 600
+    assert b.data == {'count': 2}
+    assert rows == 5
+
+
+def test_state_store_migrate(tmp_path):
+    path = str(tmp_path / 'old.db')
+    db = sqlite3.connect(path)  # 没有expires列的旧版本journal
+    db.executescript('''
+    CREATE TABLE journal (seq INTEGER PRIMARY KEY AUTOINCREMENT, ns TEXT NOT NULL, key TEXT, op TEXT NOT NULL,
+                          value TEXT);
+    INSERT INTO journal (ns, key, op, value) VALUES ('a', 'token', 'set', '"tk"');
+    ''')
+    db.close()
+
+    async def run():
+        async with StateStore(path) as store:
+            return store.attach(State({}), ns='a')
+
+    assert asyncio.run(run()).data == {'token': 'tk'}
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base import ProxyException
+from miner_base.proxy import ProxyHealthPool, chain_of, ip_checker
+
+
+def test_chain_of():
+    proxy = {'scheme': 'socks5', 'hostname': '1.1.1.1', 'port': 1080, 'username': 'u', 'password': 'p'}
+    assert chain_of(proxy) == ('socks5://u:p@1.1.1.1:1080',)
+    assert chain_of(['http://a:1', proxy]) == ('http://a:1', 'socks5://u:p@1.1.1.1:1080')
+
+
+def test_health_pool():
+    calls = []
+    running = {'now': 0, 'max': 0}
+
+    async def checker(chain):
+        calls.append(chain)
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        await asyncio.sleep({'http://fast:1': 0.01, 'http://slow:1': 0.05}.get(chain[0], 0.01))
+        running['now'] -= 1
+        if chain[0] == 'http://down:1':
+            raise ConnectionError('refused')
+        return f'ip-{chain[0]}'
+
+    async def run():
+        pool = ProxyHealthPool(checker, concurrency=2)
+        # 50个帐户共用同一proxy: 只检测一次
+        ips = await asyncio.gather(*(pool.check_ip('http://fast:1') for _ in range(50)))
+        assert set(ips) == {'ip-http://fast:1'} and len(calls) == 1
+        assert await pool.check_ip('http://fast:1') == 'ip-http://fast:1' and len(calls) == 1  # 缓存
+
+        candidates = ['http://slow:1', 'http://fast:1', 'http://down:1', ['http://a:1', 'http://b:1']]
+        await pool.check_many(candidates, force=True)
+        assert running['max'] <= 2
+        assert await pool.fastest(candidates) in (('http://fast:1',), ('http://a:1', 'http://b:1'))
+        assert pool.ranked(candidates)[-1].chain == ('http://down:1',)
+        with pytest.raises(ProxyException) as exc_info:
+            await pool.check_ip('http://down:1')
+        assert exc_info.value.proxy_snap == 'http://down:1'
+
+        chain = await pool.failover(ProxyException('http://fast:1'), ['http://fast:1', 'http://slow:1'])
+        assert chain == ('http://slow:1',)
+        assert not pool.stats()[('http://fast:1',)]['ok']
+        with pytest.raises(ProxyException) as exc_info:
+            await pool.fastest(['http://down:1'])
+        error = exc_info.value
+        assert error.proxy_snap is None and error.extra['candidates'] == [['http://down:1']]
+        assert await pool.failover(error, ['http://down:1', 'http://slow:1']) == ('http://slow:1',)
+
+    asyncio.run(run())
+
+
+def test_ip_checker():
+    async def handler(request: web.Request):
+        return web.Response(text='1.2.3.4\n')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with TestServer(app) as server:
+            assert await ip_checker(str(server.make_url('/')))(()) == '1.2.3.4'
+
+    asyncio.run(run())
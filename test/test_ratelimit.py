@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base.impl import SessionPool, AiohttpAPICaller
+from miner_base.ratelimit import TokenBucket, AdaptiveLimit, RateLimiter, parse_retry_after
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, burst=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert 0.009 < bucket.reserve() <= 0.01
+    assert 0.019 < bucket.reserve() <= 0.02  # 预约排队
+
+
+def test_adaptive_limit():
+    async def run():
+        limit = AdaptiveLimit(initial=2, latency_target=1)
+        await limit.acquire()
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limit.release(ok=True, latency=0.1)
+        await waiter
+        assert limit.limit == 2.5
+        limit.release(ok=False)
+        limit.release(ok=False)  # 同一周期只减小一次
+        assert limit.limit == 1.25 and limit.inflight == 0
+
+    asyncio.run(run())
+
+
+def test_retry_after():
+    assert parse_retry_after('3') == 3
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after(None) is None
+
+    hits = []
+
+    async def handler(request: web.Request):
+        hits.append(time.monotonic())
+        if len(hits) == 1:
+            return web.Response(status=429, headers={'Retry-After': '0.2'})
+        return web.json_response({})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        limiter = RateLimiter(account_rate=None)
+        async with TestServer(app) as server, SessionPool(rate_limiter=limiter) as pool:
+            async with AiohttpAPICaller(pool) as caller:
+                response = await caller.get(server.make_url('/'))
+                assert response.status == 429
+                response.release()
+                async with caller.get(server.make_url('/')) as response:
+                    assert response.status == 200
+        assert hits[1] - hits[0] >= 0.19
+        assert limiter.stats()['127.0.0.1']['inflight'] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,128 @@
+import asyncio
+import gzip
+import json
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base import ApiRegistry, InteractorArgsException
+from miner_base.impl import SessionPool
+from miner_base.replay import TrafficRecorder, RecordingAPICaller, TrafficPlayer, ReplayAPICaller
+from miner_base.retry import Retry, RetryPolicy
+from miner_base.testing import tg_session
+
+
+async def _record(path: str) -> tuple[list, str]:
+    calls = {'n': 0}
+
+    async def info(request: web.Request):
+        calls['n'] += 1
+        await asyncio.sleep(0.05)
+        return web.json_response({'code': 0, 'data': {'n': calls['n'], 'page': request.query.get('page')}})
+
+    async def collect(request: web.Request):
+        return web.json_response({'code': 0, 'data': await request.json()})
+
+    async def flaky(request: web.Request):
+        calls['n'] += 1
+        if calls['n'] % 2:
+            return web.json_response({'code': 500}, status=500)
+        return web.json_response({'code': 0, 'data': 'ok'})
+
+    app = web.Application()
+    app.router.add_get('/info', info)
+    app.router.add_post('/collect', collect)
+    app.router.add_get('/flaky', flaky)
+    results = []
+    async with TestServer(app) as server, SessionPool() as pool:
+        base_url = str(server.make_url(''))
+        api = ApiRegistry(base_url)
+        api.get('info', '/info')
+        api.post('collect', '/collect')
+        api.get('flaky', '/flaky')
+        with TrafficRecorder(path) as recorder:
+            caller = RecordingAPICaller.of(pool, tg_session(1), registry=api, recorder=recorder,
+                                           retry=Retry(RetryPolicy(base=0, cap=0)))
+            results.append(await caller.api('info', params={'page': 1}))
+            results.append(await caller.api('info', params={'page': 1}))
+            results.append(await caller.api('collect', data=7))
+            calls['n'] = 0
+            results.append(await caller.api('flaky'))
+            async with caller.get(server.make_url('/info')) as response:
+                results.append((response.status, await response.json()))
+            await caller.close()
+            assert recorder.entries == 6
+    return results, base_url
+
+
+def test_record_replay(tmp_path):
+    path = str(tmp_path / 'traffic.jsonl.gz')
+    recorded, base_url = asyncio.run(_record(path))
+
+    async def replay(player: TrafficPlayer, account: int):
+        api = ApiRegistry(base_url)
+        api.get('info', '/info')
+        api.post('collect', '/collect')
+        api.get('flaky', '/flaky')
+        caller = ReplayAPICaller.of(None, tg_session(account), registry=api, player=player,
+                                    retry=Retry(RetryPolicy(base=0, cap=0)))
+        results = [await caller.api('info', params={'page': 1}),
+                   await caller.api('info', params={'page': 1}),
+                   await caller.api('collect', data=7),
+                   await caller.api('flaky')]
+        async with caller.get(f'{base_url}/info') as response:
+            results.append((response.status, await response.json()))
+        await caller.close()
+        return results
+
+    # 不访问网络(server已关闭), 按录制顺序返回
+    player = TrafficPlayer(path, speed=None)
+    assert len(player) == 6
+    t0 = time.perf_counter()
+    assert asyncio.run(replay(player, 1)) == recorded
+    assert time.perf_counter() - t0 < 0.1
+    assert player.hits == 6 and player.reused == 0
+
+    # 按录制耗时回放
+    t0 = time.perf_counter()
+    asyncio.run(replay(TrafficPlayer(path, speed=1), 1))
+    assert time.perf_counter() - t0 >= 0.15
+
+    # 按录制的开始时间回放: 录制中较晚发出的请求, 回放时即使立即调用也等到 (t + d) / speed
+    with gzip.open(path, 'rt') as f:
+        last = json.loads(f.readlines()[-1])
+    player = TrafficPlayer(path, speed=2)
+    t0 = time.perf_counter()
+    asyncio.run(player.play(1, 'GET', last['u'], {}))
+    assert time.perf_counter() - t0 >= (last['t'] + last['d']) / 2 - 0.01 and last['t'] > 0.1
+
+    # 没有录制的帐户复用其他帐户的响应
+    player = TrafficPlayer(path, speed=None)
+    assert asyncio.run(replay(player, 2)) == recorded
+    assert player.reused == 6
+
+    with pytest.raises(InteractorArgsException):
+        asyncio.run(replay(TrafficPlayer(path, speed=None, strict=True), 2))
+
+
+def test_replay_error(tmp_path):
+    path = str(tmp_path / 'traffic.jsonl.gz')
+
+    async def run():
+        async with SessionPool() as pool:
+            with TrafficRecorder(path) as recorder:
+                caller = RecordingAPICaller.of(pool, tg_session(1), recorder=recorder)
+                with pytest.raises(aiohttp.ClientConnectionError):
+                    await caller.get('http://127.0.0.1:1/closed')
+                await caller.close()
+
+        caller = ReplayAPICaller.of(None, tg_session(1), player=TrafficPlayer(path, speed=None))
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await caller.get('http://127.0.0.1:1/closed')
+        with pytest.raises(InteractorArgsException):
+            await caller.get('http://127.0.0.1:1/other')
+
+    asyncio.run(run())
@@ -0,0 +1,193 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from miner_base import ApiRegistry, NetworkException, HttpStatusException, ProxyException, InteractorArgsException
+from miner_base.impl import SessionPool, AiohttpAPICaller
+from miner_base.retry import Retry, RetryPolicy, RetryBudget, CircuitBreaker, BreakerRegistry, classify, retry, \
+    is_proxy_error
+
+
+def test_classify():
+    assert classify(asyncio.TimeoutError()).err_name == 'NET_TIMEOUT'
+    assert classify(asyncio.TimeoutError(), 'http://127.0.0.1:1').err_name == 'PROXY_TIMEOUT'
+    assert classify(aiohttp.ClientConnectionError()).err_name == 'NET_ERROR'
+    assert isinstance(classify(aiohttp.ClientResponseError(None, (), status=503)), HttpStatusException)
+    error = aiohttp.ClientResponseError(None, (), status=404)
+    assert classify(error) is error
+    error = InteractorArgsException('x')
+    assert classify(error) is error
+
+
+def test_retry_normal_only():
+    calls = []
+
+    @retry(attempts=3, base=0.001)
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise asyncio.TimeoutError()
+        return 'ok'
+
+    @retry(attempts=3, base=0.001)
+    async def fatal():
+        calls.append(1)
+        raise ProxyException('p')
+
+    async def run():
+        assert await flaky() == 'ok' and len(calls) == 3
+        calls.clear()
+        with pytest.raises(ProxyException):
+            await fatal()
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_retry_exhausted_and_budget():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        raise aiohttp.ClientConnectionError('down')
+
+    async def run():
+        with pytest.raises(NetworkException) as exc_info:
+            await Retry(RetryPolicy(attempts=4, base=0.001)).run(fail)
+        error = exc_info.value
+        assert error.err_name == 'NET_ERROR' and isinstance(error.__cause__, aiohttp.ClientConnectionError)
+        assert len(calls) == 4
+        calls.clear()
+        budget = RetryBudget(ratio=0, min_per_sec=0, max_tokens=1)
+        engine = Retry(RetryPolicy(attempts=4, base=0.001), budget)
+        for _ in range(2):
+            try:
+                await engine.run(fail)
+            except NetworkException:
+                pass
+        assert len(calls) == 3  # 预算只允许一次重试
+
+    asyncio.run(run())
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker('proxy', 'p', failure_threshold=2, reset_timeout=0.01)
+    breaker.record(False)
+    breaker.check()
+    breaker.record(False)
+    with pytest.raises(NetworkException) as exc_info:  # 可重试, 不结束帐户
+        breaker.check()
+    assert exc_info.value.err_name == 'CIRCUIT_OPEN'
+    import time
+    time.sleep(0.02)
+    breaker.check()  # 半开
+    assert breaker.state == 'half_open'
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    host = BreakerRegistry(failure_threshold=1).get('host', 'h')
+    host.record(False)
+    with pytest.raises(NetworkException) as exc_info:
+        host.check()
+    assert exc_info.value.err_name == 'CIRCUIT_OPEN'
+
+
+def test_circuit_breaker_probe():
+    import time
+    breaker = CircuitBreaker('host', 'h', failure_threshold=1, reset_timeout=0.01)
+    breaker.record(False)
+    time.sleep(0.02)
+    assert breaker.check()  # 探测请求
+    with pytest.raises(NetworkException):
+        breaker.check()
+    time.sleep(0.02)
+    assert breaker.check()  # 探测超时没有结果, 重新探测
+    breaker.release()
+    assert breaker.state == 'open' and breaker.check()
+
+    async def slow(request: web.Request):
+        await asyncio.sleep(10)
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/slow', slow)
+        async with TestServer(app) as server, SessionPool(breakers=BreakerRegistry(1, reset_timeout=60)) as pool:
+            host = pool.breakers.get('host', server.host)
+            host.record(False)
+            host.opened_at -= 60
+            async with AiohttpAPICaller(pool) as caller:
+                task = asyncio.ensure_future(caller.get(server.make_url('/slow')))  # 探测请求被取消
+                await asyncio.sleep(0.05)
+                assert host.state == 'half_open'
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                assert host.state == 'open'
+                with pytest.raises(ValueError):  # 探测请求因非网络错误失败
+                    await caller.get(server.make_url('/slow'), json={}, data=b'')
+                assert host.state == 'open' and host.check()
+
+    asyncio.run(run())
+
+
+def test_breaker_proxy_vs_host():
+    assert is_proxy_error(aiohttp.ClientProxyConnectionError(None, OSError()))
+    assert not is_proxy_error(asyncio.TimeoutError()) and not is_proxy_error(aiohttp.ServerDisconnectedError())
+
+    async def slow(request: web.Request):  # 作为http proxy: 游戏服务器超时
+        await asyncio.sleep(1)
+        return web.Response()
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{tail:.*}', slow)
+        async with TestServer(app) as proxy, SessionPool(breakers=BreakerRegistry(failure_threshold=1)) as pool:
+            proxy_snap = str(proxy.make_url('')).rstrip('/')
+            caller = AiohttpAPICaller(pool, proxy=proxy_snap)
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.get('http://game.test/info', timeout=aiohttp.ClientTimeout(total=0.05))
+            assert pool.breakers.get('proxy', proxy_snap).state == 'closed'  # host超时不计入proxy
+            assert pool.breakers.get('host', 'game.test').state == 'open'
+            await caller.close()
+
+            caller = AiohttpAPICaller(pool, proxy='http://127.0.0.1:1')
+            with pytest.raises(aiohttp.ClientProxyConnectionError):
+                await caller.get('http://other.test/info')
+            assert pool.breakers.get('proxy', 'http://127.0.0.1:1').state == 'open'
+            assert pool.breakers.get('host', 'other.test').state == 'closed'
+            await caller.close()
+
+    asyncio.run(run())
+
+
+def test_caller_retry():
+    calls = {'info': 0, 'tap': 0}
+
+    async def info(request: web.Request):
+        calls['info'] += 1
+        if calls['info'] < 3:
+            return web.Response(status=503)
+        return web.json_response({'data': calls['info']})
+
+    async def tap(request: web.Request):
+        calls['tap'] += 1
+        return web.Response(status=503)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/info', info)
+        app.router.add_post('/tap', tap)
+        async with TestServer(app) as server, SessionPool(breakers=BreakerRegistry(failure_threshold=10)) as pool:
+            api = ApiRegistry(str(server.make_url('/')))
+            api.get('info', '/info')
+            api.post('tap', '/tap')
+            async with AiohttpAPICaller(pool, registry=api, retry=Retry(RetryPolicy(base=0.001))) as caller:
+                assert await caller.api('info') == 3
+                with pytest.raises(HttpStatusException) as exc_info:
+                    await caller.api('tap')  # POST不重试
+                assert exc_info.value.status == 503 and calls['tap'] == 1
+            assert pool.breakers.get('host', server.host).failures == 1
+
+    asyncio.run(run())
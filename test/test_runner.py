@@ -0,0 +1,60 @@
+import asyncio
+from types import ModuleType
+
+from miner_base import FatalExecutorException, NetworkException, SessionException
+from miner_base.impl import LoggerStatusUpdater
+from miner_base.runner import TaskRunner, AccountTask, discover_threads
+
+
+def _script() -> ModuleType:
+    module = ModuleType('script')
+
+    async def thread_fatal(args, updater, caller, state):
+        await asyncio.sleep(0.01)
+        raise SessionException('s1', msg='session expired')
+
+    async def thread_forever(args, updater, caller, state):
+        try:
+            await asyncio.sleep(10)
+        finally:
+            state.set('forever_closed', True)
+
+    async def thread_flaky(args, updater, caller, state):
+        state.set('flaky', state.get('flaky', 0) + 1)
+        if state.get('flaky') < 3:
+            raise NetworkException('timeout')
+
+    def thread_not_async():
+        ...
+
+    for func in (thread_fatal, thread_forever, thread_flaky, thread_not_async):
+        setattr(module, func.__name__, func)
+    return module
+
+
+def _task(name: str, statuses: list):
+    updater = LoggerStatusUpdater.of(lambda status, level, msg, extra, error=None: statuses.append(status))
+    return AccountTask(args=None, updater=updater, caller=None, name=name)
+
+
+def test_discover_threads():
+    assert set(discover_threads(_script())) == {'thread_fatal', 'thread_forever', 'thread_flaky'}
+
+
+def test_fatal_cancels_siblings():
+    statuses = []
+    threads = discover_threads(_script())
+    runner = TaskRunner(threads, max_concurrency=1, retry=1, retry_delay=0, normal_retry_delay=0)
+    task = asyncio.run(runner.run_account(_task('a', statuses)))
+    assert task.status == 'failed'
+    assert isinstance(task.error, FatalExecutorException)
+    assert task.state.get('forever_closed') is True
+    assert [s for s in statuses if s] == ['queued', 'running', 'failed']
+
+
+def test_normal_exception_restarts_thread():
+    statuses = []
+    threads = {'thread_flaky': discover_threads(_script())['thread_flaky']}
+    tasks = asyncio.run(TaskRunner(threads, normal_retry_delay=0).run([_task('a', statuses), _task('b', statuses)]))
+    assert [t.status for t in tasks] == ['completed', 'completed']
+    assert tasks[0].state.get('flaky') == 3
@@ -0,0 +1,46 @@
+import pickle
+
+from miner_base.exception import HttpStatusException
+from miner_base.impl import LoggerStatusUpdater
+from miner_base.shard import run_sharded_sync, shard, _portable_error
+from miner_base.testing import tg_sessions
+
+SCRIPT = '''
+from miner_base import *
+
+
+class Profile(ScriptProfile):
+    GREETING: str = Field('hi')
+
+
+async def thread_task(args: ScriptRuntimeArgs[Profile], updater: StatusUpdater, caller: APICaller, state: State):
+    updater.success(f"{args.profile.GREETING} {args.tg_session['session_name']}")
+'''
+
+
+def test_shard():
+    assert shard([1, 2, 3, 4, 5], 2) == [[1, 3, 5], [2, 4]]
+    assert shard([1], 4) == [[1]]
+
+
+def test_run_sharded(tmp_path):
+    script = tmp_path / 'hello_script.py'
+    script.write_text(SCRIPT)
+    events = []
+    updater = LoggerStatusUpdater.of(lambda status, level, msg, extra, error=None: events.append((level, msg, extra)))
+    statuses = run_sharded_sync(str(script), tg_sessions(4), updater,
+                                profile={'GREETING': 'hello'}, processes=2)
+    assert statuses == {str(i): 'completed' for i in range(4)}
+    greetings = sorted((extra['account'], msg) for level, msg, extra in events if level == 'SUCCESS')
+    assert greetings == [(str(i), f'hello s{i}') for i in range(4)]
+
+
+def test_portable_error():
+    error = HttpStatusException(429, 'too many', 'https://x')
+    restored = pickle.loads(pickle.dumps(_portable_error(error)))
+    assert type(restored) is HttpStatusException and restored.status == 429 and str(restored) == str(error)
+
+    class Local(Exception):  # 局部类无法pickle
+        pass
+
+    assert str(_portable_error(Local('boom'))) == 'Local: boom'
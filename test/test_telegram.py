@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from miner_base.model import TmaParam
+from miner_base.telegram import TgClient, TgClientPool, TmaTokenBatcher, FloodWait
+from miner_base.tma import TmaTokenCache
+
+TMA_URL = 'https://t.me/theYescoin_bot/Yescoin?startapp=abc'
+
+
+class FakeTelegram:
+    """本地模拟的Telegram后端: 帐户按编号分布在2个DC, 每个DC的第一次请求返回FloodWait"""
+
+    def __init__(self):
+        self.connected = 0
+        self.running = 0
+        self.max_running = 0
+        self.requests: dict[int, list[float]] = {}
+        self.flooded: set[int] = set()
+
+
+class FakeTgClient(TgClient):
+
+    def __init__(self, backend: FakeTelegram, session_name: str):
+        self.backend = backend
+        self.session_name = session_name
+        self._dc_id = int(session_name.split('-')[1]) % 2 + 1
+
+    @property
+    def dc_id(self) -> int:
+        return self._dc_id
+
+    async def connect(self):
+        await asyncio.sleep(0.01)
+        self.backend.connected += 1
+
+    async def request_web_view(self, tma: TmaParam, tma_url: str) -> str:
+        backend = self.backend
+        if self.dc_id not in backend.flooded:
+            backend.flooded.add(self.dc_id)
+            raise FloodWait(0.05)
+        backend.running += 1
+        backend.max_running = max(backend.max_running, backend.running)
+        backend.requests.setdefault(self.dc_id, []).append(time.monotonic())
+        await asyncio.sleep(0.01)
+        backend.running -= 1
+        if self.session_name == 'session-13':
+            raise ConnectionError('session revoked')
+        return f"auth_date={int(time.time())}&user={self.session_name}&bot={tma['bot_name']}"
+
+    async def disconnect(self):
+        self.backend.connected -= 1
+
+
+def test_batch_tokens():
+    backend = FakeTelegram()
+
+    async def run():
+        async with TgClientPool(lambda name: FakeTgClient(backend, name), max_idle=5) as pool:
+            batcher = TmaTokenBatcher(pool, concurrency=4, dc_rate=200, dc_burst=2, cache=TmaTokenCache())
+            sessions = [f'session-{i}' for i in range(20)]
+            results = [r async for r in batcher.fetch((s, TMA_URL) for s in sessions)]
+            assert sorted(r[0] for r in results) == sorted(sessions)
+            errors = {r[0]: r[3] for r in results if r[3] is not None}
+            assert list(errors) == ['session-13'] and isinstance(errors['session-13'], ConnectionError)
+            assert all(f'user={r[0]}' in r[2] for r in results if r[3] is None)
+            assert backend.max_running <= 4
+            assert backend.flooded == {1, 2}
+            assert backend.connected <= 5 and pool.connects == 20  # 空闲客户端只保留5个
+
+            # 再次获取: 有缓存的帐户不请求Telegram
+            count = sum(map(len, backend.requests.values()))
+            results = [r async for r in batcher.fetch([('session-1', TMA_URL), ('session-13', TMA_URL)])]
+            assert sum(map(len, backend.requests.values())) == count + 1
+            assert pool.connects <= 21
+        assert backend.connected == 0
+
+    asyncio.run(run())
+
+
+def test_shared_concurrency():
+    backend = FakeTelegram()
+    backend.flooded = {1, 2}
+
+    async def run():
+        async with TgClientPool(lambda name: FakeTgClient(backend, name)) as pool:
+            batcher = TmaTokenBatcher(pool, concurrency=3, dc_rate=1000, dc_burst=100)
+
+            async def fetch(start: int):
+                return [r async for r in batcher.fetch((f'session-{i}', TMA_URL) for i in range(start, start + 10))]
+
+            await asyncio.gather(fetch(0), fetch(20), batcher.get('session-40', TMA_URL))
+            assert backend.max_running <= 3  # 多个fetch与get共享同一个并发上限
+
+    asyncio.run(run())
+
+
+def test_pool_reuse():
+    backend = FakeTelegram()
+
+    async def run():
+        pool = TgClientPool(lambda name: FakeTgClient(backend, name))
+        clients = await asyncio.gather(*(pool.acquire('session-1') for _ in range(5)))
+        assert len({id(c) for c in clients}) == 1 and pool.connects == 1
+        for _ in clients:
+            await pool.release('session-1')
+        assert await pool.acquire('session-1') is clients[0] and pool.connects == 1
+        await pool.release('session-1')
+        await pool.close()
+        assert backend.connected == 0
+
+    asyncio.run(run())
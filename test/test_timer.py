@@ -0,0 +1,51 @@
+import asyncio
+import random
+
+from miner_base.timer import TimerWheel, sleep
+
+
+def test_sleep_coalesced():
+    async def run():
+        wheel = TimerWheel.install(tick=0.02)
+        loop = asyncio.get_running_loop()
+        delays = [random.uniform(0.05, 0.3) for _ in range(500)]
+
+        async def one(delay: float):
+            t0 = loop.time()
+            assert await sleep(delay, 'ok') == 'ok'
+            return loop.time() - t0 - delay
+
+        late = await asyncio.gather(*(one(d) for d in delays))
+        assert min(late) >= -0.002  # 不提前返回(允许loop时钟精度)
+        assert max(late) < 0.02 + 0.05
+        stats = wheel.stats()
+        assert stats['timers'] == 0 and stats['expired'] == 500
+        assert stats['wakeups'] <= 0.3 / 0.02 + 2  # 每个tick最多唤醒一次
+        assert TimerWheel.of() is wheel
+
+    asyncio.run(run())
+
+
+def test_sleep_cascade_and_cancel():
+    async def run():
+        # 每层4个槽: 覆盖 4 / 16 / 64 个tick, 更远的进入溢出列表
+        wheel = TimerWheel(tick=0.005, bits=(2, 2, 2))
+        loop = asyncio.get_running_loop()
+        order = []
+
+        async def one(i: int, ticks: int):
+            t0 = loop.time()
+            await wheel.sleep(ticks * 0.005)
+            assert loop.time() - t0 >= ticks * 0.005 - 0.002
+            order.append(i)
+
+        ticks = [1, 3, 7, 15, 33, 70, 100]
+        tasks = [asyncio.create_task(one(i, t)) for i, t in enumerate(ticks)]
+        cancelled = asyncio.create_task(wheel.sleep(0.2))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.gather(*tasks)
+        assert order == list(range(len(ticks)))
+        assert wheel.stats()['timers'] == 0 and wheel.cancelled == 1 and wheel.expired == len(ticks)
+
+    asyncio.run(run())
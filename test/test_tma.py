@@ -0,0 +1,53 @@
+import asyncio
+import base64
+import json
+import time
+
+from miner_base.persist import StateStore
+from miner_base.tma import TmaTokenCache, expires_of
+
+TMA_URL = 'https://t.me/theYescoin_bot/Yescoin?startapp=abc'
+
+
+def test_expires_of():
+    now = time.time()
+    auth_date = int(now) - 100
+    assert expires_of(f'query_id=1&auth_date={auth_date}&hash=x', 3600, max_age=1000) == auth_date + 1000
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': 123}).encode()).decode().rstrip('=')
+    assert expires_of(f'h.{payload}.s', 3600) == 123
+    assert now + 3599 < expires_of('opaque', 3600) < now + 3601
+
+
+def test_token_cache(tmp_path):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return f'query_id=1&auth_date={int(time.time())}&hash={len(calls)}'
+
+    async def run():
+        cache = TmaTokenCache(max_age=3600, refresh_ahead=60, jitter=600)
+        assert cache.key_of('s1', TMA_URL) == 's1:theYescoin_bot/Yescoin'
+        tokens = await asyncio.gather(*(cache.get_or_fetch('s1', TMA_URL, fetch) for _ in range(10)))
+        assert len(set(tokens)) == 1 and len(calls) == 1
+        assert await cache.get_or_fetch('s1', TMA_URL, fetch) == tokens[0] and len(calls) == 1
+        # 每个帐户的刷新时间不同
+        await cache.get_or_fetch('s2', TMA_URL, fetch)
+        r1, r2 = cache.refresh_in('s1', TMA_URL), cache.refresh_in('s2', TMA_URL)
+        assert 3600 - 60 - 600 <= min(r1, r2) and max(r1, r2) <= 3600 - 60 and r1 != r2
+        await cache.get_or_fetch('s1', TMA_URL, fetch, force=True)
+        assert len(calls) == 3
+
+        # 重启后恢复
+        store = StateStore(str(tmp_path / 'tma.db'))
+        assert cache.attach(store) is cache.attach(store) is cache  # 重复attach不重复记录
+        cache.put('s3', TMA_URL, 'opaque')
+        await store.aclose()
+        store = StateStore(str(tmp_path / 'tma.db'))
+        restored = TmaTokenCache().attach(store)
+        assert restored.get('s3', TMA_URL) == 'opaque'
+        assert 3600 - 300 - 600 <= restored.refresh_in('s3', TMA_URL) <= 3600 - 300
+        await store.aclose()
+
+    asyncio.run(run())